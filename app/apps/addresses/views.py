@@ -7,7 +7,7 @@ from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.viewsets import ViewSet
-from utils.queries_zaken_api import get_headers
+from utils.queries_zaken_api import get_headers, get_reference_data
 
 from .serializers import (
     HousingCorporationSerializer,
@@ -26,29 +26,13 @@ bag_id = OpenApiParameter(
 
 
 def fetch_housing_corporations(auth_header=None):
-    url = f"{settings.ZAKEN_API_URL}/addresses/housing-corporations/"
-
-    response = requests.get(
-        url,
-        timeout=5,
-        headers=get_headers(auth_header),
-    )
-    response.raise_for_status()
-
-    return response.json().get("results", [])
+    data = get_reference_data("addresses/housing-corporations/", auth_header)
+    return data.get("results", [])
 
 
 def fetch_districts(auth_header=None):
-    url = f"{settings.ZAKEN_API_URL}/addresses/districts/"
-
-    response = requests.get(
-        url,
-        timeout=5,
-        headers=get_headers(auth_header),
-    )
-    response.raise_for_status()
-
-    return response.json().get("results", [])
+    data = get_reference_data("addresses/districts/", auth_header)
+    return data.get("results", [])
 
 
 def fetch_meldingen(bag_id, auth_header=None, query_params=None):
@@ -0,0 +1 @@
+"""Django management package for the cases app."""
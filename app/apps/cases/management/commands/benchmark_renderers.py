@@ -0,0 +1,61 @@
+import timeit
+
+from apps.cases.mock import get_zaken_case_list
+from django.core.management.base import BaseCommand
+from django.http import JsonResponse as DjangoJsonResponse
+from rest_framework.renderers import JSONRenderer
+from utils.renderers import JsonResponse, ORJSONRenderer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare rendering a case list with orjson to rendering it with the "
+        "JSONRenderer of DRF and the JsonResponse of Django."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--cases",
+            type=int,
+            default=1000,
+            help="Number of cases of the list",
+        )
+        parser.add_argument(
+            "--number",
+            type=int,
+            default=5,
+            help="Number of renders per measurement",
+        )
+
+    def measure(self, function, number):
+        return min(timeit.repeat(function, number=number, repeat=3)) / number
+
+    def compare(self, name, function, orjson_function, number):
+        duration = self.measure(function, number)
+        orjson_duration = self.measure(orjson_function, number)
+        self.stdout.write(
+            f"{name}: {duration * 1000:.1f}ms, with orjson "
+            f"{orjson_duration * 1000:.1f}ms, "
+            f"{duration / max(orjson_duration, 0.000001):.1f}x faster"
+        )
+
+    def handle(self, *args, **options):
+        case_list = get_zaken_case_list()
+        cases = [
+            {**case_list[index % len(case_list)], "id": index}
+            for index in range(options["cases"])
+        ]
+        self.stdout.write(f"{len(cases)} cases")
+
+        self.compare(
+            "JSONRenderer",
+            lambda: JSONRenderer().render({"cases": cases}),
+            lambda: ORJSONRenderer().render({"cases": cases}),
+            options["number"],
+        )
+        self.compare(
+            "JsonResponse",
+            lambda: DjangoJsonResponse(cases, safe=False),
+            lambda: JsonResponse(cases, safe=False),
+            options["number"],
+        )
@@ -0,0 +1,49 @@
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_cases(apps, schema_editor):
+    """
+    Points all relations of cases with the same case_id to the oldest one,
+    and removes the others, so case_id can be made unique
+    """
+    Case = apps.get_model("cases", "Case")
+    ItineraryItem = apps.get_model("itinerary", "ItineraryItem")
+    ItinerarySettings = apps.get_model("itinerary", "ItinerarySettings")
+    Visit = apps.get_model("visits", "Visit")
+
+    duplicates = (
+        Case.objects.exclude(case_id=None)
+        .values("case_id")
+        .annotate(count=Count("id"), first_id=Min("id"))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        others = Case.objects.filter(case_id=duplicate["case_id"]).exclude(
+            id=duplicate["first_id"]
+        )
+        ItineraryItem.objects.filter(case__in=others).update(
+            case_id=duplicate["first_id"]
+        )
+        ItinerarySettings.objects.filter(start_case__in=others).update(
+            start_case_id=duplicate["first_id"]
+        )
+        Visit.objects.filter(case_id__in=others).update(
+            case_id_id=duplicate["first_id"]
+        )
+        others.delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("cases", "0020_auto_20220525_2025"),
+        ("itinerary", "0072_alter_itinerarysettings_housing_corporation_combiteam"),
+        (
+            "visits",
+            "0018_remove_visitmetadata_fraud_prediction_business_rules_and_more",
+        ),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_cases, migrations.RunPython.noop),
+    ]
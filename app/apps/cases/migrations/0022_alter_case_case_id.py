@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("cases", "0021_merge_duplicate_cases"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="case",
+            name="case_id",
+            field=models.CharField(blank=False, max_length=255, null=True, unique=True),
+        ),
+    ]
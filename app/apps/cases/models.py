@@ -25,7 +25,7 @@ class Case(models.Model):
     """
     A simple case model
     """
-    case_id = models.CharField(max_length=255, null=True, blank=False)
+    case_id = models.CharField(max_length=255, null=True, blank=False, unique=True)
     is_top_bwv_case = models.BooleanField(default=True)
 
     def get(case_id):
@@ -33,6 +33,32 @@ class Case(models.Model):
             case_id=case_id,
         )[0]
 
+    @staticmethod
+    def get_many(case_ids):
+        """
+        Returns a dict with the cases for the given case ids, by case id.
+        Missing cases are created in a single statement.
+        """
+        case_ids = {str(case_id) for case_id in case_ids if case_id is not None}
+        cases = {
+            case.case_id: case for case in Case.objects.filter(case_id__in=case_ids)
+        }
+
+        missing_case_ids = case_ids - set(cases)
+        if missing_case_ids:
+            # Cases created concurrently by another request are ignored here
+            Case.objects.bulk_create(
+                [Case(case_id=case_id) for case_id in missing_case_ids],
+                ignore_conflicts=True,
+            )
+            cases.update(
+                {
+                    case.case_id: case
+                    for case in Case.objects.filter(case_id__in=missing_case_ids)
+                }
+            )
+        return cases
+
     def fetch_case(self, auth_header=None):
         from apps.itinerary.models import Itinerary
 
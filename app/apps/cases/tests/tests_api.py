@@ -1,15 +1,19 @@
 import datetime
+import json
+from unittest.mock import patch
 
 from apps.cases.models import Case
-from apps.itinerary.models import ItineraryItem
+from apps.itinerary.models import Itinerary, ItineraryItem, ItineraryTeamMember
 from apps.visits.models import Visit
 from django.urls import reverse
+from freezegun import freeze_time
 from model_bakery import baker
 from rest_framework import status
 from rest_framework.test import APITestCase
 
 from app.utils.unittest_helpers import (
     get_authenticated_client,
+    get_test_user,
     get_unauthenticated_client,
 )
 
@@ -95,3 +99,56 @@ class CaseSearchViewSetTest(APITestCase):
         client = get_unauthenticated_client()
         response = client.get(url, self.MOCK_SEARCH_QUERY_PARAMETERS)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @patch("apps.cases.views.requests.get")
+    def test_search_teams(self, mock_requests_get):
+        """
+        Cases contain the teams of today's itineraries that contain them
+        """
+        mock_requests_get.return_value.iter_content.return_value = [
+            json.dumps({"results": [{"id": 1}, {"id": 2}]}).encode()
+        ]
+        user = get_test_user()
+        itinerary = baker.make(Itinerary)
+        team_member = baker.make(ItineraryTeamMember, itinerary=itinerary, user=user)
+        baker.make(ItineraryItem, itinerary=itinerary, case=Case.get("1"))
+        with freeze_time("2020-01-01"):
+            other_itinerary = baker.make(Itinerary)
+        baker.make(ItineraryTeamMember, itinerary=other_itinerary, user=user)
+        baker.make(ItineraryItem, itinerary=other_itinerary, case=Case.get("2"))
+
+        url = reverse("v1:search-list")
+        client = get_authenticated_client()
+        response = client.get(url, self.MOCK_SEARCH_QUERY_PARAMETERS)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        cases = response.json()["cases"]
+        self.assertEqual(len(cases[0]["teams"]), 1)
+        self.assertEqual(cases[0]["teams"][0][0]["id"], team_member.id)
+        self.assertEqual(cases[0]["teams"][0][0]["user"]["email"], user.email)
+        self.assertEqual(cases[1]["teams"], [])
+
+    @patch("apps.cases.views.requests.get")
+    def test_search_fields(self, mock_requests_get):
+        """
+        Cases keep all the fields of the Zaken API
+        """
+        case = {
+            "id": 1,
+            "address": {"street_name": "Foo"},
+            "current_states": [],
+            "description": "Foo",
+            "schedules": [],
+            "start_date": "2020-01-01",
+            "workflows": [],
+        }
+        mock_requests_get.return_value.iter_content.return_value = [
+            json.dumps({"results": [case]}).encode()
+        ]
+
+        url = reverse("v1:search-list")
+        client = get_authenticated_client()
+        response = client.get(url, self.MOCK_SEARCH_QUERY_PARAMETERS)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.json()["cases"][0]), {*case, "teams"})
@@ -56,6 +56,23 @@ class CaseModelTest(TestCase):
         Case.get(FOO_ID)
         self.assertEqual(Case.objects.count(), 1)
 
+    def test_case_get_many_function(self):
+        """
+        Returns the cases by case id, and creates the missing ones at once
+        """
+        existing_case = Case.objects.create(case_id="FOO_ID")
+
+        with self.assertNumQueries(3):
+            cases = Case.get_many(["FOO_ID", "FOO_OTHER_ID", 1, None])
+
+        self.assertEqual(set(cases), {"FOO_ID", "FOO_OTHER_ID", "1"})
+        self.assertEqual(cases["FOO_ID"], existing_case)
+        self.assertEqual(Case.objects.count(), 3)
+
+        # Cases that exist are only selected
+        with self.assertNumQueries(1):
+            Case.get_many(["FOO_ID", "FOO_OTHER_ID"])
+
     def test_get_location(self):
         """
         Should return the case geolocation data
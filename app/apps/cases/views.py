@@ -1,10 +1,11 @@
 import json
 import logging
+from collections import defaultdict
 from datetime import datetime
 
 import requests
 from apps.cases.serializers import CaseSearchSerializer
-from apps.itinerary.models import Itinerary
+from apps.itinerary.models import ItineraryTeamMember
 from apps.itinerary.serializers import ItineraryTeamMemberSerializer
 from apps.users.auth_apps import AZAKeyAuth
 from apps.users.permissions import IsInAuthorizedRealm
@@ -12,8 +13,8 @@ from apps.users.utils import get_auth_header_from_request
 from apps.visits.models import Visit
 from apps.visits.serializers import VisitSerializer
 from django.conf import settings
+from django.db.models import F
 from django.forms.models import model_to_dict
-from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
 from drf_spectacular.utils import extend_schema
 from rest_framework import serializers
@@ -22,7 +23,8 @@ from rest_framework.response import Response
 from rest_framework.viewsets import ViewSet
 from utils import queries_bag_api as bag_api
 from utils import queries_brk_api as brk_api
-from utils.queries_zaken_api import get_headers
+from utils.queries_zaken_api import get_headers, read_case_list
+from utils.renderers import JsonResponse
 
 from .mock import get_zaken_case_list
 from .models import Case
@@ -106,32 +108,44 @@ class BaseCaseSearchViewSet(ViewSet):
     Shared base ViewSet for case search endpoints
     """
 
-    def _add_teams(self, cases, itineraries_created_at):
-        mapped_cases = {}
-        cases = cases.copy()
-
-        for case in cases:
-            case_id = str(case.get("id"))
-            mapped_cases[case_id] = case
-            case["teams"] = []
+    def _get_teams(self, case_ids, itineraries_created_at):
+        """
+        Returns a dict with the serialized teams of the itineraries for the given
+        date that contain the case, per case id
+        """
+        # One row per team member of an itinerary, for each of its matching cases
+        team_members = list(
+            ItineraryTeamMember.objects.filter(
+                itinerary__created_at=itineraries_created_at,
+                itinerary__items__case__case_id__in=case_ids,
+            )
+            .annotate(item_case_id=F("itinerary__items__case__case_id"))
+            .select_related("user")
+            .prefetch_related("user__team_settings")
+            .order_by("itinerary_id", "id")
+        )
+        serialized_team_members = ItineraryTeamMemberSerializer(
+            team_members, many=True
+        ).data
 
-        itineraries = Itinerary.objects.filter(created_at=itineraries_created_at).all()
+        teams = defaultdict(dict)
+        for team_member, serialized_team_member in zip(
+            team_members, serialized_team_members
+        ):
+            teams[team_member.item_case_id].setdefault(
+                team_member.itinerary_id, []
+            ).append(serialized_team_member)
 
-        for itinerary in itineraries:
-            team = itinerary.team_members.all()
-            itinerary_cases = itinerary.get_cases()
+        return {case_id: list(team.values()) for case_id, team in teams.items()}
 
-            for case in itinerary_cases:
-                case_id = case.case_id
-                mapped_case = mapped_cases.get(case_id)
-                if not mapped_case:
-                    continue
+    def _add_teams(self, cases, itineraries_created_at):
+        cases = cases.copy()
+        teams = self._get_teams(
+            [str(case.get("id")) for case in cases], itineraries_created_at
+        )
 
-                serialized_team = ItineraryTeamMemberSerializer(
-                    team,
-                    many=True,
-                )
-                mapped_case["teams"].append(serialized_team.data)
+        for case in cases:
+            case["teams"] = teams.get(str(case.get("id")), [])
 
         return cases
 
@@ -159,8 +173,7 @@ class BaseCaseSearchViewSet(ViewSet):
             cases = get_zaken_case_list()
         else:
             cases = self.get_cases_from_api(request)
-            for case in cases:
-                Case.get(case_id=case.get("id"))
+            Case.get_many([case.get("id") for case in cases])
 
         cases = self._add_teams(cases, datetime.now())
         cases = self._clean_cases(cases)
@@ -206,10 +219,11 @@ class CaseSearchViewSet(BaseCaseSearchViewSet):
             params=queryParams,
             timeout=60,
             headers=get_headers(get_auth_header_from_request(request)),
+            stream=True,
         )
         response.raise_for_status()
 
-        return response.json().get("results", [])
+        return read_case_list(response)
 
 
 class CaseSearchV2ViewSet(BaseCaseSearchViewSet):
@@ -252,7 +266,8 @@ class CaseSearchV2ViewSet(BaseCaseSearchViewSet):
             params=queryParams,
             timeout=60,
             headers=get_headers(get_auth_header_from_request(request)),
+            stream=True,
         )
         response.raise_for_status()
 
-        return response.json().get("results", [])
+        return read_case_list(response)
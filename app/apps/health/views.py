@@ -1,6 +1,7 @@
 from apps.health.utils import assert_health_generic, get_health_response
 from django.conf import settings
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
+from utils.cache import read_through_caches
 
 SUCCESS_DICTIONARY_DEFAULT = {"message": "Connectivity OK"}
 
@@ -14,3 +15,12 @@ def health_default(request):
 
 def is_healthy(request):
     return HttpResponse("Ok", content_type="text/plain", status=200)
+
+
+def cache_stats(request):
+    """
+    Returns the hit ratios of the read-through caches
+    """
+    return JsonResponse(
+        {name: cache.get_stats() for name, cache in read_through_caches.items()}
+    )
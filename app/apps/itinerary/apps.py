@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class ItineraryConfig(AppConfig):
     name = "apps.itinerary"
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,143 @@
+"""
+Event streams of changes to itineraries, so team members see each other's changes
+without polling. Changes are published on a Redis channel per itinerary and
+streamed to the clients as server-sent events by the ASGI process.
+
+A native EventSource can't send the Authorization header, so the clients subscribe
+with a short-lived token of the itinerary in the query string instead, requested
+from /api/v1/itineraries/<id>/events-token/. The header is accepted as well.
+"""
+
+import json
+import logging
+
+import redis
+import redis.asyncio
+from apps.itinerary.models import Itinerary
+from apps.users.auth import AuthenticationClass
+from apps.users.models import User
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+
+logger = logging.getLogger(__name__)
+
+redis_client = None
+
+EVENTS_TOKEN_SALT = "itinerary-events"
+
+
+def get_channel(itinerary_id):
+    return f"itinerary-events:{itinerary_id}"
+
+
+def get_redis_client():
+    global redis_client
+    if redis_client is None:
+        redis_client = redis.Redis.from_url(settings.REDIS_URL)
+    return redis_client
+
+
+def publish_itinerary_event(itinerary_id, event):
+    """
+    Publishes the event once the current transaction is committed. The events are
+    an optimization for the clients, so when Redis is unavailable we log and continue.
+    """
+    if not settings.ITINERARY_EVENTS_ENABLED:
+        return
+
+    def publish():
+        try:
+            get_redis_client().publish(get_channel(itinerary_id), json.dumps(event))
+        except Exception as e:
+            logger.warning(f"Publishing itinerary event failed: {e}")
+
+    transaction.on_commit(publish)
+
+
+def get_event_data(message):
+    return f"data: {message['data'].decode()}\n\n"
+
+
+async def stream_itinerary_events(itinerary_id):
+    """
+    Yields the published events of the itinerary as server-sent events,
+    with a keep-alive comment when it's idle
+    """
+    client = redis.asyncio.Redis.from_url(settings.REDIS_URL)
+    pubsub = client.pubsub()
+    await pubsub.subscribe(get_channel(itinerary_id))
+
+    try:
+        while True:
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True,
+                timeout=settings.ITINERARY_EVENTS_KEEPALIVE,
+            )
+            yield get_event_data(message) if message else ": keep-alive\n\n"
+    finally:
+        await pubsub.aclose()
+        await client.aclose()
+
+
+def get_events_token(user, itinerary_id):
+    """
+    Returns a signed token that subscribes the user to the events of the itinerary
+    for ITINERARY_EVENTS_TOKEN_MAX_AGE seconds
+    """
+    return signing.dumps(
+        {"user": str(user.pk), "itinerary": itinerary_id}, salt=EVENTS_TOKEN_SALT
+    )
+
+
+def authenticate_events_token(token, itinerary_id):
+    """
+    Returns the active user of a valid token of the itinerary, or None
+    """
+    try:
+        data = signing.loads(
+            token,
+            salt=EVENTS_TOKEN_SALT,
+            max_age=settings.ITINERARY_EVENTS_TOKEN_MAX_AGE,
+        )
+    except signing.BadSignature:
+        return None
+    if data.get("itinerary") != itinerary_id:
+        return None
+    return User.objects.filter(pk=data.get("user"), is_active=True).first()
+
+
+def authenticate(request, itinerary_id):
+    """
+    Returns the user of the events token in the query string, or else the user
+    authenticated by the API's authentication class, or None
+    """
+    token = request.GET.get("token")
+    if token:
+        return authenticate_events_token(token, itinerary_id)
+    try:
+        return Request(request, authenticators=[AuthenticationClass()]).user
+    except APIException:
+        return None
+
+
+async def itinerary_events(request, pk):
+    """
+    Streams the changes to the itinerary as server-sent events
+    """
+    user = await sync_to_async(authenticate)(request, pk)
+    if not user or not user.is_authenticated:
+        return JsonResponse({"detail": "Not authenticated"}, status=401)
+
+    if not await Itinerary.objects.filter(pk=pk).aexists():
+        return JsonResponse({"detail": "Not found"}, status=404)
+
+    return StreamingHttpResponse(
+        stream_itinerary_events(pk),
+        content_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,26 +1,123 @@
+import hashlib
 import logging
+from functools import partial
 
 from apps.cases.models import Case
 from apps.planner.algorithm.knapsack import (
     ItineraryKnapsackList,
     ItineraryKnapsackSuggestions,
 )
-from apps.planner.models import Weights
+from apps.planner.models import DaySettings, TeamSettings, Weights
 from apps.users.models import User
+from apps.visits.models import Visit, VisitTeamMember
 from django.conf import settings
-from django.contrib.admin.utils import flatten
 from django.contrib.postgres.fields import ArrayField
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Max, Prefetch
+from django.utils import timezone
+from utils.cache import ReadThroughCache, bump_version, get_version
+from utils.geohash import get_geohash, get_geohash_center
+from utils.queries_zaken_api import iter_cases_data
 
 logger = logging.getLogger(__name__)
 
+# Bumped when a case is added to or removed from any itinerary
+SUGGESTIONS_CACHE_VERSION = "itinerary-suggestions"
+
+suggestions_cache = ReadThroughCache(
+    "itinerary-suggestions",
+    ttl=settings.ITINERARY_SUGGESTIONS_CACHE_TTL,
+)
+
+
+def invalidate_suggestions():
+    """
+    Bumps the suggestions version once the current transaction is committed, so
+    concurrent requests don't cache suggestions of the cases before the change
+    """
+    transaction.on_commit(partial(bump_version, SUGGESTIONS_CACHE_VERSION))
+
+
+class ItineraryQuerySet(models.QuerySet):
+    def touch(self):
+        """
+        Marks the itineraries as changed, for clients that sync changes only
+        """
+        return self.update(updated_at=timezone.now())
+
+    def with_related(self, summary=False):
+        """
+        Fetches the related objects used by the itinerary serializers, so any number
+        of itineraries is serialized in a constant number of queries.
+        With summary, only the objects used by ItinerarySummarySerializer are fetched.
+        """
+        if summary:
+            return self.select_related(
+                "settings__day_settings__team_settings"
+            ).prefetch_related(
+                Prefetch(
+                    "team_members",
+                    queryset=ItineraryTeamMember.objects.select_related("user"),
+                )
+            )
+
+        team_members = ItineraryTeamMember.objects.select_related(
+            "user"
+        ).prefetch_related("user__team_settings")
+        # Only the visits on the day of the itinerary
+        visits_for_day = (
+            Visit.objects.filter(
+                start_time__date=F("itinerary_item__itinerary__created_at")
+            )
+            .select_related("case_id")
+            .prefetch_related(
+                Prefetch(
+                    "team_members",
+                    queryset=VisitTeamMember.objects.select_related(
+                        "user"
+                    ).prefetch_related("user__team_settings"),
+                )
+            )
+        )
+        items = ItineraryItem.objects.select_related("case").prefetch_related(
+            Prefetch(
+                "notes",
+                queryset=Note.objects.select_related("author").prefetch_related(
+                    "author__team_settings"
+                ),
+            ),
+            Prefetch("visits", queryset=visits_for_day, to_attr="visits_for_day"),
+        )
+
+        return self.select_related("settings__start_case").prefetch_related(
+            Prefetch("team_members", queryset=team_members),
+            Prefetch("items", queryset=items),
+            Prefetch(
+                "settings__day_settings",
+                queryset=DaySettings.objects.with_used_today_count().prefetch_related(
+                    "postal_code_ranges_presets"
+                ),
+            ),
+            # Prefetched instead of joined, so itineraries share TeamSettings instances
+            Prefetch(
+                "settings__day_settings__team_settings",
+                queryset=TeamSettings.objects.prefetch_related(
+                    "observation_choices", "suggest_next_visit_choices"
+                ),
+            ),
+            "postal_code_settings",
+        )
+
 
 class Itinerary(models.Model):
     """Itinerary for visiting cases"""
 
     created_at = models.DateField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = ItineraryQuerySet.as_manager()
 
     class Meta:
         verbose_name_plural = "Itineraries"
@@ -39,9 +136,11 @@ class Itinerary(models.Model):
         """
 
         case = Case.get(case_id=case_id)
-        used_cases = Itinerary.get_cases_for_date(self.created_at)
+        case_is_used = ItineraryItem.objects.filter(
+            itinerary__created_at=self.created_at, case=case
+        ).exists()
 
-        if case in used_cases:
+        if case_is_used:
             raise ValueError("This case is already used in an itinerary for this date")
 
         itinerary_item = ItineraryItem.objects.create(
@@ -50,6 +149,58 @@ class Itinerary(models.Model):
 
         return itinerary_item
 
+    def add_cases(self, case_ids):
+        """
+        Adds the cases to the end of the itinerary, in the given order.
+        The items are created in bulk, so the queries don't grow with the number of cases.
+        """
+        case_ids = [str(case_id) for case_id in case_ids]
+        if len(set(case_ids)) != len(case_ids):
+            raise ValueError("The itinerary already contains this case")
+
+        cases = Case.get_many(case_ids)
+        cases_are_used = ItineraryItem.objects.filter(
+            itinerary__created_at=self.created_at, case__in=cases.values()
+        ).exists()
+
+        if cases_are_used:
+            raise ValueError("This case is already used in an itinerary for this date")
+
+        last_position = self.items.aggregate(last_position=Max("position"))
+        last_position = last_position["last_position"] or 0
+        itinerary_items = [
+            ItineraryItem(
+                case=cases[case_id], itinerary=self, position=last_position + index
+            )
+            for index, case_id in enumerate(case_ids, start=1)
+        ]
+
+        itinerary_items = ItineraryItem.objects.bulk_create(itinerary_items)
+        Itinerary.objects.filter(pk=self.pk).touch()
+        invalidate_suggestions()
+
+        return itinerary_items
+
+    @transaction.atomic
+    def reorder_items(self, item_ids):
+        """
+        Renumbers the items to the order of the given item ids, which must contain
+        all items of the itinerary. The items are locked, so concurrent changes
+        to the order are applied one after another.
+        """
+        items = {item.id: item for item in self.items.select_for_update()}
+        if sorted(item_ids) != sorted(items):
+            raise ValueError("The item ids don't match the items of the itinerary")
+
+        updated_at = timezone.now()
+        for position, item_id in enumerate(item_ids, start=1):
+            items[item_id].position = position
+            items[item_id].updated_at = updated_at
+        ItineraryItem.objects.bulk_update(items.values(), ["position", "updated_at"])
+        Itinerary.objects.filter(pk=self.pk).touch()
+
+        return [items[item_id] for item_id in item_ids]
+
     def get_cases(self):
         """
         Returns a list of cases for this itinerary
@@ -61,19 +212,27 @@ class Itinerary(models.Model):
         """
         returns a list of cases which are already in itineraries for a given date
         """
-        itineraries = Itinerary.objects.filter(created_at=date)
-        itineraries = [itinerary.get_cases() for itinerary in itineraries]
-        cases = flatten(itineraries)
+        cases = Case.objects.filter(cases__itinerary__created_at=date)
 
-        return cases
+        return list(cases)
 
     def add_team_members(self, user_ids):
         """
         Adds team members to this itinerary
         """
-        for user_id in user_ids:
-            user = User.objects.get(id=user_id)
-            ItineraryTeamMember.objects.create(user=user, itinerary=self)
+        users = {str(user.id): user for user in User.objects.filter(id__in=user_ids)}
+        user_ids = [str(user_id) for user_id in user_ids]
+        missing_user_ids = set(user_ids) - set(users)
+        if missing_user_ids:
+            raise User.DoesNotExist(f"Users {missing_user_ids} do not exist")
+
+        ItineraryTeamMember.objects.bulk_create(
+            [
+                ItineraryTeamMember(user=users[user_id], itinerary=self)
+                for user_id in user_ids
+            ]
+        )
+        Itinerary.objects.filter(pk=self.pk).touch()
 
     def clear_team_members(self):
         """
@@ -94,18 +253,35 @@ class Itinerary(models.Model):
         if not cases:
             return self.get_city_center()
 
-        locations = [case.get_location(auth_header) for case in cases]
-
         locs = [
             [location.get("lng"), location.get("lat")]
-            for location in locations
+            for location in self.iter_case_locations(cases, auth_header)
             if location.get("lng") and location.get("lat")
         ]
+        if not locs:
+            return self.get_city_center()
 
-        locs_lng = sum([lng[0] for lng in locs]) / len(cases)
-        locs_lat = sum([lat[1] for lat in locs]) / len(cases)
+        locs_lng = sum([lng[0] for lng in locs]) / len(locs)
+        locs_lat = sum([lat[1] for lat in locs]) / len(locs)
         return {"lat": locs_lat, "lng": locs_lng}
 
+    def iter_case_locations(self, cases, auth_header=None):
+        """
+        Yields the locations of the cases. The case details are fetched in concurrent
+        chunks, and the locations of a chunk are used as soon as it arrives.
+        """
+        if settings.USE_ZAKEN_MOCK_DATA:
+            for case in cases:
+                yield case.get_location(auth_header)
+            return
+
+        for cases_data in iter_cases_data(
+            [case.case_id for case in cases], auth_header
+        ):
+            for case_data in cases_data.values():
+                address = case_data.get("address") or {}
+                yield {"lat": address.get("lat"), "lng": address.get("lng")}
+
     def get_city_center(self):
         """
         Returns the city center (defined in the project settings)
@@ -117,7 +293,39 @@ class Itinerary(models.Model):
 
     def get_suggestions(self, auth_header=None, center=None):
         """
-        Returns a list of suggested cases which can be added to this itinerary
+        Returns a list of suggested cases which can be added to this itinerary.
+        The suggestions are cached per itinerary, its cases and the map tile of
+        the center, until a case is added to or removed from any itinerary.
+        """
+        if not settings.ITINERARY_SUGGESTIONS_CACHE_TTL:
+            return self.generate_suggestions(auth_header, center)
+
+        geohash = None
+        if center:
+            # Snap the center to its tile, so panning the map a bit hits the cache
+            geohash = get_geohash(
+                float(center.get("lat")),
+                float(center.get("lng")),
+                settings.ITINERARY_SUGGESTIONS_GEOHASH_PRECISION,
+            )
+            lat, lng = get_geohash_center(geohash)
+            center = {"lat": lat, "lng": lng}
+
+        case_ids = sorted(
+            filter(None, self.items.values_list("case__case_id", flat=True))
+        )
+        cases_hash = hashlib.sha1(",".join(case_ids).encode()).hexdigest()
+        key = (
+            f"{get_version(SUGGESTIONS_CACHE_VERSION)}:{self.pk}:{cases_hash}:{geohash}"
+        )
+
+        return suggestions_cache.get(
+            key, lambda _: self.generate_suggestions(auth_header, center)
+        )
+
+    def generate_suggestions(self, auth_header=None, center=None):
+        """
+        Generates a list of suggested cases which can be added to this itinerary
         """
         # Initialise using this itinerary's settings
         generator = self.get_suggestion_algorithm(
@@ -135,11 +343,14 @@ class Itinerary(models.Model):
         generated_list = generator.sort_cases_by_distance(generated_list)
         return generated_list
 
-    def get_cases_from_settings(self, auth_header=None):
+    def get_cases_from_settings(self, auth_header=None, postal_code_settings=None):
         """
-        Returns a list of cases based on the settings which can be added to this itinerary
+        Returns a list of cases based on the settings which can be added to this itinerary.
+        The postal code settings are given for an itinerary that isn't saved yet.
         """
         # Initialise using this itinerary's settings
+        if postal_code_settings is None:
+            postal_code_settings = self.postal_code_settings.all()
 
         weights = self.settings.day_settings.team_settings.default_weights
         if not weights:
@@ -147,7 +358,7 @@ class Itinerary(models.Model):
 
         generator = self.get_itinerary_algorithm(
             self.settings,
-            self.postal_code_settings.all(),
+            postal_code_settings,
             weights,
             auth_header=auth_header,
         )
@@ -364,6 +575,22 @@ class ItineraryTeamMember(models.Model):
         return self.user.full_name
 
 
+class ItineraryTombstone(models.Model):
+    """
+    Records that an itinerary was deleted, or that a user was removed from its team,
+    so clients that sync changes only can remove it
+    """
+
+    itinerary_id = models.PositiveIntegerField()
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="itinerary_tombstones"
+    )
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "deleted_at"])]
+
+
 class ItineraryItem(models.Model):
     """Single Itinerary item"""
 
@@ -375,10 +602,24 @@ class ItineraryItem(models.Model):
     )
     position = models.FloatField(null=False, blank=False)
     external_state_id = models.IntegerField(null=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["position"]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_case_id = instance.__dict__.get("case_id")
+        return instance
+
+    @property
+    def case_changed(self):
+        """
+        Whether the case differs from the one that was loaded or last saved
+        """
+        return self.case_id != getattr(self, "_saved_case_id", None)
+
     def __str__(self):
         if self.case:
             return self.case.__str__()
@@ -423,6 +664,10 @@ class ItineraryItem(models.Model):
         """
         Get all Visit's from the date the
         """
+        if hasattr(self, "visits_for_day"):
+            # Prefetched by Itinerary.objects.with_related()
+            return self.visits_for_day
+
         return self.visits.filter(
             start_time__year=self.itinerary.created_at.year,
             start_time__month=self.itinerary.created_at.month,
@@ -439,6 +684,7 @@ class ItineraryItem(models.Model):
         self.check_items_same_case()
 
         super().save(*args, **kwargs)
+        self._saved_case_id = self.case_id
 
 
 class Note(models.Model):
@@ -451,6 +697,7 @@ class Note(models.Model):
     author = models.ForeignKey(
         to=User, null=True, blank=False, on_delete=models.CASCADE
     )
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         max_length = 20
@@ -1,3 +1,5 @@
+import datetime
+
 from apps.cases.models import Case
 from apps.cases.serializers import (
     CaseDetailSerializer,
@@ -16,7 +18,10 @@ from apps.planner.models import DaySettings
 from apps.planner.serializers import DaySettingsSerializer
 from apps.users.serializers import UserSerializer
 from apps.visits.serializers import VisitSerializer
+from django.db import transaction
 from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from settings.const import DAY_SETTING_MAX_USE_LIMIT_REACHED
 
 
 class NoteCrudSerializer(serializers.ModelSerializer):
@@ -82,6 +87,10 @@ class ItineraryItemUpdateSerializer(serializers.ModelSerializer):
         fields = ("id", "position")
 
 
+class ItineraryItemsOrderSerializer(serializers.Serializer):
+    items = serializers.ListField(child=serializers.IntegerField())
+
+
 class ItineraryItemCreateSerializer(serializers.ModelSerializer):
     id = serializers.CharField(required=True)
     position = serializers.FloatField(required=False)
@@ -127,28 +136,30 @@ class ItinerarySerializer(serializers.ModelSerializer):
             return Case.get(case_id)
         return None
 
-    def create(self, validated_data):
-        itinerary = Itinerary.objects.create()
-        # Add team members to the itinerary
-        team_members = validated_data.get("team_members", [])
-        team_members = [
-            team_member.get("user").get("id") for team_member in team_members
-        ]
-        itinerary.add_team_members(team_members)
-        day_settings = DaySettings.objects.get(id=validated_data.get("day_settings_id"))
-        opening_date = day_settings.opening_date
-        target_length = validated_data.get("target_length")
+    def build(self, validated_data):
+        """
+        Returns a new itinerary with its settings and its postal code settings,
+        without saving them, so the cases can be generated before anything is
+        saved or locked
+        """
+        day_settings = DaySettings.objects.with_used_today_count().get(
+            id=validated_data.get("day_settings_id")
+        )
+        # Checked again when the itinerary is saved, this saves a search in vain
+        if day_settings.is_max_use_limit_reached:
+            raise ValidationError(DAY_SETTING_MAX_USE_LIMIT_REACHED)
 
+        itinerary = Itinerary(created_at=datetime.date.today())
         start_case = self.__get_start_case__(
             validated_data.get("start_case", {}).get("id"),
             day_settings.team_settings,
         )
 
-        # First create the settings
-        ItinerarySettings.objects.create(
-            opening_date=opening_date,
+        # Assigning the itinerary also sets itinerary.settings
+        ItinerarySettings(
+            opening_date=day_settings.opening_date,
             itinerary=itinerary,
-            target_length=target_length,
+            target_length=validated_data.get("target_length"),
             start_case=start_case,
             day_settings=day_settings,
             day_segments=day_settings.day_segments,
@@ -167,23 +178,61 @@ class ItinerarySerializer(serializers.ModelSerializer):
         # Get the postal code ranges from the settings
         postal_code_ranges_presets = [
             pcr
-            for pcrp in day_settings.postal_code_ranges_presets.all()
-            for pcr in pcrp.postal_code_ranges.all().values()
+            for pcrp in day_settings.postal_code_ranges_presets.prefetch_related(
+                "postal_code_ranges"
+            )
+            for pcr in pcrp.postal_code_ranges.all()
         ]
         postal_code_settings = (
-            postal_code_ranges_presets
+            [
+                {"range_start": pcr.range_start, "range_end": pcr.range_end}
+                for pcr in postal_code_ranges_presets
+            ]
             if postal_code_ranges_presets
             else day_settings.postal_code_ranges
         )
-        for postal_code_setting in postal_code_settings:
-            range_start = postal_code_setting.get("range_start")
-            range_end = postal_code_setting.get("range_end")
-
-            PostalCodeSettings.objects.create(
+        postal_code_settings = [
+            PostalCodeSettings(
                 itinerary=itinerary,
-                range_start=range_start,
-                range_end=range_end,
+                range_start=postal_code_setting.get("range_start"),
+                range_end=postal_code_setting.get("range_end"),
+            )
+            for postal_code_setting in postal_code_settings
+        ]
+        for postal_code_setting in postal_code_settings:
+            postal_code_setting.full_clean(exclude=["itinerary"])
+
+        return itinerary, postal_code_settings
+
+    @transaction.atomic
+    def create_generated(self, validated_data, itinerary, postal_code_settings, cases):
+        """
+        Saves an itinerary of build() with its generated cases. Day settings with
+        a max use limit are locked until this short transaction is committed,
+        so concurrent generations can't exceed the limit.
+        """
+        day_settings = itinerary.settings.day_settings
+        if day_settings.max_use_limit:
+            # Counts again after taking the lock, the count of build() is outdated
+            day_settings = DaySettings.objects.select_for_update().get(
+                id=day_settings.id
             )
+            if day_settings.is_max_use_limit_reached:
+                raise ValidationError(DAY_SETTING_MAX_USE_LIMIT_REACHED)
+
+        itinerary.save()
+        # Add team members to the itinerary
+        team_members = validated_data.get("team_members", [])
+        team_members = [
+            team_member.get("user").get("id") for team_member in team_members
+        ]
+        itinerary.add_team_members(team_members)
+
+        itinerary.settings.save()
+        PostalCodeSettings.objects.bulk_create(postal_code_settings)
+
+        # Populate the itinerary with cases
+        itinerary.add_cases([case.get("id") for case in cases])
 
         return itinerary
 
@@ -192,6 +241,7 @@ class ItinerarySerializer(serializers.ModelSerializer):
         fields = (
             "id",
             "created_at",
+            "updated_at",
             "team_members",
             "items",
             "settings",
@@ -0,0 +1,95 @@
+from apps.itinerary.events import publish_itinerary_event
+from apps.itinerary.models import (
+    Itinerary,
+    ItineraryItem,
+    ItineraryTeamMember,
+    ItineraryTombstone,
+    Note,
+    invalidate_suggestions,
+)
+from apps.users.models import User
+from apps.visits.models import Visit
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+EVENT_TYPES = {
+    ItineraryItem: "item",
+    ItineraryTeamMember: "team_member",
+    Note: "note",
+    Visit: "visit",
+}
+
+
+def is_deleted_with(origin, model):
+    """
+    Whether the deletion started at an object or queryset of the given model
+    """
+    return isinstance(origin, model) or getattr(origin, "model", None) is model
+
+
+def get_event(sender, instance, signal):
+    """
+    Returns a small event describing the change, clients fetch the details if needed
+    """
+    return {
+        "type": EVENT_TYPES[sender],
+        "action": "deleted" if signal is post_delete else "saved",
+        "id": instance.pk,
+    }
+
+
+@receiver(post_save, sender=ItineraryItem)
+@receiver(post_delete, sender=ItineraryItem)
+@receiver(post_save, sender=ItineraryTeamMember)
+@receiver(post_delete, sender=ItineraryTeamMember)
+def touch_itinerary(sender, instance, signal, origin=None, **kwargs):
+    if not is_deleted_with(origin, Itinerary):
+        Itinerary.objects.filter(pk=instance.itinerary_id).touch()
+        publish_itinerary_event(
+            instance.itinerary_id, get_event(sender, instance, signal)
+        )
+
+
+@receiver(post_save, sender=Note)
+@receiver(post_delete, sender=Note)
+@receiver(post_save, sender=Visit)
+@receiver(post_delete, sender=Visit)
+def touch_itinerary_of_item(sender, instance, signal, origin=None, **kwargs):
+    if not instance.itinerary_item_id or is_deleted_with(origin, Itinerary):
+        return
+
+    itinerary_id = (
+        ItineraryItem.objects.filter(pk=instance.itinerary_item_id)
+        .values_list("itinerary_id", flat=True)
+        .first()
+    )
+    if itinerary_id:
+        Itinerary.objects.filter(pk=itinerary_id).touch()
+        publish_itinerary_event(itinerary_id, get_event(sender, instance, signal))
+
+
+@receiver(post_save, sender=ItineraryItem)
+@receiver(post_delete, sender=ItineraryItem)
+@receiver(post_delete, sender=Itinerary)
+def invalidate_suggestions_of_cases(
+    sender, instance, signal, created=False, origin=None, **kwargs
+):
+    """
+    The suggestions exclude the cases of all itineraries, so they're invalidated
+    when a case is added, changed or removed. Changing only the position of an item
+    doesn't. Deleting an itinerary invalidates them once.
+    """
+    if sender is ItineraryItem:
+        if is_deleted_with(origin, Itinerary):
+            return
+        if signal is post_save and not created and not instance.case_changed:
+            return
+    invalidate_suggestions()
+
+
+@receiver(post_delete, sender=ItineraryTeamMember)
+def create_tombstone(sender, instance, origin=None, **kwargs):
+    if not is_deleted_with(origin, User):
+        ItineraryTombstone.objects.create(
+            itinerary_id=instance.itinerary_id, user_id=instance.user_id
+        )
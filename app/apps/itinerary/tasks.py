@@ -1,8 +1,10 @@
 import logging
 from datetime import timedelta
 
-from apps.itinerary.models import Itinerary
+from apps.itinerary.models import Itinerary, ItineraryTombstone
 from celery import shared_task
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 
 logger = logging.getLogger("celery")
@@ -20,9 +22,15 @@ def clean_up_itineraries_task(self):
 
     try:
         one_month_ago = timezone.now() - timedelta(days=DAYS_UNTIL_DELETION)
-        deleted_count, _ = Itinerary.objects.filter(
-            created_at__lt=one_month_ago
-        ).delete()
+        with transaction.atomic():
+            itineraries = Itinerary.objects.filter(created_at__lt=one_month_ago)
+            itinerary_ids = list(itineraries.values_list("pk", flat=True))
+            deleted_count, _ = itineraries.delete()
+            # Clients don't sync itineraries this old, so the tombstones that
+            # were created for their team members are removed with the old ones
+            ItineraryTombstone.objects.filter(
+                Q(deleted_at__lt=one_month_ago) | Q(itinerary_id__in=itinerary_ids)
+            ).delete()
         logger.info(f"Ended itineraries cleanup, deleted {deleted_count} itineraries")
 
     except Exception as exception:
@@ -1,8 +1,16 @@
+from datetime import timedelta
 from unittest.mock import patch
 
-from apps.itinerary.models import Itinerary, ItinerarySettings
+from apps.itinerary.models import Itinerary, ItinerarySettings, Note
+from apps.planner.models import DaySettings, PlannerTicket
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from freezegun import freeze_time
+from model_bakery import baker
 from rest_framework import status
 from rest_framework.test import APITestCase
 
@@ -219,6 +227,105 @@ class ItineraryViewsGetTest(APITestCase):
         self.assertEqual(response.json(), expected_respsonse)
 
 
+@override_settings(ITINERARY_SYNC_OVERLAP=0)
+class ItineraryViewsChangedSinceTest(APITestCase):
+    """
+    Tests for syncing the changes of itineraries with changed_since
+    """
+
+    def setUp(self):
+        self.user = get_test_user()
+        self.client = get_authenticated_client()
+        self.url = reverse("v1:itinerary-list")
+
+        self.itinerary = Itinerary.objects.create()
+        self.itinerary.add_team_members([self.user.id])
+        self.item = self.itinerary.add_case("FOO_CASE_ID_A")
+
+    @patch("apps.itinerary.views.fetch_cases_data")
+    def sync(self, changed_since, mock_fetch_cases_data):
+        mock_fetch_cases_data.side_effect = lambda case_ids, auth_header: {
+            case_id: {"id": case_id} for case_id in case_ids
+        }
+        response = self.client.get(self.url, {"changed_since": changed_since})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_nothing_changed(self):
+        """
+        Returns nothing if nothing changed since the previous sync
+        """
+        synced_at = self.sync("2020-01-01T00:00:00Z")["synced_at"]
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.sync(synced_at)
+
+        self.assertEqual(response["itineraries"], [])
+        self.assertEqual(response["deleted"], [])
+        self.assertLessEqual(len(context.captured_queries), 4)
+
+    def test_changed_note(self):
+        """
+        Returns the itinerary after a note of one of its items changed
+        """
+        synced_at = self.sync("2020-01-01T00:00:00Z")["synced_at"]
+        Note.objects.create(itinerary_item=self.item, author=self.user, text="FOO")
+
+        response = self.sync(synced_at)
+
+        self.assertEqual(
+            [itinerary["id"] for itinerary in response["itineraries"]],
+            [self.itinerary.id],
+        )
+
+    def test_deleted(self):
+        """
+        Returns the ids of deleted itineraries and of itineraries the user left
+        """
+        other_itinerary = Itinerary.objects.create()
+        other_itinerary.add_team_members([self.user.id])
+        synced_at = self.sync("2020-01-01T00:00:00Z")["synced_at"]
+
+        itinerary_id = self.itinerary.id
+        self.itinerary.delete()
+        other_itinerary.clear_team_members()
+
+        response = self.sync(synced_at)
+
+        self.assertEqual(response["itineraries"], [])
+        self.assertEqual(
+            response["deleted"], sorted([itinerary_id, other_itinerary.id])
+        )
+
+    @override_settings(ITINERARY_SYNC_OVERLAP=60)
+    def test_committed_after_sync(self):
+        """
+        Returns the itineraries of changes that were stamped before the previous
+        sync, but committed after it
+        """
+        synced_at = self.sync("2020-01-01T00:00:00Z")["synced_at"]
+        other_itinerary = Itinerary.objects.create()
+        other_itinerary.add_team_members([self.user.id])
+        Itinerary.objects.filter(pk=other_itinerary.pk).update(
+            updated_at=timezone.now() - timedelta(seconds=30)
+        )
+
+        response = self.sync(synced_at)
+
+        self.assertIn(
+            other_itinerary.id,
+            [itinerary["id"] for itinerary in response["itineraries"]],
+        )
+
+    def test_invalid_changed_since(self):
+        """
+        Fails if changed_since is not a datetime
+        """
+        response = self.client.get(self.url, {"changed_since": "FOO"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
 class ItineraryViewsCreateTest(APITestCase):
     """
     Tests for the API endpoint for creating itineraries
@@ -263,6 +370,187 @@ class ItineraryViewsCreateTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
         self.assertEqual(Itinerary.objects.count(), 0)
 
+    @patch("apps.itinerary.views.Itinerary.get_cases_from_settings")
+    def test_create_max_use_limit_reached(self, mock_get_cases_from_settings):
+        """
+        Should fail and create no Itinerary if the day settings are used up for today
+        """
+        day_settings = baker.make(DaySettings, max_use_limit=1)
+        baker.make(ItinerarySettings, day_settings=day_settings)
+        self.assertEqual(Itinerary.objects.count(), 1)
+
+        url = reverse("v1:itinerary-list")
+        client = get_authenticated_client()
+        user = get_test_user()
+
+        response = client.post(
+            url,
+            {
+                "team_members": [{"user": {"id": user.id}}],
+                "day_settings_id": day_settings.id,
+                "target_length": 8,
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Itinerary.objects.count(), 1)
+        mock_get_cases_from_settings.assert_not_called()
+
+    @patch("apps.itinerary.views.Itinerary.get_cases_from_settings")
+    def test_create_max_use_limit_reached_during_generation(
+        self, mock_get_cases_from_settings
+    ):
+        """
+        Should fail and create no Itinerary if the day settings were used up by
+        another generation during the search
+        """
+        day_settings = baker.make(DaySettings, max_use_limit=1)
+
+        def generate_concurrently(*args, **kwargs):
+            baker.make(ItinerarySettings, day_settings=day_settings)
+            return [{"id": "1"}]
+
+        mock_get_cases_from_settings.side_effect = generate_concurrently
+
+        url = reverse("v1:itinerary-list")
+        client = get_authenticated_client()
+        user = get_test_user()
+
+        with CaptureQueriesContext(connection) as context:
+            response = client.post(
+                url,
+                {
+                    "team_members": [{"user": {"id": user.id}}],
+                    "day_settings_id": day_settings.id,
+                    "target_length": 8,
+                },
+                format="json",
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Itinerary.objects.count(), 1)
+        self.assertTrue(
+            any("FOR UPDATE" in query["sql"] for query in context.captured_queries)
+        )
+
+    @patch("apps.itinerary.views.Itinerary.get_cases_from_settings")
+    def test_create_without_max_use_limit_not_locked(
+        self, mock_get_cases_from_settings
+    ):
+        """
+        Day settings without a max use limit aren't locked, so their generations
+        don't wait for each other
+        """
+        day_settings = baker.make(DaySettings, max_use_limit=0)
+        mock_get_cases_from_settings.return_value = [{"id": "1"}]
+
+        url = reverse("v1:itinerary-list")
+        client = get_authenticated_client()
+        user = get_test_user()
+
+        with CaptureQueriesContext(connection) as context:
+            response = client.post(
+                url,
+                {
+                    "team_members": [{"user": {"id": user.id}}],
+                    "day_settings_id": day_settings.id,
+                    "target_length": 8,
+                },
+                format="json",
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(
+            any("FOR UPDATE" in query["sql"] for query in context.captured_queries)
+        )
+
+    @override_settings(
+        PLANNER_MAX_CONCURRENT_GENERATIONS=1,
+        PLANNER_QUEUE_TIMEOUT=0,
+        PLANNER_GENERATION_TIME=10,
+    )
+    @patch("apps.itinerary.views.Itinerary.get_cases_from_settings")
+    def test_create_queued(self, mock_get_cases_from_settings):
+        """
+        Should report the generation as queued when the other generations
+        don't finish in time
+        """
+        cache.clear()
+        baker.make(PlannerTicket)
+        day_settings = baker.make(DaySettings)
+
+        url = reverse("v1:itinerary-list")
+        client = get_authenticated_client()
+        user = get_test_user()
+
+        response = client.post(
+            url,
+            {
+                "team_members": [{"user": {"id": user.id}}],
+                "day_settings_id": day_settings.id,
+                "target_length": 8,
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response.json()["status"], "queued")
+        self.assertEqual(response.json()["position"], "1")
+        self.assertEqual(response["Retry-After"], "10")
+        self.assertEqual(Itinerary.objects.count(), 0)
+        mock_get_cases_from_settings.assert_not_called()
+
+        # The retry keeps the place of the queued request
+        response = client.post(
+            url,
+            {
+                "team_members": [{"user": {"id": user.id}}],
+                "day_settings_id": day_settings.id,
+                "target_length": 8,
+                "ticket": response.json()["ticket"],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(PlannerTicket.objects.count(), 2)
+
+    @patch("apps.itinerary.views.Itinerary.get_cases_from_settings")
+    def test_create_in_bulk(self, mock_get_cases_from_settings):
+        """
+        The cases are added in bulk, so the queries don't grow with the number of cases
+        """
+        day_settings = baker.make(DaySettings)
+        mock_get_cases_from_settings.return_value = [
+            {"id": str(case_id)} for case_id in range(20)
+        ]
+
+        url = reverse("v1:itinerary-list")
+        client = get_authenticated_client()
+        user = get_test_user()
+
+        with CaptureQueriesContext(connection) as context:
+            response = client.post(
+                url,
+                {
+                    "team_members": [{"user": {"id": user.id}}],
+                    "day_settings_id": day_settings.id,
+                    "target_length": 8,
+                },
+                format="json",
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertLessEqual(len(context.captured_queries), 30)
+
+        itinerary = Itinerary.objects.get(id=response.json()["id"])
+        items = itinerary.items.order_by("position")
+        self.assertEqual(
+            [(item.case.case_id, item.position) for item in items],
+            [(str(case_id), case_id + 1) for case_id in range(20)],
+        )
+        self.assertEqual(itinerary.team_members.get().user, user)
+
     # @patch("apps.itinerary.views.Itinerary.get_cases_from_settings")
     # def test_create(self, mock_get_cases_from_settings):
     #     """
@@ -333,6 +621,76 @@ class ItineraryViewsDeleteTest(APITestCase):
         self.assertEqual(Itinerary.objects.count(), 0)
 
 
+class ItineraryViewsReorderTest(APITestCase):
+    """
+    Tests for the API endpoint for reordering the items of an itinerary
+    """
+
+    def setUp(self):
+        self.itinerary = Itinerary.objects.create()
+        self.items = self.itinerary.add_cases(
+            ["FOO_CASE_ID_A", "FOO_CASE_ID_B", "FOO_CASE_ID_C"]
+        )
+        self.url = reverse("v1:itinerary-reorder", kwargs={"pk": self.itinerary.id})
+
+    def test_unauthenticated_request_reorder(self):
+        """
+        An unauthenticated request should not be possible
+        """
+        client = get_unauthenticated_client()
+        response = client.put(self.url, {"items": []}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_reorder(self):
+        """
+        Renumbers the items in the given order with a single update
+        """
+        item_a, item_b, item_c = self.items
+        client = get_authenticated_client()
+
+        with CaptureQueriesContext(connection) as context:
+            response = client.put(
+                self.url, {"items": [item_c.id, item_a.id, item_b.id]}, format="json"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json(),
+            [
+                {"id": item_c.id, "position": 1},
+                {"id": item_a.id, "position": 2},
+                {"id": item_b.id, "position": 3},
+            ],
+        )
+        updates = [
+            query
+            for query in context.captured_queries
+            if query["sql"].startswith('UPDATE "itinerary_itineraryitem"')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(
+            list(self.itinerary.items.values_list("id", flat=True)),
+            [item_c.id, item_a.id, item_b.id],
+        )
+
+    def test_reorder_outdated(self):
+        """
+        Fails without changes if the ids don't match the items of the itinerary
+        """
+        item_a, item_b, item_c = self.items
+        client = get_authenticated_client()
+
+        response = client.put(
+            self.url, {"items": [item_b.id, item_a.id]}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            list(self.itinerary.items.values_list("id", flat=True)),
+            [item_a.id, item_b.id, item_c.id],
+        )
+
+
 class ItineraryViewsSuggestionsTest(APITestCase):
     """
     Tests for the API endpoint for retrieving suggestions
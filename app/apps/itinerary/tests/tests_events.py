@@ -0,0 +1,183 @@
+"""
+Tests for the itinerary event streams
+"""
+
+import datetime
+import json
+from unittest.mock import AsyncMock, Mock, patch
+
+from apps.itinerary.events import (
+    authenticate_events_token,
+    get_channel,
+    get_events_token,
+)
+from apps.itinerary.models import Itinerary, Note
+from asgiref.sync import sync_to_async
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from freezegun import freeze_time
+from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from app.utils.unittest_helpers import (
+    get_authenticated_client,
+    get_test_user,
+    get_unauthenticated_client,
+)
+
+
+class PublishItineraryEventTest(TestCase):
+    def setUp(self):
+        self.user = get_test_user()
+        self.itinerary = Itinerary.objects.create()
+        self.item = self.itinerary.add_case("FOO_CASE_ID_A")
+
+    @override_settings(ITINERARY_EVENTS_ENABLED=True)
+    @patch("apps.itinerary.events.get_redis_client")
+    def test_publish_on_commit(self, mock_get_redis_client):
+        """
+        A saved note is published on the channel of its itinerary, after the commit
+        """
+        with self.captureOnCommitCallbacks() as callbacks:
+            note = Note.objects.create(
+                itinerary_item=self.item, author=self.user, text="FOO"
+            )
+            mock_get_redis_client.return_value.publish.assert_not_called()
+
+        for callback in callbacks:
+            callback()
+
+        mock_get_redis_client.return_value.publish.assert_called_once_with(
+            get_channel(self.itinerary.id),
+            json.dumps({"type": "note", "action": "saved", "id": note.id}),
+        )
+
+    @override_settings(ITINERARY_EVENTS_ENABLED=True)
+    @patch("apps.itinerary.events.get_redis_client")
+    def test_publish_failure(self, mock_get_redis_client):
+        """
+        Changes are saved when Redis is unavailable
+        """
+        mock_get_redis_client.return_value.publish.side_effect = Exception("Down")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Note.objects.create(itinerary_item=self.item, author=self.user, text="FOO")
+
+        self.assertEqual(Note.objects.count(), 1)
+
+
+@override_settings(ROOT_URLCONF="settings.urls_events")
+class ItineraryEventsViewTest(TestCase):
+    def setUp(self):
+        self.itinerary = Itinerary.objects.create()
+        self.url = f"/api/v1/itineraries/{self.itinerary.id}/events/"
+
+    async def get_authenticated(self, url):
+        user = await sync_to_async(get_test_user)()
+        access_token = RefreshToken.for_user(user).access_token
+        return await AsyncClient().get(
+            url, headers={"Authorization": f"Bearer {access_token}"}
+        )
+
+    async def test_unauthenticated_request(self):
+        """
+        An unauthenticated request should not be possible
+        """
+        response = await AsyncClient().get(self.url)
+        self.assertEqual(response.status_code, 401)
+
+    async def test_not_found(self):
+        """
+        Streams only exist for existing itineraries
+        """
+        response = await self.get_authenticated("/api/v1/itineraries/0/events/")
+        self.assertEqual(response.status_code, 404)
+
+    def mock_pubsub(self, mock_from_url):
+        pubsub = Mock(subscribe=AsyncMock(), aclose=AsyncMock())
+        pubsub.get_message = AsyncMock(side_effect=[{"data": b'{"id": 1}'}, None])
+        mock_from_url.return_value = Mock(
+            pubsub=Mock(return_value=pubsub), aclose=AsyncMock()
+        )
+        return pubsub
+
+    @patch("apps.itinerary.events.redis.asyncio.Redis.from_url")
+    async def test_stream_with_token(self, mock_from_url):
+        """
+        A native EventSource subscribes with an events token in the query string
+        """
+        pubsub = self.mock_pubsub(mock_from_url)
+        user = await sync_to_async(get_test_user)()
+        token = get_events_token(user, self.itinerary.id)
+
+        response = await AsyncClient().get(self.url, {"token": token})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'data: {"id": 1}\n\n')
+        pubsub.subscribe.assert_awaited_once_with(get_channel(self.itinerary.id))
+
+    async def test_invalid_token(self):
+        """
+        Tokens of other itineraries and invalid tokens aren't accepted
+        """
+        user = await sync_to_async(get_test_user)()
+        other_itinerary = await Itinerary.objects.acreate()
+
+        for token in [get_events_token(user, other_itinerary.id), "FOO_TOKEN"]:
+            response = await AsyncClient().get(self.url, {"token": token})
+            self.assertEqual(response.status_code, 401)
+
+    @patch("apps.itinerary.events.redis.asyncio.Redis.from_url")
+    async def test_stream(self, mock_from_url):
+        """
+        Published events are streamed as server-sent events, with keep-alives
+        """
+        pubsub = self.mock_pubsub(mock_from_url)
+
+        response = await self.get_authenticated(self.url)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'data: {"id": 1}\n\n')
+        self.assertEqual(await anext(stream), b": keep-alive\n\n")
+
+        pubsub.subscribe.assert_awaited_once_with(get_channel(self.itinerary.id))
+
+
+class EventsTokenTest(TestCase):
+    def setUp(self):
+        self.itinerary = Itinerary.objects.create()
+        self.url = reverse(
+            "v1:itinerary-events-token", kwargs={"pk": self.itinerary.id}
+        )
+
+    def test_unauthenticated_request(self):
+        """
+        An unauthenticated request should not be possible
+        """
+        response = get_unauthenticated_client().post(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token(self):
+        """
+        The token subscribes the user to the events of the itinerary, until it expires
+        """
+        response = get_authenticated_client().post(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        token = response.json()["token"]
+        self.assertEqual(
+            authenticate_events_token(token, self.itinerary.id), get_test_user()
+        )
+        self.assertIsNone(authenticate_events_token(token, self.itinerary.id + 1))
+
+        with freeze_time(timezone.now() + datetime.timedelta(seconds=61)):
+            self.assertIsNone(authenticate_events_token(token, self.itinerary.id))
+
+    def test_not_found(self):
+        url = reverse("v1:itinerary-events-token", kwargs={"pk": 0})
+        response = get_authenticated_client().post(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -11,8 +11,9 @@ from apps.itinerary.models import (
 from apps.planner.models import DaySettings, TeamSettings
 from apps.users.models import User
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from freezegun import freeze_time
 
 
@@ -49,6 +50,27 @@ class ItineraryModelTest(TestCase):
         self.assertEqual(itinerary.items.count(), 2)
         self.assertEqual(ItineraryItem.objects.count(), 2)
 
+    def test_add_cases(self, mock):
+        """
+        add_cases appends the cases in order, and fails if a case is already used
+        """
+        itinerary = Itinerary.objects.create()
+        itinerary.add_case("FOO_CASE_ID_A", 3)
+        itinerary.add_cases(["FOO_CASE_ID_B", "FOO_CASE_ID_C"])
+
+        items = itinerary.items.order_by("position")
+        self.assertEqual(
+            [(item.case.case_id, item.position) for item in items],
+            [("FOO_CASE_ID_A", 3), ("FOO_CASE_ID_B", 4), ("FOO_CASE_ID_C", 5)],
+        )
+
+        other_itinerary = Itinerary.objects.create()
+        with self.assertRaises(ValueError):
+            other_itinerary.add_cases(["FOO_CASE_ID_D", "FOO_CASE_ID_A"])
+        with self.assertRaises(ValueError):
+            other_itinerary.add_cases(["FOO_CASE_ID_D", "FOO_CASE_ID_D"])
+        self.assertEqual(other_itinerary.items.count(), 0)
+
     def test_add_case_with_positions(self, mock):
         """
         add_case with positions
@@ -184,10 +206,33 @@ class ItineraryModelTest(TestCase):
         itinerary.get_cases = Mock(return_value=mock_cases)
 
         expected_center = {"lat": 1.5, "lng": 1.5}
-        center = itinerary.get_center()
+        with override_settings(USE_ZAKEN_MOCK_DATA=True):
+            center = itinerary.get_center()
 
         self.assertEqual(expected_center, center)
 
+    @patch("apps.itinerary.models.iter_cases_data")
+    def test_get_center_from_chunks(self, mock_iter_cases_data, mock):
+        """
+        Returns the center of the cases of all chunks of case details, leaving out
+        cases without a location
+        """
+        itinerary = Itinerary.objects.create()
+        itinerary.get_cases = Mock(
+            return_value=[Mock(case_id=case_id) for case_id in ("1", "2", "3")]
+        )
+        mock_iter_cases_data.return_value = iter(
+            [
+                {"1": {"address": {"lat": 1, "lng": 1}}},
+                {"2": {"address": {"lat": 2, "lng": 2}}, "3": {"deleted": True}},
+            ]
+        )
+
+        center = itinerary.get_center("FOO_AUTH_HEADER")
+
+        self.assertEqual(center, {"lat": 1.5, "lng": 1.5})
+        mock_iter_cases_data.assert_called_once_with(["1", "2", "3"], "FOO_AUTH_HEADER")
+
     def test_get_center_no_cases(self, mock):
         """
         Returns the city if no cases are present in the itinerary
@@ -214,7 +259,9 @@ class ItineraryModelTest(TestCase):
         """
         Calls the suggestionAlgorithm generate and exclude functions
         """
-        Itinerary.get_suggestion_algorithm = Mock()
+        patcher = patch.object(Itinerary, "get_suggestion_algorithm")
+        patcher.start()
+        self.addCleanup(patcher.stop)
         itinerary = Itinerary.objects.create()
         ItinerarySettings.objects.create(opening_date="2020-04-04", itinerary=itinerary)
         PostalCodeSettings.objects.create(
@@ -230,11 +277,44 @@ class ItineraryModelTest(TestCase):
         itinerary.get_suggestion_algorithm().exclude.assert_called()
         itinerary.get_suggestion_algorithm().generate.assert_called()
 
+    @patch.object(Itinerary, "generate_suggestions")
+    def test_get_suggestions_cached(self, mock_generate_suggestions, mock):
+        """
+        Suggestions are cached per map tile, until a case is added to an itinerary
+        """
+        cache.clear()
+        mock_generate_suggestions.return_value = [{"id": "FOO_CASE_ID_B"}]
+        itinerary = Itinerary.objects.create()
+        with self.captureOnCommitCallbacks(execute=True):
+            itinerary.add_cases(["FOO_CASE_ID_A"])
+
+        itinerary.get_suggestions(center={"lat": "52.373100", "lng": "4.892600"})
+        suggestions = itinerary.get_suggestions(
+            center={"lat": "52.373101", "lng": "4.892601"}
+        )
+
+        self.assertEqual(suggestions, [{"id": "FOO_CASE_ID_B"}])
+        mock_generate_suggestions.assert_called_once()
+
+        itinerary.get_suggestions(center={"lat": "52.38", "lng": "4.90"})
+        self.assertEqual(mock_generate_suggestions.call_count, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Itinerary.objects.create().add_cases(["FOO_CASE_ID_B"])
+            # Until the case is committed, the suggestions stay cached
+            itinerary.get_suggestions(center={"lat": "52.38", "lng": "4.90"})
+            self.assertEqual(mock_generate_suggestions.call_count, 2)
+
+        itinerary.get_suggestions(center={"lat": "52.38", "lng": "4.90"})
+        self.assertEqual(mock_generate_suggestions.call_count, 3)
+
     def test_get_cases_from_settings(self, mock):
         """
         Calls the itineraryAlgorithm generate and exclude functions
         """
-        Itinerary.get_itinerary_algorithm = Mock()
+        patcher = patch.object(Itinerary, "get_itinerary_algorithm")
+        patcher.start()
+        self.addCleanup(patcher.stop)
         itinerary = Itinerary.objects.create()
 
         team_settings = TeamSettings.objects.create()
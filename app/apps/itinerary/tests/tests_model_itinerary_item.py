@@ -1,8 +1,15 @@
+from datetime import timedelta
 from unittest.mock import patch
 
 from apps.cases.models import Case
-from apps.itinerary.models import Itinerary, ItineraryItem
+from apps.itinerary.models import SUGGESTIONS_CACHE_VERSION, Itinerary, ItineraryItem
+from apps.users.models import User
+from apps.visits.models import Visit
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+from freezegun import freeze_time
+from utils.cache import get_version
 
 FOO_CASE_ID_A = "FOO_CASE_ID_A"
 FOO_CASE_ID_B = "FOO_CASE_ID_B"
@@ -97,3 +104,71 @@ class ItineraryItemModelTest(TestCase):
 
         with self.assertRaises(Exception):
             ItineraryItem.objects.create(itinerary=itinerary, case=same_case)
+
+    @freeze_time("2024-06-01 12:00:00")
+    def test_get_visits_for_day(self, mock):
+        """
+        Only returns the visits on the day of the itinerary, also when prefetched
+        """
+        itinerary_item = self.get_itinerary_item()
+        user = User.objects.create(email="foo@foo.com")
+        visit = Visit.objects.create(
+            case_id=itinerary_item.case,
+            itinerary_item=itinerary_item,
+            author=user,
+            start_time=timezone.now(),
+        )
+        Visit.objects.create(
+            case_id=itinerary_item.case,
+            itinerary_item=itinerary_item,
+            author=user,
+            start_time=timezone.now() - timedelta(days=1),
+        )
+
+        self.assertEqual(list(itinerary_item.get_visits_for_day()), [visit])
+
+        itinerary = Itinerary.objects.with_related().get(pk=itinerary_item.itinerary.pk)
+        with self.assertNumQueries(0):
+            prefetched_item = itinerary.items.all()[0]
+            self.assertEqual(list(prefetched_item.get_visits_for_day()), [visit])
+
+
+class ItineraryItemSuggestionsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.itinerary = Itinerary.objects.create()
+
+    def assertInvalidatesSuggestions(self, function, invalidates=True):
+        version = get_version(SUGGESTIONS_CACHE_VERSION)
+        with self.captureOnCommitCallbacks(execute=True):
+            function()
+            # The version is only bumped when the transaction is committed
+            self.assertEqual(get_version(SUGGESTIONS_CACHE_VERSION), version)
+        self.assertEqual(
+            get_version(SUGGESTIONS_CACHE_VERSION), version + int(invalidates)
+        )
+
+    def test_case_added_or_removed(self):
+        """
+        Adding, changing or removing the case of an item invalidates the suggestions
+        """
+        item = ItineraryItem(itinerary=self.itinerary, case=Case.get(FOO_CASE_ID_A))
+        self.assertInvalidatesSuggestions(item.save)
+
+        item.case = Case.get(FOO_CASE_ID_B)
+        self.assertInvalidatesSuggestions(item.save)
+
+        item = ItineraryItem.objects.get(pk=item.pk)
+        self.assertInvalidatesSuggestions(item.delete)
+
+    def test_position_changed(self):
+        """
+        Changing the position of an item doesn't invalidate the suggestions
+        """
+        item = ItineraryItem.objects.create(
+            itinerary=self.itinerary, case=Case.get(FOO_CASE_ID_A)
+        )
+        item = ItineraryItem.objects.get(pk=item.pk)
+        item.position = 5
+
+        self.assertInvalidatesSuggestions(item.save, invalidates=False)
@@ -0,0 +1,34 @@
+"""
+Tests for the itinerary tasks
+"""
+
+from datetime import timedelta
+
+from apps.itinerary.models import Itinerary, ItineraryTombstone
+from apps.itinerary.tasks import clean_up_itineraries_task
+from django.test import TestCase
+from django.utils import timezone
+from freezegun import freeze_time
+
+from app.utils.unittest_helpers import get_test_user
+
+
+class CleanUpItinerariesTaskTest(TestCase):
+    def test_clean_up(self):
+        """
+        Deletes the old itineraries without leaving tombstones for their team
+        members, and the old tombstones
+        """
+        user = get_test_user()
+        with freeze_time(timezone.now() - timedelta(days=40)):
+            old_itinerary = Itinerary.objects.create()
+            old_itinerary.add_team_members([user.id])
+            ItineraryTombstone.objects.create(itinerary_id=1234, user=user)
+        itinerary = Itinerary.objects.create()
+        itinerary.add_team_members([user.id])
+        tombstone = ItineraryTombstone.objects.create(itinerary_id=5678, user=user)
+
+        clean_up_itineraries_task.run()
+
+        self.assertEqual(list(Itinerary.objects.all()), [itinerary])
+        self.assertEqual(list(ItineraryTombstone.objects.all()), [tombstone])
@@ -1,23 +1,28 @@
 import logging
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 
+from apps.itinerary.events import get_events_token, publish_itinerary_event
 from apps.itinerary.models import Itinerary, ItineraryItem, Note
 from apps.itinerary.serializers import (
     ItineraryDetailSerializer,
     ItineraryItemCreateSerializer,
     ItineraryItemSerializer,
+    ItineraryItemsOrderSerializer,
     ItineraryItemUpdateSerializer,
     ItinerarySerializer,
     ItinerarySummarySerializer,
     ItineraryTeamMemberSerializer,
     NoteCrudSerializer,
 )
+from apps.planner.concurrency import planner_turn
 from apps.users.models import User
 from apps.users.utils import get_auth_header_from_request
-from django.db import transaction
+from django.conf import settings
 from django.db.models import Count
-from django.http import Http404, JsonResponse
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import (
@@ -27,7 +32,7 @@ from drf_spectacular.utils import (
     extend_schema,
 )
 from rest_framework.decorators import action
-from rest_framework.exceptions import APIException, NotFound
+from rest_framework.exceptions import APIException, NotFound, ValidationError
 from rest_framework.generics import GenericAPIView
 from rest_framework.mixins import (
     CreateModelMixin,
@@ -37,8 +42,9 @@ from rest_framework.mixins import (
 )
 from rest_framework.response import Response
 from rest_framework.viewsets import ViewSet
-from settings.const import ITINERARY_NOT_ENOUGH_CASES
+from settings.const import ITINERARY_ITEMS_ORDER_OUTDATED, ITINERARY_NOT_ENOUGH_CASES
 from utils.queries_zaken_api import fetch_cases_data
+from utils.renderers import JsonResponse
 
 logger = logging.getLogger(__name__)
 
@@ -60,6 +66,12 @@ class ItineraryViewSet(
             return ItineraryDetailSerializer
         return ItinerarySerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == "retrieve":
+            queryset = queryset.with_related()
+        return queryset
+
     def get_object(self):
         MESSAGE = (
             "De looplijst is niet gevonden. De lijst is misschien verwijderd door een"
@@ -70,15 +82,22 @@ class ItineraryViewSet(
         except Http404:
             raise NotFound(MESSAGE)
 
-    def __get_all_itineraries__(self, user, date=None):
+    def __get_all_itineraries__(self, user, date=None, changed_since=None):
         itineraries = Itinerary.objects.filter(team_members__user=user)
 
         if date:
             itineraries = itineraries.filter(created_at=date)
+        if changed_since:
+            itineraries = itineraries.filter(updated_at__gt=changed_since)
+        itineraries = list(itineraries.with_related())
 
         # Collect all case_ids for items in the filtered itineraries
-        item_qs = ItineraryItem.objects.filter(itinerary__in=itineraries)
-        case_ids = list(item_qs.values_list("case__case_id", flat=True))
+        case_ids = [
+            item.case.case_id
+            for itinerary in itineraries
+            for item in itinerary.items.all()
+            if item.case
+        ]
 
         # Batch fetch case details from Zaken and pass via context
         auth_header = get_auth_header_from_request(self.request)
@@ -92,6 +111,34 @@ class ItineraryViewSet(
 
         return serializer.data
 
+    def __get_deleted_itinerary_ids__(self, user, changed_since):
+        """
+        Returns the ids of itineraries the user lost since the given time,
+        because they were deleted or the user was removed from the team
+        """
+        tombstones = user.itinerary_tombstones.filter(deleted_at__gt=changed_since)
+        tombstones = tombstones.exclude(
+            itinerary_id__in=Itinerary.objects.filter(team_members__user=user).values(
+                "pk"
+            )
+        )
+
+        return sorted(set(tombstones.values_list("itinerary_id", flat=True)))
+
+    def retrieve(self, request, *args, **kwargs):
+        itinerary = self.get_object()
+
+        # Batch fetch case details from Zaken and pass via context
+        case_ids = [item.case.case_id for item in itinerary.items.all() if item.case]
+        cases_data_cache = fetch_cases_data(
+            case_ids, get_auth_header_from_request(request)
+        )
+
+        context = self.get_serializer_context()
+        context["cases_data_cache"] = cases_data_cache
+        serializer = self.get_serializer(itinerary, context=context)
+        return Response(serializer.data)
+
     def __get_date_from_query_parameter__(self, request):
         """
         Returns a datetime date object if the query parameters contained a date
@@ -109,6 +156,28 @@ class ItineraryViewSet(
             # Return a generic error to the client
             raise APIException("Invalid date format. Please use YYYY-MM-DD.")
 
+    def __get_changed_since_from_query_parameter__(self, request):
+        """
+        Returns an aware datetime if the query parameters contained changed_since
+        """
+        changed_since_string = request.query_params.get("changed_since", None)
+
+        if not changed_since_string:
+            return
+
+        try:
+            changed_since = parse_datetime(changed_since_string)
+        except ValueError:
+            changed_since = None
+        if changed_since is None:
+            raise ValidationError(
+                "Invalid changed_since format. Please use an ISO 8601 datetime."
+            )
+
+        if timezone.is_naive(changed_since):
+            changed_since = timezone.make_aware(changed_since)
+        return changed_since
+
     def __get_serialized_team__(self, itinerary_pk):
         itinerary = self.get_object()
         team_members = itinerary.team_members
@@ -140,6 +209,40 @@ class ItineraryViewSet(
             self.__replace_team_members__(pk, new_team_members)
             return self.__get_serialized_team__(pk)
 
+    @extend_schema(
+        request=ItineraryItemsOrderSerializer,
+        responses=ItineraryItemUpdateSerializer(many=True),
+    )
+    @action(detail=True, methods=["put"])
+    def reorder(self, request, pk):
+        """
+        Reorders all items of the itinerary in one request, given the ordered item ids
+        """
+        serializer = ItineraryItemsOrderSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        itinerary = self.get_object()
+
+        try:
+            items = itinerary.reorder_items(serializer.validated_data["items"])
+        except ValueError:
+            raise ValidationError(ITINERARY_ITEMS_ORDER_OUTDATED)
+        publish_itinerary_event(itinerary.id, {"type": "items", "action": "reordered"})
+
+        return Response(ItineraryItemUpdateSerializer(items, many=True).data)
+
+    @extend_schema(
+        request=None,
+        responses={200: OpenApiTypes.OBJECT},
+    )
+    @action(detail=True, methods=["post"], url_path="events-token")
+    def events_token(self, request, pk):
+        """
+        Returns a short-lived token to subscribe to the events of the itinerary
+        with a native EventSource: /api/v1/itineraries/<id>/events/?token=<token>
+        """
+        itinerary = self.get_object()
+        return Response({"token": get_events_token(request.user, itinerary.id)})
+
     @extend_schema(
         parameters=[
             OpenApiParameter(
@@ -173,8 +276,14 @@ class ItineraryViewSet(
         cases = itinerary.get_suggestions(get_auth_header_from_request(request), center)
         return JsonResponse({"cases": cases})
 
-    @transaction.atomic
     def create(self, request):
+        # Waits for the turn of the generation outside of a transaction,
+        # so the other workers see its place in the queue. A queued client
+        # retries with the ticket of the response, to keep its place.
+        with planner_turn(request.data.get("ticket")):
+            return self.create_itinerary(request)
+
+    def create_itinerary(self, request):
         serializer = ItinerarySerializer(data=request.data)
 
         if not serializer.is_valid():
@@ -182,35 +291,65 @@ class ItineraryViewSet(
                 "Could not create itinerary (serializer): {}".format(serializer.errors)
             )
 
-        # Create the itinerary
+        # The cases are generated before the itinerary is saved, so no transaction
+        # or lock is held during the search
         try:
-            itinerary = serializer.create(request.data)
+            itinerary, postal_code_settings = serializer.build(request.data)
             cases = itinerary.get_cases_from_settings(
-                get_auth_header_from_request(request)
+                get_auth_header_from_request(request), postal_code_settings
+            )
+            if not len(cases):
+                raise NotFound(ITINERARY_NOT_ENOUGH_CASES)
+
+            itinerary = serializer.create_generated(
+                request.data, itinerary, postal_code_settings, cases
             )
+        except APIException:
+            raise
         except Exception:
             raise APIException("Could not create itinerary from settings.")
 
-        if not len(cases):
-            raise NotFound(ITINERARY_NOT_ENOUGH_CASES)
-
-        # Populate the itinerary with cases
-        for case in cases:
-            case_id = case.get("id")
-            itinerary.add_case(case_id)
-
         return Response(
             {"message": "Itinerary created successfully", "id": itinerary.id}
         )
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="changed_since",
+                type=OpenApiTypes.DATETIME,
+                location=OpenApiParameter.QUERY,
+                required=False,
+                description=(
+                    "Only returns the itineraries changed since this time, and the ids"
+                    " of deleted itineraries. Use synced_at of the previous response."
+                    " Consecutive syncs overlap, so an itinerary can be returned again."
+                ),
+            ),
+        ],
+    )
     def list(self, request):
+        # Taken before the queries, so changes during this request are in the next sync.
+        # Changes are stamped before their transaction commits, so changes that commit
+        # after this sync but are stamped before it are in the next sync too.
+        synced_at = timezone.now() - timedelta(seconds=settings.ITINERARY_SYNC_OVERLAP)
         date = self.__get_date_from_query_parameter__(request)
+        changed_since = self.__get_changed_since_from_query_parameter__(request)
         user = get_object_or_404(User, id=request.user.id)
-        itineraries = self.__get_all_itineraries__(user, date)
+        itineraries = self.__get_all_itineraries__(user, date, changed_since)
+
+        if not changed_since:
+            return Response(
+                {
+                    "itineraries": itineraries,
+                }
+            )
 
         return Response(
             {
                 "itineraries": itineraries,
+                "deleted": self.__get_deleted_itinerary_ids__(user, changed_since),
+                "synced_at": synced_at,
             }
         )
 
@@ -243,8 +382,7 @@ class ItineraryViewSet(
         qs = (
             Itinerary.objects.filter(team_members__user=request.user)
             .distinct()
-            .prefetch_related("team_members")
-            .select_related("settings__day_settings__team_settings")
+            .with_related(summary=True)
             .filter(created_at=date.today())
             .annotate(num_cases=Count("items"))
         )
@@ -5,8 +5,9 @@ from apps.planner.models import (
     TeamSettings,
     Weights,
 )
-from django.contrib import admin
+from django.contrib import admin, messages
 from settings.const import WEEK_DAYS
+from utils.queries_zaken_api import get_reference_data_paths, invalidate_reference_data
 
 
 class DaySettingsInline(admin.TabularInline):
@@ -62,7 +63,13 @@ class TeamSettingsAdmin(admin.ModelAdmin):
             "Algoritm options",
             {
                 "classes": ("collapse",),
-                "fields": ("default_weights", "top_cases_count"),
+                "fields": (
+                    "default_weights",
+                    "top_cases_count",
+                    "start_at_depot",
+                    "depot_lat",
+                    "depot_lng",
+                ),
             },
         ),
         (
@@ -74,6 +81,19 @@ class TeamSettingsAdmin(admin.ModelAdmin):
         ),
     )
     inlines = [DaySettingsInline]
+    actions = ["invalidate_reference_data"]
+
+    @admin.action(description="Invalidate cached reference data from Zaken")
+    def invalidate_reference_data(self, request, queryset):
+        theme_ids = queryset.exclude(zaken_team_id=None).values_list(
+            "zaken_team_id", flat=True
+        )
+        invalidate_reference_data(get_reference_data_paths(theme_ids))
+        self.message_user(
+            request,
+            "The reference data will be fetched from Zaken on the next request",
+            messages.SUCCESS,
+        )
 
 
 class PostalCodeRangeInline(admin.TabularInline):
@@ -93,10 +113,14 @@ class WeightsAdmin(admin.ModelAdmin):
         "name",
         "distance",
         "priority",
+        "age",
+        "stacked_address",
     )
     list_editable = (
         "distance",
         "priority",
+        "age",
+        "stacked_address",
     )
 
 
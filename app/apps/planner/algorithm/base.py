@@ -3,9 +3,9 @@ import logging
 
 import requests
 from apps.cases.mock import get_zaken_case_list
-from apps.planner.utils import remove_cases_from_list
+from apps.planner.utils import get_pool_version, remove_cases_from_list
 from django.conf import settings
-from utils.queries_zaken_api import get_headers
+from utils.queries_zaken_api import get_headers, read_case_list
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +13,9 @@ logger = logging.getLogger(__name__)
 class ItineraryGenerateAlgorithm:
     """An abstract class which forms the basis of itinerary generating algorithms"""
 
+    # The fields of the eligible cases to keep, all fields when None
+    case_fields = None
+
     def __init__(self, settings, postal_code_settings=[], **kwargs):
         self.auth_header = kwargs.get("auth_header")
         self.settings = settings
@@ -46,16 +49,19 @@ class ItineraryGenerateAlgorithm:
                 params=queryParams,
                 timeout=60,
                 headers=get_headers(self.auth_header),
+                stream=True,
             )
             response.raise_for_status()
+            cases = read_case_list(response, self.case_fields)
             logger.info("Request duration")
             logger.info(datetime.datetime.now() - now)
 
-            cases = response.json().get("results")
-
         logger.info("initial case count")
         logger.info(len(cases))
 
+        # Identifies the pool, e.g. to reuse the results of searches on the same pool
+        self.pool_version = get_pool_version(cases)
+
         exclude_cases = [{"id": case.case_id} for case in self.exclude_cases]
         cases = remove_cases_from_list(cases, exclude_cases)
         logger.info("after remove_cases_from_list")
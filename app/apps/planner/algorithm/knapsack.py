@@ -1,16 +1,27 @@
+import hashlib
+import json
 import logging
-import multiprocessing
 
 from apps.cases.models import Case
 from apps.planner.algorithm.base import ItineraryGenerateAlgorithm
-from apps.planner.const import MAX_SUGGESTIONS_COUNT
+from apps.planner.centers import get_centers
+from apps.planner.concurrency import get_parallel_jobs
+from apps.planner.const import MAX_SUGGESTIONS_COUNT, PLANNER_CASE_FIELDS
 from apps.planner.models import Weights
+from apps.planner.scoring import FEATURES, ScoringEngine
+from apps.planner.travel_costs import get_travel_cost_matrix, get_travel_mode
 from apps.planner.utils import calculate_geo_distances, remove_cases_from_list
 from django.conf import settings
 from joblib import Parallel, delayed
+from utils.cache import ReadThroughCache
 
 logger = logging.getLogger(__name__)
 
+# The ranked lists of a pool, shared by the teams that plan with the same settings
+plan_rankings_cache = ReadThroughCache(
+    "plan-rankings", ttl=settings.PLAN_RANKINGS_CACHE_TTL
+)
+
 
 class ItineraryKnapsackSuggestions(ItineraryGenerateAlgorithm):
     def __init__(
@@ -19,36 +30,36 @@ class ItineraryKnapsackSuggestions(ItineraryGenerateAlgorithm):
         super().__init__(settings, postal_code_settings, **kwargs)
 
         self.weights = Weights()
+        self.travel_costs = None
+        self.scoring_engine = None
 
         if settings_weights:
             self.weights = Weights(
                 distance=settings_weights.distance,
                 priority=settings_weights.priority,
+                age=settings_weights.age,
+                stacked_address=settings_weights.stacked_address,
             )
 
-    def get_score(self, case):
+    def get_scoring_engine(self, cases):
         """
-        Gets the score of the given case
+        The pool features are computed once for all centers of the same pool
         """
-        distance = case.get("normalized_inverse_distance", 0)
-
-        priority = (
-            next(iter(case.get("schedules", [])), {"priority": {"weight": 0}})
-            .get("priority", {})
-            .get("weight", 0)
-        )
-
-        score = self.weights.score(
-            distance,
-            priority,
-        )
-
-        return score
+        scoring_engine = self.scoring_engine
+        if scoring_engine is None or scoring_engine.cases is not cases:
+            scoring_engine = ScoringEngine(cases, self.weights)
+            self.scoring_engine = scoring_engine
+        return scoring_engine
 
     def get_center(self, case):
         return case.get("address", {}).get("lat"), case.get("address", {}).get("lng")
 
-    def generate(self, center_case, cases=[]):
+    def get_distances(self, center_case, cases):
+        if self.travel_costs:
+            return self.travel_costs.get_distances(center_case, cases)
+        return calculate_geo_distances(self.get_center(center_case), cases)
+
+    def generate(self, center_case, cases=[], distances=None):
         if not cases:
             cases = self.__get_eligible_cases__()
 
@@ -56,28 +67,60 @@ class ItineraryKnapsackSuggestions(ItineraryGenerateAlgorithm):
             return []
 
         # Calculate a list of distances for each case
-        center = self.get_center(center_case)
-        distances = calculate_geo_distances(center, cases)
+        if distances is None:
+            distances = self.get_distances(center_case, cases)
         max_distance = max(distances)
 
-        # Add the distances to the cases
-        for index, case in enumerate(cases):
-            case["distance"] = distances[index]
-            case["normalized_inverse_distance"] = (
-                (max_distance - case["distance"]) / max_distance if max_distance else 0
-            )
-            case["score"] = self.get_score(case)
-
-        # Sort the cases based on score
-        sorted_cases = sorted(cases, key=lambda case: case["score"], reverse=True)
-
-        return sorted_cases[:MAX_SUGGESTIONS_COUNT]
+        normalized_inverse_distances = [
+            (max_distance - distance) / max_distance if max_distance else 0
+            for distance in distances
+        ]
+        scores = self.get_scoring_engine(cases).score(normalized_inverse_distances)
+
+        # Sort the cases based on score. The pool is shared by the centers that are
+        # searched in parallel, so the distances and scores are added to copies.
+        indexes = sorted(range(len(cases)), key=scores.__getitem__, reverse=True)
+        return [
+            {
+                **cases[index],
+                "distance": distances[index],
+                "normalized_inverse_distance": normalized_inverse_distances[index],
+                "score": scores[index],
+            }
+            for index in indexes[:MAX_SUGGESTIONS_COUNT]
+        ]
 
 
 class ItineraryKnapsackList(ItineraryKnapsackSuggestions):
-    def get_best_list(self, candidates):
-        best_list = max(candidates, key=lambda candidate: candidate.get("score"))
-        return best_list["list"]
+    # Only the ids of the planned cases are used, the suggestions keep all fields
+    case_fields = PLANNER_CASE_FIELDS
+
+    def get_settings_hash(self):
+        """
+        A hash of the settings that affect the lists, other than the pool
+        """
+        team_settings = self.settings.day_settings.team_settings
+        values = {
+            "target_length": self.target_length,
+            "top_cases_count": getattr(team_settings, "top_cases_count", None),
+            "weights": [getattr(self.weights, name, 0) for name in FEATURES],
+            "travel_mode": get_travel_mode(),
+            "centers": [
+                settings.PLANNER_ADAPTIVE_CENTERS,
+                settings.PLANNER_CENTERS_FACTOR,
+                settings.PLANNER_MIN_CENTERS,
+            ],
+        }
+        return hashlib.sha1(json.dumps(values, sort_keys=True).encode()).hexdigest()
+
+    def get_best_list(self, rankings, claimed_case_ids):
+        """
+        Returns the best ranked list without claimed cases
+        """
+        for ranked_list in rankings:
+            if not any(str(case.get("id")) in claimed_case_ids for case in ranked_list):
+                return ranked_list
+        return None
 
     def is_same_address(self, case_a, case_b):
         same_street = case_a.get("address", {}).get("street_name") == case_b.get(
@@ -108,12 +151,29 @@ class ItineraryKnapsackList(ItineraryKnapsackSuggestions):
 
         return cases
 
-    def parallelized_function(self, case, cases, index):
-        suggestions = super().generate(case, cases)
+    def parallelized_function(self, case, cases, index, travel_costs=None):
+        # Only the stored distances from this center are sent to the worker
+        distances = travel_costs.get_distances(case, cases) if travel_costs else None
+        suggestions = super().generate(case, cases, distances)
         cases = self.shorten_list(suggestions)
 
         score = sum([case["score"] for case in cases])
-        return {"score": score, "list": cases}
+        return {
+            "score": score,
+            "list": cases,
+            "travel_costs": travel_costs.pending if travel_costs else {},
+        }
+
+    def generate_from(self, start_case):
+        """
+        Generates suggestions from a single start, which needs one distance per case
+        """
+        cases = self.__get_eligible_cases__()
+        self.travel_costs = get_travel_cost_matrix(cases, [start_case])
+        suggestions = super().generate(start_case, cases)
+        if self.travel_costs:
+            self.travel_costs.save()
+        return suggestions
 
     def generate(self, auth_header=None):
         # If the user has selected a start_case, this will be the center for the distance score calculations.
@@ -122,15 +182,23 @@ class ItineraryKnapsackList(ItineraryKnapsackSuggestions):
                 case_id=self.start_case_id,
             ).__get_case__(self.start_case_id, auth_header)
 
-            suggestions = super().generate(case)
+            suggestions = self.generate_from(case)
             suggestions = remove_cases_from_list(suggestions, [case])
             suggestions = suggestions[: self.target_length - 1]
             suggestions = [case] + suggestions
 
             return suggestions
 
-        # No start_case is selected, so all possible cases are used as a center for distance score calculations.
-        # This means that all possible lists will be calculated. TODO: Is this needed? Users are always starting at the office.
+        # Teams that start at their office get the best list from the office
+        team_settings = self.settings.day_settings.team_settings
+        if getattr(team_settings, "start_at_depot", False):
+            suggestions = self.generate_from({"address": team_settings.get_depot()})
+            best_list = self.shorten_list(suggestions)
+            return sorted(best_list, key=lambda case: case["distance"])
+
+        # Otherwise cases of the pool are used as a center for distance score calculations.
+        # These are the top_cases_count best cases, or the centers of clusters of the pool and the cases with the
+        # highest priority (see apps/planner/centers.py). Without both, all possible lists are calculated.
 
         # Get all (open) cases with the day settings configuration as parameters. Maximum is 1000!
         cases = self.__get_eligible_cases__()
@@ -138,37 +206,78 @@ class ItineraryKnapsackList(ItineraryKnapsackSuggestions):
             logger.warning("No eligible cases, could not generate best list")
             return []
 
-        topped_cases = cases
-        if hasattr(
-            self.settings.day_settings.team_settings, "top_cases_count"
-        ) and getattr(self.settings.day_settings.team_settings, "top_cases_count"):
-            for c in cases:
-                c["score"] = self.get_score(c)
+        # Teams planning with the same pool and settings get the same lists, so the
+        # best list without the cases claimed in the meantime is taken from the
+        # rankings of an earlier search
+        claimed_case_ids = {str(case.case_id) for case in self.exclude_cases}
+        key = f"{self.pool_version}:{self.get_settings_hash()}"
+        rankings = plan_rankings_cache.get(key, lambda _: self.rank_lists(cases))
+        best_list = self.get_best_list(rankings, claimed_case_ids)
+        if best_list is None:
+            logger.info("All ranked lists contain claimed cases, searching again")
+            rankings = plan_rankings_cache.store(key, lambda _: self.rank_lists(cases))
+            best_list = next(iter(rankings), [])
+
+        best_list = sorted(best_list, key=lambda case: case["distance"])
+
+        return best_list
+
+    def get_centers(self, cases):
+        team_settings = self.settings.day_settings.team_settings
+        if getattr(team_settings, "top_cases_count", None):
+            scores = self.get_scoring_engine(cases).score()
+            for c, score in zip(cases, scores):
+                c["score"] = score
             topped_cases = sorted(cases, key=lambda case: case["score"], reverse=True)
             logger.info("Algorithm: use top_cases_count")
             logger.info([c.get("id") for c in topped_cases][:50])
-            topped_cases = topped_cases[
-                : self.settings.day_settings.team_settings.top_cases_count
-            ]
+            return topped_cases[: team_settings.top_cases_count]
 
-        # Run in parallel processes to improve speed
-        jobs = multiprocessing.cpu_count()
+        if settings.PLANNER_ADAPTIVE_CENTERS:
+            centers = get_centers(cases)
+            logger.info(f"Algorithm: use {len(centers)} centers of {len(cases)} cases")
+            return centers
+
+        return cases
+
+    def rank_lists(self, cases, centers=None):
+        """
+        Generates a list for every center, ranked by their scores
+        """
+        topped_cases = self.get_centers(cases) if centers is None else centers
+        travel_costs = get_travel_cost_matrix(cases, topped_cases)
+        rows = [
+            travel_costs.get_row(case) if travel_costs else None
+            for case in topped_cases
+        ]
+
+        # Run in parallel processes to improve speed, within the share of the cores
+        # of this generation
+        jobs = get_parallel_jobs()
 
         # Multiprocessing sometimes freezes during local development and you will
         # see this message: SSL error: decryption failed or bad record mac
         # Use threads instead by setting LOCAL_DEVELOPMENT_USE_MULTIPROCESSING to False in .env
         if settings.LOCAL_DEVELOPMENT_USE_MULTIPROCESSING:
             candidates = Parallel(n_jobs=jobs, backend="multiprocessing")(
-                delayed(self.parallelized_function)(case, cases, index)
-                for index, case in enumerate(topped_cases)
+                delayed(self.parallelized_function)(case, cases, index, row)
+                for index, (case, row) in enumerate(zip(topped_cases, rows))
             )
         else:
             candidates = Parallel(n_jobs=jobs, prefer="threads")(
-                delayed(self.parallelized_function)(case, cases, index)
-                for index, case in enumerate(topped_cases)
+                delayed(self.parallelized_function)(case, cases, index, row)
+                for index, (case, row) in enumerate(zip(topped_cases, rows))
             )
 
-        best_list = self.get_best_list(candidates)
-        best_list = sorted(best_list, key=lambda case: case["distance"])
+        if travel_costs:
+            for candidate in candidates:
+                travel_costs.pending.update(candidate["travel_costs"])
+            travel_costs.save()
 
-        return best_list
+        candidates = sorted(
+            candidates, key=lambda candidate: candidate["score"], reverse=True
+        )
+        return [
+            candidate["list"]
+            for candidate in candidates[: settings.PLAN_RANKINGS_MAX_LISTS]
+        ]
@@ -0,0 +1,123 @@
+"""
+Selects the centers of the knapsack search when a team doesn't limit them with
+top_cases_count.
+
+Using every case of the pool as a center is quadratic in the size of the pool, while
+most centers give a list close to that of a nearby center. Instead the pool is
+clustered with k-means, and the medoids of the clusters and the cases with the
+highest priority are used. The number of centers grows with the square root of the
+size of the pool.
+"""
+
+import math
+
+from apps.planner.scoring import get_priority_column
+from django.conf import settings
+
+KMEANS_ITERATIONS = 10
+
+
+def get_center_count(pool_size):
+    center_count = math.ceil(settings.PLANNER_CENTERS_FACTOR * math.sqrt(pool_size))
+    return min(max(center_count, settings.PLANNER_MIN_CENTERS), pool_size)
+
+
+def get_points(cases):
+    """
+    Returns the locations of the cases in an equirectangular projection, in which
+    distances within the city are proportional to the distances on the ground
+    """
+    locations = [
+        (case.get("address", {}).get("lat"), case.get("address", {}).get("lng"))
+        for case in cases
+    ]
+    mean_lat = sum(lat for lat, lng in locations) / len(locations)
+    scale = math.cos(math.radians(mean_lat))
+    return [(lng * scale, lat) for lat, lng in locations]
+
+
+def get_squared_distance(a, b):
+    return (a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2
+
+
+def get_clusters(points, cluster_count):
+    """
+    Returns the indexes of the points per cluster. The initial means are spread
+    with a farthest-first traversal, so the clusters are the same for the same pool.
+    """
+    mean = (
+        sum(point[0] for point in points) / len(points),
+        sum(point[1] for point in points) / len(points),
+    )
+    first = min(range(len(points)), key=lambda i: get_squared_distance(points[i], mean))
+    means = [points[first]]
+    nearest = [get_squared_distance(point, means[0]) for point in points]
+    while len(means) < cluster_count:
+        farthest = max(range(len(points)), key=nearest.__getitem__)
+        means.append(points[farthest])
+        nearest = [
+            min(distance, get_squared_distance(point, points[farthest]))
+            for distance, point in zip(nearest, points)
+        ]
+
+    for _ in range(KMEANS_ITERATIONS):
+        clusters = [[] for _ in means]
+        for index, point in enumerate(points):
+            cluster = min(
+                range(len(means)),
+                key=lambda i: get_squared_distance(point, means[i]),
+            )
+            clusters[cluster].append(index)
+
+        new_means = [
+            (
+                sum(points[i][0] for i in cluster) / len(cluster),
+                sum(points[i][1] for i in cluster) / len(cluster),
+            )
+            if cluster
+            else means[index]
+            for index, cluster in enumerate(clusters)
+        ]
+        if new_means == means:
+            break
+        means = new_means
+
+    return [cluster for cluster in clusters if cluster]
+
+
+def get_medoid(points, cluster):
+    """
+    Returns the index of the point with the smallest total distance to the others
+    """
+    return min(
+        cluster,
+        key=lambda i: sum(
+            math.sqrt(get_squared_distance(points[i], points[j])) for j in cluster
+        ),
+    )
+
+
+def get_centers(cases):
+    """
+    Returns the cases to use as centers: half of them the medoids of clusters of
+    the pool, the others the cases with the highest priority
+    """
+    center_count = get_center_count(len(cases))
+    if center_count >= len(cases):
+        return list(cases)
+
+    points = get_points(cases)
+    clusters = get_clusters(points, math.ceil(center_count / 2))
+    indexes = [get_medoid(points, cluster) for cluster in clusters]
+
+    priorities = get_priority_column(cases)
+    by_priority = sorted(range(len(cases)), key=lambda i: priorities[i], reverse=True)
+    selected = set(indexes)
+    for index in by_priority:
+        if len(indexes) >= center_count:
+            break
+        if index not in selected:
+            indexes.append(index)
+            selected.add(index)
+
+    return [cases[index] for index in indexes]
@@ -0,0 +1,198 @@
+"""
+Limits the itinerary generations that run at the same time over all workers.
+
+Every generation runs its knapsack search in parallel jobs, so without a limit a few
+generations at once oversubscribe the cores of the node. A generation takes a ticket
+and waits until fewer than PLANNER_MAX_CONCURRENT_GENERATIONS generations are running
+or waiting ahead of it, so generations start in the order they were requested.
+
+Waiting holds a worker, so a generation waits at most PLANNER_QUEUE_TIMEOUT. After
+that the client is told to retry with the token of its ticket, which keeps its place.
+Until it retries, the queued generation doesn't hold up the generations behind it.
+"""
+
+import datetime
+import logging
+import math
+import time
+from contextlib import contextmanager
+
+from apps.planner.models import PlannerTicket
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from settings.const import PLANNER_QUEUED
+from utils.cache import cache_call
+
+logger = logging.getLogger(__name__)
+
+# Key for the Postgres advisory lock that makes sure only one generation at a time
+# takes a free slot
+PLANNER_TURN_ADVISORY_LOCK_ID = 7_305_002
+
+GENERATION_TIME_CACHE_KEY = "planner-generation-time"
+# The weight of the latest generation in the average generation time
+GENERATION_TIME_SMOOTHING = 0.2
+
+
+class PlannerQueued(APIException):
+    """
+    Raised when a generation didn't get its turn within PLANNER_QUEUE_TIMEOUT
+    """
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+
+    def __init__(self, position, token):
+        super().__init__(
+            {
+                **PLANNER_QUEUED,
+                "status": "queued",
+                "position": position,
+                "ticket": token,
+            }
+        )
+        # Sent as the Retry-After header. The generations ahead finish at the
+        # average generation time, PLANNER_MAX_CONCURRENT_GENERATIONS at a time.
+        self.wait = max(
+            math.ceil(
+                get_generation_time()
+                * position
+                / settings.PLANNER_MAX_CONCURRENT_GENERATIONS
+            ),
+            1,
+        )
+
+
+def get_generation_time():
+    """
+    Returns the average time of the latest generations over all workers
+    """
+    average = cache_call(cache.get, GENERATION_TIME_CACHE_KEY)
+    return settings.PLANNER_GENERATION_TIME if average is None else average
+
+
+def record_generation_time(seconds):
+    average = get_generation_time()
+    average += GENERATION_TIME_SMOOTHING * (seconds - average)
+    cache_call(cache.set, GENERATION_TIME_CACHE_KEY, average, timeout=None)
+
+
+def get_parallel_jobs():
+    """
+    The number of parallel jobs of a generation, so the generations that run
+    at the same time together stay within the cores of the node
+    """
+    return max(
+        settings.PLANNER_CPU_BUDGET // settings.PLANNER_MAX_CONCURRENT_GENERATIONS, 1
+    )
+
+
+def delete_stale_tickets():
+    """
+    Deletes the tickets of waiting generations that stopped polling and of queued
+    generations that weren't retried, and those of running generations that didn't
+    finish. Running generations don't poll, so they're only stale after
+    PLANNER_GENERATION_STALE_AFTER.
+    """
+    now = timezone.now()
+    stale = now - datetime.timedelta(seconds=settings.PLANNER_TICKET_STALE_AFTER)
+    stale_running = now - datetime.timedelta(
+        seconds=settings.PLANNER_GENERATION_STALE_AFTER
+    )
+    PlannerTicket.objects.filter(
+        Q(started_at__isnull=True, heartbeat_at__lt=stale)
+        | Q(started_at__lt=stale_running)
+    ).delete()
+
+
+def get_generations_ahead(ticket):
+    """
+    Returns the number of running generations and of waiting generations ahead of
+    the ticket. Queued generations count again once their clients retry.
+    """
+    return (
+        PlannerTicket.objects.exclude(pk=ticket.pk)
+        .filter(
+            Q(started_at__isnull=False)
+            | Q(started_at__isnull=True, queued_at__isnull=True, pk__lt=ticket.pk)
+        )
+        .count()
+    )
+
+
+def start_turn(ticket):
+    """
+    Starts the generation of the ticket when it's its turn. Returns 0 when it
+    started, or else its position in the queue.
+    """
+    with transaction.atomic():
+        # The count and the start are one step, so two generations can't take
+        # the same free slot
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_advisory_xact_lock(%s)", [PLANNER_TURN_ADVISORY_LOCK_ID]
+            )
+        now = timezone.now()
+        PlannerTicket.objects.filter(pk=ticket.pk).update(heartbeat_at=now)
+        delete_stale_tickets()
+
+        position = (
+            get_generations_ahead(ticket)
+            - settings.PLANNER_MAX_CONCURRENT_GENERATIONS
+            + 1
+        )
+        if position > 0:
+            return position
+        PlannerTicket.objects.filter(pk=ticket.pk).update(started_at=now)
+        return 0
+
+
+def take_ticket(token=None):
+    """
+    Returns the ticket of the token, so a retried generation keeps its place in
+    the queue, or a new ticket
+    """
+    max_length = PlannerTicket._meta.get_field("token").max_length
+    if isinstance(token, str) and 0 < len(token) <= max_length:
+        ticket, _ = PlannerTicket.objects.update_or_create(
+            token=token, defaults={"queued_at": None, "heartbeat_at": timezone.now()}
+        )
+        return ticket
+    return PlannerTicket.objects.create()
+
+
+@contextmanager
+def planner_turn(token=None):
+    """
+    Waits for the turn of a generation. Raises PlannerQueued with the position of
+    the generation in the queue when it takes longer than PLANNER_QUEUE_TIMEOUT,
+    and keeps its ticket for a retry with the token.
+    """
+    ticket = take_ticket(token)
+    queued = False
+    try:
+        deadline = time.monotonic() + settings.PLANNER_QUEUE_TIMEOUT
+        while True:
+            position = start_turn(ticket)
+            if not position:
+                break
+            if time.monotonic() >= deadline:
+                logger.warning(f"Generation still queued at position {position}")
+                queued = True
+                PlannerTicket.objects.filter(pk=ticket.pk).update(
+                    queued_at=timezone.now()
+                )
+                raise PlannerQueued(position, ticket.token)
+
+            time.sleep(settings.PLANNER_QUEUE_POLL_INTERVAL)
+
+        started = time.monotonic()
+        yield
+        record_generation_time(time.monotonic() - started)
+    finally:
+        if not queued:
+            PlannerTicket.objects.filter(pk=ticket.pk).delete()
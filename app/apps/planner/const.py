@@ -6,6 +6,70 @@ from enum import Enum
 class SCORING_WEIGHTS(Enum):
     DISTANCE = 0.25
     PRIORITY = 0.3
+    AGE = 0
+    STACKED_ADDRESS = 0
 
 
 MAX_SUGGESTIONS_COUNT = 20
+
+# The fields of the cases of Zaken that are used to plan lists and map tiles, the
+# other fields are dropped while the case list is decoded. Cases that are returned
+# to the clients, like the suggestions, keep all fields.
+PLANNER_CASE_FIELDS = (
+    "id",
+    "address",
+    "reason",
+    "schedules",
+    "workflows",
+    "project",
+    "subjects",
+    "tags",
+    "team",
+    "theme",
+    "start_date",
+    "description",
+)
+
+# Speeds in meters per second and the accessible highway types of the travel modes
+# of the street network, see apps/planner/travel_times.py
+TRAVEL_MODES = {
+    "walking": {
+        "speed": 1.4,
+        "highways": {
+            "footway",
+            "pedestrian",
+            "path",
+            "steps",
+            "living_street",
+            "residential",
+            "service",
+            "unclassified",
+            "tertiary",
+            "tertiary_link",
+            "secondary",
+            "secondary_link",
+            "primary",
+            "primary_link",
+            "cycleway",
+            "track",
+        },
+    },
+    "cycling": {
+        "speed": 4.2,
+        "highways": {
+            "cycleway",
+            "living_street",
+            "residential",
+            "service",
+            "unclassified",
+            "tertiary",
+            "tertiary_link",
+            "secondary",
+            "secondary_link",
+            "primary",
+            "primary_link",
+            "track",
+            "path",
+        },
+    },
+}
@@ -0,0 +1,88 @@
+import random
+import time
+
+from apps.planner.centers import get_center_count
+from apps.planner.travel_times import StreetNetwork, get_street_network
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def get_grid_network(size, spacing=0.001, mode="cycling"):
+    """
+    Returns a grid of size by size nodes, with streets of about 70 meters between
+    them like the blocks of a city
+    """
+    locations = {
+        row * size + column: (52.3 + row * spacing * 0.6, 4.8 + column * spacing)
+        for row in range(size)
+        for column in range(size)
+    }
+    tags = {"highway": "residential"}
+    ways = [
+        (tags, [row * size + column for column in range(size)]) for row in range(size)
+    ] + [(tags, [row * size + column for row in range(size)]) for column in range(size)]
+    return StreetNetwork(locations, ways, mode)
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the travel time matrix from the centers of a pool to its cases, with "
+        "searches that stop at TRAVEL_TIME_MAX_DISTANCE and with full searches. Uses "
+        "the extract of TRAVEL_TIME_OSM_PATH, or a grid of streets without it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--cases",
+            type=int,
+            default=2000,
+            help="Number of cases of the pool",
+        )
+        parser.add_argument(
+            "--grid-size",
+            type=int,
+            default=250,
+            help="Number of nodes along each side of the grid of streets",
+        )
+
+    def get_network(self, grid_size):
+        network = get_street_network()
+        if network is None:
+            network = get_grid_network(grid_size)
+        if not network.locations:
+            raise CommandError("The street network has no nodes")
+        self.stdout.write(f"{len(network.locations)} street nodes")
+        return network
+
+    def get_travel_times(self, network, sources, targets, max_meters):
+        start = time.monotonic()
+        network.get_travel_times(sources, targets, max_meters)
+        return time.monotonic() - start
+
+    def handle(self, *args, **options):
+        network = self.get_network(options["grid_size"])
+
+        # Random locations within the bounds of the network
+        lats = [location[0] for location in network.locations.values()]
+        lngs = [location[1] for location in network.locations.values()]
+        generator = random.Random(0)
+        targets = [
+            (
+                generator.uniform(min(lats), max(lats)),
+                generator.uniform(min(lngs), max(lngs)),
+            )
+            for _ in range(options["cases"])
+        ]
+        sources = targets[: get_center_count(len(targets))]
+
+        max_meters = settings.TRAVEL_TIME_MAX_DISTANCE
+        duration = self.get_travel_times(network, sources, targets, max_meters)
+        self.stdout.write(
+            f"{len(sources)} centers by {len(targets)} cases within {max_meters}m: "
+            f"{duration:.2f}s"
+        )
+        full_duration = self.get_travel_times(network, sources, targets, float("inf"))
+        self.stdout.write(
+            f"Full searches: {full_duration:.2f}s, "
+            f"{full_duration / max(duration, 0.001):.1f}x slower"
+        )
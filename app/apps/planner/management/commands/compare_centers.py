@@ -0,0 +1,96 @@
+import time
+
+from apps.itinerary.models import Itinerary, ItinerarySettings, PostalCodeSettings
+from apps.planner.algorithm.knapsack import ItineraryKnapsackList
+from apps.planner.centers import get_centers
+from apps.planner.models import DaySettings, Weights
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the lists of the knapsack search with the centers of clusters of the "
+        "pool to those of the exhaustive search with every case as a center."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("day_settings_id", type=int)
+        parser.add_argument(
+            "--target-length",
+            type=int,
+            default=8,
+            help="Number of cases of the lists",
+        )
+
+    def get_generator(self, day_settings, target_length):
+        itinerary_settings = ItinerarySettings(
+            opening_date=day_settings.opening_date,
+            target_length=target_length,
+            day_settings=day_settings,
+            day_segments=day_settings.day_segments,
+            week_segments=day_settings.week_segments,
+            priorities=day_settings.priorities,
+            project_ids=day_settings.project_ids,
+            subjects=day_settings.subjects,
+            tags=day_settings.tags,
+            districts=day_settings.districts,
+            housing_corporations=day_settings.housing_corporations,
+            housing_corporation_combiteam=day_settings.housing_corporation_combiteam,
+            reasons=day_settings.reasons,
+            state_types=day_settings.state_types,
+        )
+        postal_code_settings = [
+            PostalCodeSettings(
+                range_start=postal_code_range.get("range_start"),
+                range_end=postal_code_range.get("range_end"),
+            )
+            for postal_code_range in day_settings.postal_code_ranges
+        ]
+        weights = day_settings.team_settings.default_weights or Weights()
+
+        generator = ItineraryKnapsackList(
+            itinerary_settings, postal_code_settings, weights
+        )
+        generator.exclude(Itinerary.get_cases_for_date(timezone.now().date()))
+        return generator
+
+    def rank_lists(self, generator, cases, centers):
+        start = time.monotonic()
+        rankings = generator.rank_lists(cases, centers)
+        duration = time.monotonic() - start
+
+        best_list = next(iter(rankings), [])
+        score = sum(case["score"] for case in best_list)
+        self.stdout.write(
+            f"{len(centers)} centers: best score {score:.3f} in {duration:.1f}s"
+        )
+        return best_list, score, duration
+
+    def handle(self, *args, **options):
+        try:
+            day_settings = DaySettings.objects.get(pk=options["day_settings_id"])
+        except DaySettings.DoesNotExist:
+            raise CommandError("Day settings not found")
+
+        generator = self.get_generator(day_settings, options["target_length"])
+        cases = generator.__get_eligible_cases__()
+        if not cases:
+            raise CommandError("No eligible cases")
+        self.stdout.write(f"{len(cases)} eligible cases")
+
+        exhaustive_list, exhaustive_score, exhaustive_duration = self.rank_lists(
+            generator, cases, cases
+        )
+        adaptive_list, adaptive_score, adaptive_duration = self.rank_lists(
+            generator, cases, get_centers(cases)
+        )
+
+        exhaustive_ids = {case["id"] for case in exhaustive_list}
+        adaptive_ids = {case["id"] for case in adaptive_list}
+        quality = adaptive_score / exhaustive_score if exhaustive_score else 1
+        self.stdout.write(
+            f"Quality: {quality:.1%} of the best score, "
+            f"{len(exhaustive_ids & adaptive_ids)} of {len(exhaustive_ids)} cases "
+            f"in common, {exhaustive_duration / max(adaptive_duration, 0.001):.1f}x faster"
+        )
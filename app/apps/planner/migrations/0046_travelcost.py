@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("planner", "0045_alter_daysettings_housing_corporation_combiteam"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TravelCost",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("mode", models.CharField(max_length=20)),
+                ("origin_bag_id", models.CharField(max_length=255)),
+                ("destination_bag_id", models.CharField(max_length=255)),
+                ("meters", models.FloatField()),
+            ],
+            options={
+                "unique_together": {("mode", "origin_bag_id", "destination_bag_id")},
+            },
+        ),
+    ]
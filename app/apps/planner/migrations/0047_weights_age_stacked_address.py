@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:38
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("planner", "0046_travelcost"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="weights",
+            name="age",
+            field=models.FloatField(
+                default=0,
+                help_text="Weight of the days since the case was scheduled",
+                validators=[
+                    django.core.validators.MinValueValidator(0),
+                    django.core.validators.MaxValueValidator(1),
+                ],
+            ),
+        ),
+        migrations.AddField(
+            model_name="weights",
+            name="stacked_address",
+            field=models.FloatField(
+                default=0,
+                help_text="Weight of other cases at the same address",
+                validators=[
+                    django.core.validators.MinValueValidator(0),
+                    django.core.validators.MaxValueValidator(1),
+                ],
+            ),
+        ),
+    ]
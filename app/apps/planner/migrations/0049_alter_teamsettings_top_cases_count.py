@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("planner", "0048_plannerticket"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="teamsettings",
+            name="top_cases_count",
+            field=models.PositiveSmallIntegerField(
+                default=0,
+                help_text="Dit getal bepaald hoeveel van best matches zaken, gebruikt moeten worden als start punt. Als hier 0 gebruikt wordt, worden de middelpunten van clusters van de gevonden zaken en de zaken met de hoogste prioriteit gebruikt als start punt.",
+            ),
+        ),
+    ]
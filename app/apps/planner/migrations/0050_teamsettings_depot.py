@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("planner", "0049_alter_teamsettings_top_cases_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="teamsettings",
+            name="depot_lat",
+            field=models.FloatField(
+                blank=True,
+                help_text="Breedtegraad van het kantoor, standaard het centrum van de stad",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="teamsettings",
+            name="depot_lng",
+            field=models.FloatField(
+                blank=True,
+                help_text="Lengtegraad van het kantoor, standaard het centrum van de stad",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="teamsettings",
+            name="start_at_depot",
+            field=models.BooleanField(
+                default=False,
+                help_text="Maak looplijsten vanaf het kantoor van het team, in plaats van vanuit elke gevonden zaak. Dit is de snelste optie voor het genereren van een looplijst.",
+            ),
+        ),
+    ]
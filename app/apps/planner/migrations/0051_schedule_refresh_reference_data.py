@@ -0,0 +1,33 @@
+from django.db import migrations
+
+TASK = "apps.planner.tasks.refresh_reference_data_task"
+NAME = "Refresh Zaken reference data"
+
+
+def schedule_refresh_reference_data(apps, schema_editor):
+    IntervalSchedule = apps.get_model("django_celery_beat", "IntervalSchedule")
+    PeriodicTask = apps.get_model("django_celery_beat", "PeriodicTask")
+
+    # Well within the TTL of a day, so the cached data is never expired
+    interval, _ = IntervalSchedule.objects.get_or_create(every=6, period="hours")
+    PeriodicTask.objects.get_or_create(
+        name=NAME, defaults={"task": TASK, "interval": interval}
+    )
+
+
+def unschedule_refresh_reference_data(apps, schema_editor):
+    PeriodicTask = apps.get_model("django_celery_beat", "PeriodicTask")
+    PeriodicTask.objects.filter(name=NAME).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("planner", "0050_teamsettings_depot"),
+        ("django_celery_beat", "0019_alter_periodictasks_options"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            schedule_refresh_reference_data, unschedule_refresh_reference_data
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:14
+
+import datetime
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("planner", "0051_schedule_refresh_reference_data"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="travelcost",
+            name="last_used_on",
+            field=models.DateField(db_index=True, default=datetime.date.today),
+        ),
+    ]
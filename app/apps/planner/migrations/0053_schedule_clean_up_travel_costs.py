@@ -0,0 +1,39 @@
+from django.db import migrations
+
+TASK = "apps.planner.tasks.clean_up_travel_costs_task"
+NAME = "Clean up unused travel costs"
+
+
+def schedule_clean_up_travel_costs(apps, schema_editor):
+    IntervalSchedule = apps.get_model("django_celery_beat", "IntervalSchedule")
+    PeriodicTask = apps.get_model("django_celery_beat", "PeriodicTask")
+
+    interval, _ = IntervalSchedule.objects.get_or_create(every=1, period="days")
+    PeriodicTask.objects.get_or_create(
+        name=NAME, defaults={"task": TASK, "interval": interval}
+    )
+
+
+def unschedule_clean_up_travel_costs(apps, schema_editor):
+    PeriodicTask = apps.get_model("django_celery_beat", "PeriodicTask")
+    PeriodicTask.objects.filter(name=NAME).delete()
+
+
+def delete_straight_travel_costs(apps, schema_editor):
+    # Straight-line distances are no longer stored
+    TravelCost = apps.get_model("planner", "TravelCost")
+    TravelCost.objects.filter(mode="straight").delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("planner", "0052_travelcost_last_used_on"),
+        ("django_celery_beat", "0019_alter_periodictasks_options"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            schedule_clean_up_travel_costs, unschedule_clean_up_travel_costs
+        ),
+        migrations.RunPython(delete_straight_travel_costs, migrations.RunPython.noop),
+    ]
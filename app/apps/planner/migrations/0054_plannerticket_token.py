@@ -0,0 +1,28 @@
+import apps.planner.models
+from django.db import migrations, models
+
+
+def delete_tickets(apps, schema_editor):
+    # The tickets of running generations don't have a token yet, they're
+    # only in the queue for the duration of a request
+    PlannerTicket = apps.get_model("planner", "PlannerTicket")
+    PlannerTicket.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("planner", "0053_schedule_clean_up_travel_costs"),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_tickets, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name="plannerticket",
+            name="token",
+            field=models.CharField(
+                default=apps.planner.models.get_ticket_token,
+                max_length=64,
+                unique=True,
+            ),
+        ),
+    ]
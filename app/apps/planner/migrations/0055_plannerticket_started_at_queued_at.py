@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("planner", "0054_plannerticket_token"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="plannerticket",
+            name="queued_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="plannerticket",
+            name="started_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,16 +1,26 @@
 import datetime
+import uuid
+from functools import partial
 
-import requests
+from apps.cases.mock import get_zaken_case_list
 from apps.visits.models import Observation, Situation, SuggestNextVisit
 from django.conf import settings
 from django.contrib.postgres.fields import ArrayField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from django.utils.functional import cached_property
 from settings.const import POSTAL_CODE_RANGES
-from utils.queries_zaken_api import get_headers
-
-from .const import SCORING_WEIGHTS
+from utils.queries_zaken_api import (
+    fetch_cases,
+    fetch_cases_count,
+    get_case_pool,
+    get_reference_data,
+    get_theme_reference_data_path,
+)
+
+from .const import PLANNER_CASE_FIELDS, SCORING_WEIGHTS
 from .mock import get_team_reasons, get_team_schedules
 
 WEIGHTS_VALIDATORS = [MinValueValidator(0), MaxValueValidator(1)]
@@ -54,9 +64,34 @@ class TeamSettings(models.Model):
         related_name="team_settings_list",
     )
     top_cases_count = models.PositiveSmallIntegerField(
-        help_text="Dit getal bepaald hoeveel van best matches zaken, gebruikt moeten worden als start punt. Als hier 0 gebruikt wordt, worden alle gevonden zaken gebruikt als start punt. Dit betekent dat 0 de langzaamste optie is voor het genereren van een looplijst.",
+        help_text="Dit getal bepaald hoeveel van best matches zaken, gebruikt moeten worden als start punt. Als hier 0 gebruikt wordt, worden de middelpunten van clusters van de gevonden zaken en de zaken met de hoogste prioriteit gebruikt als start punt.",
         default=0,
     )
+    start_at_depot = models.BooleanField(
+        default=False,
+        help_text="Maak looplijsten vanaf het kantoor van het team, in plaats van vanuit elke gevonden zaak. Dit is de snelste optie voor het genereren van een looplijst.",
+    )
+    depot_lat = models.FloatField(
+        blank=True,
+        null=True,
+        help_text="Breedtegraad van het kantoor, standaard het centrum van de stad",
+    )
+    depot_lng = models.FloatField(
+        blank=True,
+        null=True,
+        help_text="Lengtegraad van het kantoor, standaard het centrum van de stad",
+    )
+
+    def get_depot(self):
+        """
+        Returns the location of the office of the team, by default the city center
+        """
+        if self.depot_lat is None or self.depot_lng is None:
+            return {
+                "lat": settings.CITY_CENTRAL_LOCATION_LAT,
+                "lng": settings.CITY_CENTRAL_LOCATION_LNG,
+            }
+        return {"lat": self.depot_lat, "lng": self.depot_lng}
 
     def get_cases_query_params(self):
         today = datetime.datetime.combine(
@@ -69,77 +104,43 @@ class TeamSettings(models.Model):
             "schedule_visit_from": today,
         }
 
-    def fetch_projects(self, auth_header=None):
-        url = f"{settings.ZAKEN_API_URL}/themes/{self.zaken_team_id}/case-projects/"
-
-        response = requests.get(
-            url,
-            timeout=5,
-            headers=get_headers(auth_header),
-        )
-        response.raise_for_status()
+    def get_reference_data(self, resource, auth_header=None):
+        """
+        Returns (cached) lookup data of this team's Zaken theme
+        """
+        path = get_theme_reference_data_path(self.zaken_team_id, resource)
+        return get_reference_data(path, auth_header)
 
-        return response.json().get("results", [])
+    def fetch_projects(self, auth_header=None):
+        data = self.get_reference_data("case-projects", auth_header)
+        return data.get("results", [])
 
     def fetch_team_schedules(self, auth_header=None):
         if settings.USE_ZAKEN_MOCK_DATA:
             return get_team_schedules()
 
-        url = f"{settings.ZAKEN_API_URL}/themes/{self.zaken_team_id}/schedule-types/"
-
-        response = requests.get(
-            url,
-            timeout=5,
-            headers=get_headers(auth_header),
-        )
-        response.raise_for_status()
-
-        return response.json()
+        return self.get_reference_data("schedule-types", auth_header)
 
     def fetch_team_reasons(self, auth_header=None):
         if settings.USE_ZAKEN_MOCK_DATA:
             return get_team_reasons()
 
-        url = f"{settings.ZAKEN_API_URL}/themes/{self.zaken_team_id}/reasons/"
-
-        response = requests.get(
-            url,
-            timeout=5,
-            headers=get_headers(auth_header),
-        )
-        response.raise_for_status()
-
-        return response.json().get("results", [])
+        data = self.get_reference_data("reasons", auth_header)
+        return data.get("results", [])
 
     def fetch_subjects(self, auth_header=None):
-        url = f"{settings.ZAKEN_API_URL}/themes/{self.zaken_team_id}/subjects/"
-
-        response = requests.get(
-            url,
-            timeout=5,
-            headers=get_headers(auth_header),
-        )
-        response.raise_for_status()
-
-        return response.json().get("results", [])
+        data = self.get_reference_data("subjects", auth_header)
+        return data.get("results", [])
 
     def fetch_tags(self, auth_header=None):
-        url = f"{settings.ZAKEN_API_URL}/themes/{self.zaken_team_id}/tags/"
-
-        response = requests.get(
-            url,
-            timeout=5,
-            headers=get_headers(auth_header),
-        )
-        response.raise_for_status()
-
-        return response.json().get("results", [])
+        data = self.get_reference_data("tags", auth_header)
+        return data.get("results", [])
 
     class Meta:
         verbose_name_plural = "Team settings"
         ordering = ["name"]
 
-    @property
+    @cached_property
     def situation_choices(self):
         return list(Situation.objects.all().values_list("value", flat=True))
 
@@ -175,6 +176,29 @@ class PostalCodeRange(models.Model):
         super().save(*args, **kwargs)
 
 
+class DaySettingsQuerySet(models.QuerySet):
+    def with_used_today_count(self):
+        """
+        Annotates the number of itineraries created today with these settings,
+        using one subquery instead of a query per DaySettings
+        """
+        from apps.itinerary.models import ItinerarySettings
+
+        used_today = (
+            ItinerarySettings.objects.filter(
+                day_settings=models.OuterRef("pk"),
+                itinerary__created_at=datetime.date.today(),
+            )
+            .order_by()
+            .values("day_settings")
+            .annotate(count=models.Count("pk"))
+            .values("count")
+        )
+        return self.annotate(
+            used_today=Coalesce(models.Subquery(used_today), 0),
+        )
+
+
 class DaySettings(models.Model):
     team_settings = models.ForeignKey(
         to=TeamSettings, related_name="day_settings_list", on_delete=models.CASCADE
@@ -265,6 +289,8 @@ class DaySettings(models.Model):
         default=None,
     )
 
+    objects = DaySettingsQuerySet.as_manager()
+
     def save(self, *args, **kwargs):
         if self.postal_code_ranges is None:
             self.postal_code_ranges = []
@@ -315,50 +341,42 @@ class DaySettings(models.Model):
         return cases_query_params
 
     def fetch_cases_count(self, auth_header=None):
-        url = f"{settings.ZAKEN_API_URL}/cases/count/"
-        response = requests.get(
-            url,
-            timeout=10,
-            params=self.get_cases_query_params(),
-            headers=get_headers(auth_header),
-        )
-        response.raise_for_status()
+        return fetch_cases_count(self.get_cases_query_params(), auth_header)
 
-        return response.json()
-
-    def fetch_team_schedules(self, auth_header=None):
-        url = f"{settings.ZAKEN_API_URL}/themes/{self.team_settings.zaken_team_id}/schedule-types/"
+    def get_case_pool(self, auth_header=None):
+        """
+        Returns the (cached) open cases for these settings, with the version of the pool
+        """
+        if settings.USE_ZAKEN_MOCK_DATA:
+            return {"version": "mock", "cases": get_zaken_case_list()}
 
-        response = requests.get(
-            url,
-            timeout=5,
-            headers=get_headers(auth_header),
+        return get_case_pool(
+            self.get_cases_query_params(),
+            auth_header,
+            fetch=partial(fetch_cases, fields=PLANNER_CASE_FIELDS),
         )
-        response.raise_for_status()
 
-        return response.json()
+    def fetch_team_schedules(self, auth_header=None):
+        return self.team_settings.fetch_team_schedules(auth_header)
 
     def fetch_team_reasons(self, auth_header=None):
-        url = f"{settings.ZAKEN_API_URL}/themes/{self.team_settings.zaken_team_id}/reasons/"
-
-        response = requests.get(
-            url,
-            timeout=5,
-            headers=get_headers(auth_header),
-        )
-        response.raise_for_status()
-
-        return response.json().get("results", [])
+        return self.team_settings.fetch_team_reasons(auth_header)
 
     @property
     def used_today_count(self):
-        from apps.itinerary.models import Itinerary
+        # Use the annotation of DaySettings.objects.with_used_today_count() if present
+        if hasattr(self, "used_today"):
+            return self.used_today
+
+        return (
+            DaySettings.objects.with_used_today_count()
+            .values_list("used_today", flat=True)
+            .get(pk=self.pk)
+        )
 
-        date = datetime.datetime.now()
-        return Itinerary.objects.filter(
-            created_at=date,
-            settings__day_settings=self,
-        ).count()
+    @property
+    def is_max_use_limit_reached(self):
+        return bool(self.max_use_limit) and self.used_today_count >= self.max_use_limit
 
     class Meta:
         ordering = ("name",)
@@ -383,31 +401,93 @@ class Weights(models.Model):
         default=SCORING_WEIGHTS.PRIORITY.value,
         validators=WEIGHTS_VALIDATORS,
     )
+    age = models.FloatField(
+        default=SCORING_WEIGHTS.AGE.value,
+        validators=WEIGHTS_VALIDATORS,
+        help_text="Weight of the days since the case was scheduled",
+    )
+    stacked_address = models.FloatField(
+        default=SCORING_WEIGHTS.STACKED_ADDRESS.value,
+        validators=WEIGHTS_VALIDATORS,
+        help_text="Weight of other cases at the same address",
+    )
 
     class Meta:
         ordering = ("name",)
         verbose_name_plural = "Weights"
 
-    def score(
-        self,
-        distance,
-        priority,
-    ):
-        values = [
-            distance,
-            priority,
-        ]
-        weights = [
+    def __str__(self):
+        return "%s: %s-%s" % (
+            self.name,
             self.distance,
             self.priority,
-        ]
+        )
+
+
+class TravelCost(models.Model):
+    """
+    The distance between two addresses in meters over the street network, stored so
+    it's only computed once. The mode is the travel mode of the street network.
+    Distances that aren't used for a while are cleaned up.
+    See apps/planner/travel_costs.py
+    """
 
-        products = [value * weight for value, weight in zip(values, weights)]
-        return sum(products)
+    mode = models.CharField(
+        max_length=20,
+    )
+    origin_bag_id = models.CharField(
+        max_length=255,
+    )
+    destination_bag_id = models.CharField(
+        max_length=255,
+    )
+    meters = models.FloatField()
+    last_used_on = models.DateField(default=datetime.date.today, db_index=True)
+
+    class Meta:
+        unique_together = ["mode", "origin_bag_id", "destination_bag_id"]
 
     def __str__(self):
         return "%s: %s-%s" % (
-            self.name,
-            self.distance,
-            self.priority,
+            self.mode,
+            self.origin_bag_id,
+            self.destination_bag_id,
         )
+
+
+def get_ticket_token():
+    return uuid.uuid4().hex
+
+
+class PlannerTicket(models.Model):
+    """
+    A place in the queue of itinerary generations, see apps/planner/concurrency.py
+    """
+
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+    )
+    heartbeat_at = models.DateTimeField(
+        default=timezone.now,
+        db_index=True,
+    )
+    # Set when the generation starts, only running generations use up the slots
+    started_at = models.DateTimeField(
+        null=True,
+        blank=True,
+    )
+    # Set when the client is told to retry, until it does the generation is
+    # skipped in the queue
+    queued_at = models.DateTimeField(
+        null=True,
+        blank=True,
+    )
+    # Sent to a queued client, which keeps its place by retrying with it
+    token = models.CharField(
+        max_length=64,
+        unique=True,
+        default=get_ticket_token,
+    )
+
+    class Meta:
+        ordering = ("id",)
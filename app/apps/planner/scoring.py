@@ -0,0 +1,115 @@
+"""
+Scores the cases of a pool on all features at once.
+
+Every feature is a column with a value between 0 and 1 for each case of the pool,
+weighted by the field of the same name on Weights. The columns that don't depend on
+the center of a list are combined once per pool, so scoring the pool for another
+center only adds the distance column.
+
+Adding a feature is adding a column with @register_feature and a field on Weights.
+"""
+
+import datetime
+from collections import Counter
+
+from dateutil import parser
+
+FEATURES = {}
+
+
+def register_feature(name, per_center=False):
+    """
+    Registers a function that returns the column of a feature for a pool of cases.
+    Columns per center also get the normalized inverse distances of the cases.
+    """
+
+    def decorator(function):
+        FEATURES[name] = {"get_column": function, "per_center": per_center}
+        return function
+
+    return decorator
+
+
+def get_schedule(case):
+    return next(iter(case.get("schedules") or []), {})
+
+
+def normalize(values):
+    max_value = max(values, default=0)
+    if not max_value:
+        return [0.0] * len(values)
+    return [value / max_value for value in values]
+
+
+@register_feature("distance", per_center=True)
+def get_distance_column(cases, normalized_inverse_distances):
+    return normalized_inverse_distances
+
+
+@register_feature("priority")
+def get_priority_column(cases):
+    return [
+        (get_schedule(case).get("priority") or {}).get("weight", 0) for case in cases
+    ]
+
+
+@register_feature("age")
+def get_age_column(cases):
+    """
+    The days since the case was scheduled, relative to the longest waiting case
+    """
+    today = datetime.date.today()
+    days = []
+    for case in cases:
+        date_added = get_schedule(case).get("date_added")
+        try:
+            days.append(max((today - parser.parse(date_added).date()).days, 0))
+        except (TypeError, ValueError, OverflowError):
+            days.append(0)
+    return normalize(days)
+
+
+def get_address(case):
+    address = case.get("address") or {}
+    return address.get("street_name"), address.get("number")
+
+
+@register_feature("stacked_address")
+def get_stacked_address_column(cases):
+    """
+    Cases at an address with other cases can be visited at once
+    """
+    counts = Counter(get_address(case) for case in cases)
+    return [1.0 if counts[get_address(case)] > 1 else 0.0 for case in cases]
+
+
+class ScoringEngine:
+    def __init__(self, cases, weights):
+        self.cases = cases
+        self.weights = {name: getattr(weights, name, 0) or 0 for name in FEATURES}
+
+        # The weighted sum of the columns that are the same for every center
+        self.pool_scores = [0.0] * len(cases)
+        for name, feature in FEATURES.items():
+            if feature["per_center"] or not self.weights[name]:
+                continue
+            self.add_column(self.pool_scores, name, feature["get_column"](cases))
+
+    def add_column(self, scores, name, column):
+        weight = self.weights[name]
+        scores[:] = [score + weight * value for score, value in zip(scores, column)]
+
+    def score(self, normalized_inverse_distances=None):
+        """
+        Returns the scores of the cases of the pool for a center
+        """
+        if normalized_inverse_distances is None:
+            normalized_inverse_distances = [0.0] * len(self.cases)
+
+        scores = list(self.pool_scores)
+        for name, feature in FEATURES.items():
+            if not feature["per_center"] or not self.weights[name]:
+                continue
+            column = feature["get_column"](self.cases, normalized_inverse_distances)
+            self.add_column(scores, name, column)
+        return scores
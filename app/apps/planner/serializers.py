@@ -211,6 +211,10 @@ class DaySettingsSerializer(serializers.ModelSerializer):
     def get_case_count(self, obj):
         request = self.context.get("request")
         if bool(request.GET.get("case-count")):
+            # Prefer the counts fetched for all DaySettings at once by the view
+            case_counts = self.context.get("case_counts", {})
+            if obj.id in case_counts:
+                return case_counts[obj.id]
             return obj.fetch_cases_count(get_auth_header_from_request(request))
         return {"count": 0}
 
@@ -0,0 +1,70 @@
+import datetime
+import logging
+
+import requests
+from apps.planner.models import TeamSettings, TravelCost
+from celery import shared_task
+from utils.queries_zaken_api import get_reference_data_paths, refresh_reference_data
+
+logger = logging.getLogger("celery")
+
+DEFAULT_RETRY_DELAY = 10
+DAYS_UNTIL_DELETION = 30
+
+
+def get_enabled_theme_ids():
+    return (
+        TeamSettings.objects.filter(enabled=True, zaken_team_id__isnull=False)
+        .values_list("zaken_team_id", flat=True)
+        .distinct()
+    )
+
+
+@shared_task(bind=True, default_retry_delay=DEFAULT_RETRY_DELAY)
+def refresh_reference_data_task(self, paths=None):
+    """
+    Refreshes the cached Zaken lookup data of all enabled teams,
+    so the planner settings don't have to wait for Zaken.
+    Paths that failed because of Zaken are retried.
+    """
+    logger.info("Started refresh of reference data")
+
+    if paths is None:
+        paths = get_reference_data_paths(get_enabled_theme_ids())
+    failed_paths = []
+    last_exception = None
+    for path in paths:
+        try:
+            refresh_reference_data(path)
+        except requests.RequestException as exception:
+            logger.error(f"Exception occurred refreshing {path}: {exception}")
+            failed_paths.append(path)
+            last_exception = exception
+
+    logger.info(
+        f"Ended reference data refresh, refreshed {len(paths) - len(failed_paths)} of {len(paths)}"
+    )
+    if failed_paths:
+        self.retry(kwargs={"paths": failed_paths}, exc=last_exception)
+
+
+@shared_task(bind=True, default_retry_delay=DEFAULT_RETRY_DELAY)
+def clean_up_travel_costs_task(self):
+    """
+    Clean up the stored distances that weren't used for 30 days, like those of
+    addresses that are no longer in the case pools.
+    """
+    logger.info("Started cleanup of travel costs")
+
+    try:
+        one_month_ago = datetime.date.today() - datetime.timedelta(
+            days=DAYS_UNTIL_DELETION
+        )
+        deleted_count, _ = TravelCost.objects.filter(
+            last_used_on__lt=one_month_ago
+        ).delete()
+        logger.info(f"Ended travel costs cleanup, deleted {deleted_count} travel costs")
+
+    except Exception as exception:
+        logger.error(f"Exception occurred during travel costs cleanup: {exception}")
+        self.retry(exc=exception)
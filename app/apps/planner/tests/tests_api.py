@@ -1,8 +1,22 @@
+import json
+from unittest.mock import patch
+
+from apps.cases.models import Case
+from apps.itinerary.models import ItineraryItem, ItinerarySettings
 from apps.planner.models import DaySettings, TeamSettings
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from freezegun import freeze_time
 from model_bakery import baker
 from rest_framework import status
 from rest_framework.test import APITestCase
+from utils.queries_zaken_api import (
+    get_reference_data_paths,
+    invalidate_reference_data,
+    local_case_pools,
+)
 
 from app.utils.unittest_helpers import (
     get_authenticated_client,
@@ -126,6 +140,98 @@ class DaySettingsViewSet(APITestCase):
         self.assertEqual(response.json().get("name"), DAY_SETTINGS_NAME)
 
 
+class DaySettingsCaseCountTest(APITestCase):
+    """
+    Tests for the case counts of day settings
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    @patch("utils.queries_zaken_api.requests.get")
+    def test_case_counts_are_deduplicated(self, mock_requests_get):
+        """
+        Day settings with the same query params share one request to Zaken
+        """
+        mock_requests_get.return_value.json.return_value = {"count": 3}
+        team_settings = baker.make(TeamSettings, zaken_team_id=2)
+        baker.make(DaySettings, team_settings=team_settings, priorities=[1])
+        baker.make(DaySettings, team_settings=team_settings, priorities=[1])
+        baker.make(DaySettings, team_settings=team_settings, priorities=[2])
+
+        client = get_authenticated_client()
+        response = client.get(reverse("v1:team-settings-list"), {"case-count": "true"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        day_settings_list = response.json()["results"][0]["day_settings_list"]
+        self.assertEqual(len(day_settings_list), 3)
+        for day_settings in day_settings_list:
+            self.assertEqual(day_settings["case_count"], {"count": 3})
+        self.assertEqual(mock_requests_get.call_count, 2)
+
+    @patch("utils.queries_zaken_api.requests.get")
+    def test_without_case_count(self, mock_requests_get):
+        """
+        Zaken is not requested without the case-count query parameter
+        """
+        baker.make(DaySettings)
+
+        client = get_authenticated_client()
+        response = client.get(reverse("v1:day-settings-list"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["results"][0]["case_count"], {"count": 0})
+        mock_requests_get.assert_not_called()
+
+
+class DaySettingsUsedTodayCountTest(APITestCase):
+    """
+    Tests for the number of itineraries created today with day settings
+    """
+
+    def test_used_today_count(self):
+        """
+        Only itineraries created today with the day settings are counted
+        """
+        team_settings = baker.make(TeamSettings)
+        day_settings = baker.make(DaySettings, team_settings=team_settings)
+        other_day_settings = baker.make(DaySettings, team_settings=team_settings)
+        baker.make(ItinerarySettings, day_settings=day_settings, _quantity=2)
+        with freeze_time("2020-01-01"):
+            baker.make(ItinerarySettings, day_settings=day_settings)
+
+        client = get_authenticated_client()
+        response = client.get(reverse("v1:team-settings-list"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        used_today_counts = {
+            day_settings["id"]: day_settings["used_today_count"]
+            for day_settings in response.json()["results"][0]["day_settings_list"]
+        }
+        self.assertEqual(
+            used_today_counts, {day_settings.id: 2, other_day_settings.id: 0}
+        )
+        self.assertEqual(day_settings.used_today_count, 2)
+
+    def test_used_today_count_queries(self):
+        """
+        The itineraries of all day settings are counted in a single query
+        """
+        baker.make(DaySettings, _quantity=5)
+
+        client = get_authenticated_client()
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(reverse("v1:day-settings-list"))
+
+        self.assertEqual(len(response.json()["results"]), 5)
+        itinerary_queries = [
+            query
+            for query in context.captured_queries
+            if "itinerary_itinerarysettings" in query["sql"]
+        ]
+        self.assertEqual(len(itinerary_queries), 1)
+
+
 class DaySettingsUpdateTestViewSet(APITestCase):
     """
     Tests for the API endpoints for retrieving day settings
@@ -181,3 +287,103 @@ class DaySettingsUpdateTestViewSet(APITestCase):
         response = client.put(url, {})
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         # self.assertEqual(response.json().get("name"), DAY_SETTINGS_NAME)
+
+
+class TeamSettingsReferenceDataTest(APITestCase):
+    """
+    Tests for the cached Zaken lookup data of team settings
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    @patch("utils.queries_zaken_api.requests.get")
+    def test_reasons_are_cached(self, mock_requests_get):
+        """
+        Reasons are fetched from Zaken once per theme
+        """
+        mock_requests_get.return_value.json.return_value = {
+            "results": [{"id": 1, "name": "FOO_REASON", "team": 2}]
+        }
+        team_settings = baker.make(TeamSettings, zaken_team_id=2)
+        url = reverse("v1:team-settings-reasons", kwargs={"pk": team_settings.id})
+
+        client = get_authenticated_client()
+        for i in range(2):
+            response = client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.json()[0]["name"], "FOO_REASON")
+
+        mock_requests_get.assert_called_once()
+
+    @patch("utils.queries_zaken_api.requests.get")
+    def test_invalidate_reference_data(self, mock_requests_get):
+        """
+        Invalidated reference data is fetched from Zaken again
+        """
+        mock_requests_get.return_value.json.return_value = {"results": []}
+        team_settings = baker.make(TeamSettings, zaken_team_id=2)
+
+        team_settings.fetch_tags()
+        team_settings.fetch_tags()
+        self.assertEqual(mock_requests_get.call_count, 1)
+
+        invalidate_reference_data(get_reference_data_paths([2]))
+        team_settings.fetch_tags()
+        self.assertEqual(mock_requests_get.call_count, 2)
+
+
+class DaySettingsTilesTest(APITestCase):
+    """
+    Tests for the map tiles of the open cases of day settings
+    """
+
+    def setUp(self):
+        cache.clear()
+        local_case_pools.clear()
+
+    @patch("utils.queries_zaken_api.requests.get")
+    def test_tiles(self, mock_requests_get):
+        """
+        The pool is fetched once, and cases in today's itineraries are left out
+        """
+        mock_requests_get.return_value.iter_content.return_value = [
+            json.dumps(
+                {
+                    "results": [
+                        {"id": case_id, "address": {"lat": 52.37, "lng": 4.89}}
+                        for case_id in (1, 2)
+                    ]
+                }
+            ).encode()
+        ]
+        day_settings = baker.make(DaySettings)
+        url = reverse("v1:day-settings-tiles", args=[day_settings.pk, 12, 2103, 1346])
+
+        client = get_authenticated_client()
+        response = client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["count"], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            baker.make(ItineraryItem, case=baker.make(Case, case_id="1"))
+        response = client.get(url)
+        self.assertEqual(response.json()["count"], 1)
+
+        mock_requests_get.assert_called_once()
+
+    @patch("utils.queries_zaken_api.requests.get")
+    def test_tiles_invalid(self, mock_requests_get):
+        """
+        Tiles outside the world map are a bad request, without fetching the pool
+        """
+        day_settings = baker.make(DaySettings)
+        client = get_authenticated_client()
+
+        for z, x, y in ((23, 0, 0), (2000, 0, 0), (2, 4, 0), (2, 0, 4)):
+            with self.subTest(z=z, x=x, y=y):
+                url = reverse("v1:day-settings-tiles", args=[day_settings.pk, z, x, y])
+                response = client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        mock_requests_get.assert_not_called()
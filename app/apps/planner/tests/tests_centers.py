@@ -0,0 +1,88 @@
+"""
+Tests for the selection of the centers of the knapsack search
+"""
+
+import random
+
+from apps.cases.mock import get_zaken_case_list
+from apps.planner.centers import get_center_count, get_centers
+from apps.planner.tests.tests_knapsack import get_generator
+from django.test import TestCase, override_settings
+
+# The share of the score of the exhaustive search the centers reach at least
+QUALITY_FLOOR = 0.99
+
+
+def get_pool(size, seed=1):
+    """
+    Returns a pool of cases spread over a few neighbourhoods of the city
+    """
+    generator = random.Random(seed)
+    neighbourhoods = [(52.37, 4.89), (52.36, 4.92), (52.39, 4.87), (52.35, 4.86)]
+    cases = []
+    for case_id in range(size):
+        lat, lng = generator.choice(neighbourhoods)
+        cases.append(
+            {
+                "id": case_id,
+                "address": {
+                    "street_name": f"Foo street {case_id}",
+                    "number": 1,
+                    "lat": generator.gauss(lat, 0.005),
+                    "lng": generator.gauss(lng, 0.008),
+                },
+                "schedules": [{"priority": {"weight": generator.random()}}],
+            }
+        )
+    return cases
+
+
+@override_settings(PLANNER_CENTERS_FACTOR=2, PLANNER_MIN_CENTERS=10)
+class GetCentersTest(TestCase):
+    def test_center_count(self):
+        """
+        The number of centers grows with the square root of the size of the pool
+        """
+        self.assertEqual(get_center_count(5), 5)
+        self.assertEqual(get_center_count(20), 10)
+        self.assertEqual(get_center_count(100), 20)
+        self.assertEqual(get_center_count(1000), 64)
+
+    def test_centers(self):
+        """
+        Half of the centers are medoids of clusters, the others have the highest
+        priority of the other cases
+        """
+        cases = get_pool(100)
+
+        centers = get_centers(cases)
+
+        self.assertEqual(len(centers), 20)
+        self.assertEqual(len({case["id"] for case in centers}), 20)
+        highest_priority = max(
+            cases, key=lambda case: case["schedules"][0]["priority"]["weight"]
+        )
+        self.assertIn(highest_priority, centers)
+        self.assertEqual(get_centers(cases), centers)
+
+    def test_quality(self):
+        """
+        On fixed pools, the best list scores at least QUALITY_FLOOR of the best list
+        of the exhaustive search from every case
+        """
+        pools = {
+            "mock": get_zaken_case_list(),
+            **{f"synthetic {seed}": get_pool(100, seed) for seed in (1, 2, 3)},
+        }
+        for name, cases in pools.items():
+            with self.subTest(pool=name):
+                generator = get_generator(target_length=8)
+
+                exhaustive_list = generator.rank_lists(cases, cases)[0]
+                adaptive_list = generator.rank_lists(cases, get_centers(cases))[0]
+
+                exhaustive_score = sum(case["score"] for case in exhaustive_list)
+                adaptive_score = sum(case["score"] for case in adaptive_list)
+                self.assertGreaterEqual(
+                    adaptive_score, QUALITY_FLOOR * exhaustive_score
+                )
@@ -0,0 +1,212 @@
+"""
+Tests for the queue of itinerary generations
+"""
+
+import datetime
+from unittest.mock import patch
+
+from apps.planner.concurrency import (
+    PlannerQueued,
+    get_generation_time,
+    get_parallel_jobs,
+    planner_turn,
+    record_generation_time,
+)
+from apps.planner.models import PlannerTicket
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from freezegun import freeze_time
+from model_bakery import baker
+
+
+@override_settings(
+    PLANNER_MAX_CONCURRENT_GENERATIONS=2,
+    PLANNER_QUEUE_TIMEOUT=0,
+    PLANNER_TICKET_STALE_AFTER=90,
+    PLANNER_GENERATION_STALE_AFTER=300,
+    PLANNER_GENERATION_TIME=10,
+)
+class PlannerTurnTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_turn(self):
+        """
+        A generation runs when fewer than the maximum are ahead of it,
+        and leaves the queue afterwards
+        """
+        baker.make(PlannerTicket)
+
+        with planner_turn():
+            self.assertEqual(PlannerTicket.objects.count(), 2)
+
+        self.assertEqual(PlannerTicket.objects.count(), 1)
+
+    def test_queued(self):
+        """
+        A generation that doesn't get its turn in time is reported as queued,
+        and keeps its ticket
+        """
+        baker.make(PlannerTicket, _quantity=3)
+
+        with self.assertRaises(PlannerQueued) as context:
+            with planner_turn():
+                pass
+
+        self.assertEqual(context.exception.detail["position"], "2")
+        self.assertEqual(
+            context.exception.detail["ticket"], PlannerTicket.objects.last().token
+        )
+        self.assertEqual(PlannerTicket.objects.count(), 4)
+
+    def test_retry_keeps_place(self):
+        """
+        A queued generation that is retried with its ticket keeps its place,
+        ahead of the generations that were requested after it
+        """
+        tickets = baker.make(PlannerTicket, _quantity=3)
+        with self.assertRaises(PlannerQueued) as context:
+            with planner_turn():
+                pass
+        token = context.exception.detail["ticket"]
+        baker.make(PlannerTicket, _quantity=2)
+        tickets[0].delete()
+
+        with self.assertRaises(PlannerQueued) as context:
+            with planner_turn(token):
+                pass
+        self.assertEqual(context.exception.detail["position"], "1")
+
+        tickets[1].delete()
+        with planner_turn(token):
+            self.assertTrue(PlannerTicket.objects.filter(token=token).exists())
+
+        self.assertFalse(PlannerTicket.objects.filter(token=token).exists())
+        self.assertEqual(PlannerTicket.objects.count(), 3)
+
+    def test_retry_after(self):
+        """
+        The client is asked to retry once the generations ahead are expected
+        to finish, based on the time of the latest generations
+        """
+        baker.make(PlannerTicket, _quantity=5)
+
+        with self.assertRaises(PlannerQueued) as context:
+            with planner_turn():
+                pass
+        # 4 generations ahead, 2 at a time, of the expected 10 seconds
+        self.assertEqual(context.exception.detail["position"], "4")
+        self.assertEqual(context.exception.wait, 20)
+
+        record_generation_time(0)
+        self.assertEqual(get_generation_time(), 8)
+        # The queued ticket of the first try isn't ahead until it's retried,
+        # 4 generations ahead of 8 seconds
+        with self.assertRaises(PlannerQueued) as context:
+            with planner_turn():
+                pass
+        self.assertEqual(context.exception.wait, 16)
+
+    def test_generation_time(self):
+        """
+        The time of a generation is recorded in the average generation time
+        """
+        with patch("apps.planner.concurrency.time.monotonic", side_effect=[0, 0, 5]):
+            with planner_turn():
+                pass
+
+        self.assertEqual(get_generation_time(), 9)
+
+        with self.assertRaises(ValueError):
+            with planner_turn():
+                raise ValueError()
+        self.assertEqual(get_generation_time(), 9)
+
+    @override_settings(PLANNER_QUEUE_TIMEOUT=10, PLANNER_QUEUE_POLL_INTERVAL=0)
+    def test_wait_for_turn(self):
+        """
+        A waiting generation runs once a generation ahead of it finishes
+        """
+        tickets = baker.make(PlannerTicket, _quantity=2)
+
+        def finish_first_generation(seconds):
+            tickets[0].delete()
+
+        with patch("apps.planner.concurrency.time.sleep") as mock_sleep:
+            mock_sleep.side_effect = finish_first_generation
+            with planner_turn():
+                pass
+
+        mock_sleep.assert_called_once()
+
+    def test_stale_tickets(self):
+        """
+        Tickets of generations that didn't finish are removed
+        """
+        baker.make(
+            PlannerTicket,
+            heartbeat_at=timezone.now() - datetime.timedelta(seconds=100),
+            _quantity=3,
+        )
+
+        with planner_turn():
+            self.assertEqual(PlannerTicket.objects.count(), 1)
+
+    def test_queued_ticket_not_retried(self):
+        """
+        A queued generation whose client never retries doesn't hold up the
+        generations behind it, and is removed once it's stale
+        """
+        running = baker.make(PlannerTicket, started_at=timezone.now(), _quantity=2)
+        with self.assertRaises(PlannerQueued):
+            with planner_turn():
+                pass
+        for ticket in running:
+            ticket.delete()
+
+        with planner_turn():
+            self.assertEqual(
+                PlannerTicket.objects.filter(started_at__isnull=False).count(), 1
+            )
+        self.assertEqual(PlannerTicket.objects.count(), 1)
+
+        with freeze_time(timezone.now() + datetime.timedelta(seconds=100)):
+            with planner_turn():
+                pass
+        self.assertEqual(PlannerTicket.objects.count(), 0)
+
+    def test_running_generations(self):
+        """
+        Only running generations use up the slots. They don't poll, so they're
+        only removed after PLANNER_GENERATION_STALE_AFTER.
+        """
+        started_at = timezone.now() - datetime.timedelta(seconds=100)
+        baker.make(
+            PlannerTicket,
+            started_at=started_at,
+            heartbeat_at=started_at,
+            _quantity=2,
+        )
+
+        with self.assertRaises(PlannerQueued) as context:
+            with planner_turn():
+                pass
+        self.assertEqual(context.exception.detail["position"], "1")
+
+        with override_settings(PLANNER_GENERATION_STALE_AFTER=60):
+            with planner_turn():
+                self.assertEqual(PlannerTicket.objects.count(), 2)
+
+
+class GetParallelJobsTest(TestCase):
+    @override_settings(PLANNER_CPU_BUDGET=8, PLANNER_MAX_CONCURRENT_GENERATIONS=2)
+    def test_cpu_budget(self):
+        """
+        The cores are divided over the generations that run at the same time
+        """
+        self.assertEqual(get_parallel_jobs(), 4)
+
+    @override_settings(PLANNER_CPU_BUDGET=2, PLANNER_MAX_CONCURRENT_GENERATIONS=4)
+    def test_at_least_one_job(self):
+        self.assertEqual(get_parallel_jobs(), 1)
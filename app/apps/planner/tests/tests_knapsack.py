@@ -0,0 +1,162 @@
+"""
+Tests for the knapsack algorithm
+"""
+
+import datetime
+import json
+from unittest.mock import Mock, patch
+
+from apps.cases.mock import get_zaken_case_list
+from apps.planner.algorithm.knapsack import (
+    ItineraryKnapsackList,
+    ItineraryKnapsackSuggestions,
+)
+from apps.planner.const import PLANNER_CASE_FIELDS
+from apps.planner.models import TeamSettings
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+
+def get_generator(target_length=3, claimed_case_ids=(), team_settings=None):
+    itinerary_settings = Mock(
+        opening_date=datetime.date(2020, 1, 1),
+        target_length=target_length,
+        start_case=None,
+    )
+    itinerary_settings.day_settings.team_settings = team_settings or TeamSettings()
+    generator = ItineraryKnapsackList(itinerary_settings)
+    generator.exclude([Mock(case_id=case_id) for case_id in claimed_case_ids])
+    return generator
+
+
+def get_case_ids(cases):
+    return {str(case["id"]) for case in cases}
+
+
+@override_settings(USE_ZAKEN_MOCK_DATA=True)
+class ItineraryKnapsackListRankingsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_rankings_are_reused(self):
+        """
+        A generation with the same pool and settings reuses the ranked lists
+        """
+        with patch.object(
+            ItineraryKnapsackList,
+            "rank_lists",
+            autospec=True,
+            side_effect=ItineraryKnapsackList.rank_lists,
+        ) as mock_rank_lists:
+            best_list = get_generator().generate()
+            self.assertEqual(get_generator().generate(), best_list)
+            mock_rank_lists.assert_called_once()
+
+            get_generator(target_length=4).generate()
+            self.assertEqual(mock_rank_lists.call_count, 2)
+
+    def test_claimed_cases_are_avoided(self):
+        """
+        The best ranked list without claimed cases is taken, and the search
+        only runs again when all ranked lists contain claimed cases
+        """
+        best_list = get_generator().generate()
+        all_case_ids = get_case_ids(get_zaken_case_list())
+
+        with patch.object(
+            ItineraryKnapsackList,
+            "rank_lists",
+            autospec=True,
+            side_effect=ItineraryKnapsackList.rank_lists,
+        ) as mock_rank_lists:
+            claimed_case_ids = get_case_ids(best_list[:1])
+            next_list = get_generator(claimed_case_ids=claimed_case_ids).generate()
+            self.assertFalse(claimed_case_ids & get_case_ids(next_list))
+            mock_rank_lists.assert_not_called()
+
+            # Leaves two cases, so every list of three cases has a claimed case
+            claimed_case_ids = set(sorted(all_case_ids)[2:])
+            next_list = get_generator(claimed_case_ids=claimed_case_ids).generate()
+            self.assertEqual(get_case_ids(next_list), all_case_ids - claimed_case_ids)
+            mock_rank_lists.assert_called_once()
+
+
+@override_settings(USE_ZAKEN_MOCK_DATA=True)
+class ItineraryKnapsackListDepotTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_depot(self):
+        """
+        Teams that start at their office get a single list from the office,
+        ordered by the distance to the office
+        """
+        team_settings = TeamSettings(start_at_depot=True)
+        generator = get_generator(target_length=3, team_settings=team_settings)
+
+        with patch.object(ItineraryKnapsackList, "rank_lists") as mock_rank_lists:
+            with patch.object(
+                ItineraryKnapsackList,
+                "get_distances",
+                autospec=True,
+                side_effect=ItineraryKnapsackList.get_distances,
+            ) as mock_get_distances:
+                best_list = generator.generate()
+
+        mock_rank_lists.assert_not_called()
+        mock_get_distances.assert_called_once()
+        center_case = mock_get_distances.call_args.args[1]
+        self.assertEqual(center_case["address"], team_settings.get_depot())
+        self.assertEqual(len(best_list), 3)
+        distances = [case["distance"] for case in best_list]
+        self.assertEqual(distances, sorted(distances))
+
+    def test_get_depot(self):
+        """
+        The office is in the city center, unless it's set
+        """
+        self.assertEqual(
+            TeamSettings().get_depot(),
+            {
+                "lat": settings.CITY_CENTRAL_LOCATION_LAT,
+                "lng": settings.CITY_CENTRAL_LOCATION_LNG,
+            },
+        )
+        self.assertEqual(
+            TeamSettings(depot_lat=52.3, depot_lng=4.8).get_depot(),
+            {"lat": 52.3, "lng": 4.8},
+        )
+
+
+@override_settings(USE_ZAKEN_MOCK_DATA=False)
+@patch("apps.planner.algorithm.base.requests.get")
+class EligibleCasesFieldsTest(TestCase):
+    def setUp(self):
+        self.cases = get_zaken_case_list()
+
+    def get_eligible_cases(self, algorithm, mock_requests_get):
+        mock_requests_get.return_value.iter_content.return_value = [
+            json.dumps({"results": self.cases}).encode()
+        ]
+        generator = algorithm(get_generator().settings)
+        generator.exclude([])
+        return generator.__get_eligible_cases__()
+
+    def test_suggestions_keep_all_fields(self, mock_requests_get):
+        """
+        The suggestions are returned to the clients, so their cases keep all fields
+        """
+        cases = self.get_eligible_cases(ItineraryKnapsackSuggestions, mock_requests_get)
+
+        self.assertEqual(cases, self.cases)
+
+    def test_lists_keep_planner_fields(self, mock_requests_get):
+        """
+        Only the planner fields of the cases are kept to plan lists
+        """
+        cases = self.get_eligible_cases(ItineraryKnapsackList, mock_requests_get)
+
+        self.assertEqual(len(cases), len(self.cases))
+        self.assertTrue(set(cases[0]) <= set(PLANNER_CASE_FIELDS))
+        self.assertNotIn("current_states", cases[0])
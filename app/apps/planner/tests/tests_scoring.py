@@ -0,0 +1,77 @@
+"""
+Tests for the scoring of case pools
+"""
+
+from unittest.mock import Mock, patch
+
+from apps.planner.models import Weights
+from apps.planner.scoring import FEATURES, ScoringEngine, register_feature
+from django.test import TestCase
+from freezegun import freeze_time
+
+
+def get_case(weight=0, date_added=None, street_name="Foo street", number=1):
+    schedule = {"priority": {"weight": weight}}
+    if date_added:
+        schedule["date_added"] = date_added
+    return {
+        "address": {"street_name": street_name, "number": number},
+        "schedules": [schedule],
+    }
+
+
+class ScoringEngineTest(TestCase):
+    def test_distance_and_priority(self):
+        """
+        The score is the weighted sum of the distance and priority
+        """
+        cases = [get_case(0.5, number=1), get_case(1, number=2), {"schedules": []}]
+        scoring_engine = ScoringEngine(cases, Weights(distance=0.25, priority=0.3))
+
+        scores = scoring_engine.score([1, 0.5, 0])
+
+        self.assertEqual(scores, [0.25 + 0.15, 0.125 + 0.3, 0])
+        self.assertEqual(scoring_engine.score(), [0.15, 0.3, 0])
+
+    @freeze_time("2020-01-31")
+    def test_age(self):
+        """
+        Cases that are waiting longer score higher
+        """
+        cases = [
+            get_case(date_added="2020-01-01", number=1),
+            get_case(date_added="2020-01-21T10:00:00Z", number=2),
+            get_case(number=3),
+        ]
+        scoring_engine = ScoringEngine(cases, Weights(distance=0, priority=0, age=1))
+
+        self.assertEqual(scoring_engine.score(), [1, 10 / 30, 0])
+
+    def test_stacked_address(self):
+        """
+        Cases at an address with other cases get a bonus
+        """
+        cases = [get_case(number=1), get_case(number=1), get_case(number=2)]
+        scoring_engine = ScoringEngine(
+            cases, Weights(distance=0, priority=0, stacked_address=0.5)
+        )
+
+        self.assertEqual(scoring_engine.score(), [0.5, 0.5, 0])
+
+    def test_registered_feature(self):
+        """
+        A registered feature is weighted by the field of the same name, and
+        computed once for all centers
+        """
+        get_column = Mock(return_value=[1.0])
+        weights = Weights(distance=1, priority=1)
+        weights.foo = 0.5
+
+        with patch.dict(FEATURES):
+            register_feature("foo")(get_column)
+            scoring_engine = ScoringEngine([get_case(0.5)], weights)
+
+            self.assertEqual(scoring_engine.score([1]), [2])
+            self.assertEqual(scoring_engine.score([0]), [1])
+
+        get_column.assert_called_once()
@@ -0,0 +1,33 @@
+"""
+Tests for the planner tasks
+"""
+
+from unittest.mock import patch
+
+import requests
+from apps.planner.tasks import refresh_reference_data_task
+from django.test import TestCase
+
+
+@patch("apps.planner.tasks.refresh_reference_data")
+class RefreshReferenceDataTaskTest(TestCase):
+    def test_failed_paths_are_retried(self, mock_refresh_reference_data):
+        """
+        Only the paths that failed because of Zaken are retried
+        """
+        exception = requests.ConnectionError()
+        mock_refresh_reference_data.side_effect = [None, exception]
+
+        with patch.object(refresh_reference_data_task, "retry") as mock_retry:
+            refresh_reference_data_task.run(paths=["reasons/", "tags/"])
+
+        mock_retry.assert_called_once_with(kwargs={"paths": ["tags/"]}, exc=exception)
+
+    def test_not_retried(self, mock_refresh_reference_data):
+        """
+        Nothing is retried when all paths are refreshed
+        """
+        with patch.object(refresh_reference_data_task, "retry") as mock_retry:
+            refresh_reference_data_task.run(paths=["reasons/"])
+
+        mock_retry.assert_not_called()
@@ -0,0 +1,79 @@
+"""
+Tests for the map tiles of open cases
+"""
+
+from apps.planner.tiles import get_tile, get_world_position
+from django.test import TestCase, override_settings
+
+# Tile 2103/1346 at zoom 12 covers the center of Amsterdam
+ZOOM, X, Y = 12, 2103, 1346
+
+
+def get_case(case_id, lat, lng, priority=None):
+    return {
+        "id": case_id,
+        "address": {"lat": lat, "lng": lng},
+        "schedules": [{"priority": {"name": priority}}] if priority else [],
+    }
+
+
+def get_pool(cases, version="FOO_VERSION"):
+    return {"version": version, "cases": cases}
+
+
+class GetWorldPositionTest(TestCase):
+    def test_get_world_position(self):
+        """
+        The position is relative to the top left corner of the world map
+        """
+        self.assertEqual(get_world_position(0, -180), (0, 0.5))
+        x, y = get_world_position(52.37, 4.89)
+        self.assertEqual((int(x * 2**ZOOM), int(y * 2**ZOOM)), (X, Y))
+
+
+@override_settings(CASE_TILE_CLUSTER_GRID_SIZE=2, CASE_TILE_CASE_IDS_MIN_ZOOM=16)
+class GetTileTest(TestCase):
+    def setUp(self):
+        self.pool = get_pool(
+            [
+                get_case(1, 52.3701, 4.8901, "Hoog"),
+                get_case(2, 52.3702, 4.8902, "Hoog"),
+                get_case(3, 52.3703, 4.8903),
+                # Another cell of the same tile
+                get_case(4, 52.3701, 4.86, "Normaal"),
+                # Outside of the tile
+                get_case(5, 52.0, 5.0, "Hoog"),
+            ]
+        )
+
+    def test_clusters(self):
+        """
+        Cases in the same cell are clustered, with their centroid and priorities
+        """
+        tile = get_tile(self.pool, ZOOM, X, Y)
+
+        self.assertEqual(tile["count"], 4)
+        self.assertEqual(len(tile["clusters"]), 2)
+        cluster = tile["clusters"][1]
+        self.assertEqual(cluster["count"], 3)
+        self.assertAlmostEqual(cluster["lat"], 52.3702)
+        self.assertAlmostEqual(cluster["lng"], 4.8902)
+        self.assertEqual(cluster["priorities"], {"Hoog": 2, "Onbekend": 1})
+        self.assertNotIn("case_ids", cluster)
+
+    def test_exclude_case_ids(self):
+        """
+        Excluded cases are left out of the clusters
+        """
+        tile = get_tile(self.pool, ZOOM, X, Y, exclude_case_ids=["1", "4"])
+
+        self.assertEqual(tile["count"], 2)
+        self.assertEqual(len(tile["clusters"]), 1)
+
+    def test_case_ids_at_high_zoom(self):
+        """
+        From CASE_TILE_CASE_IDS_MIN_ZOOM on, the clusters include their case ids
+        """
+        tile = get_tile(self.pool, 16, 33658, 21537)
+
+        self.assertEqual(tile["clusters"][0]["case_ids"], ["1", "2", "3"])
@@ -0,0 +1,197 @@
+"""
+Tests for the stored distances between addresses
+"""
+
+import datetime
+from unittest.mock import patch
+
+from apps.planner.algorithm.knapsack import ItineraryKnapsackList
+from apps.planner.models import TravelCost
+from apps.planner.tasks import clean_up_travel_costs_task
+from apps.planner.tests.tests_knapsack import get_generator
+from apps.planner.travel_costs import (
+    TravelCostMatrix,
+    get_travel_cost_matrix,
+    get_travel_mode,
+)
+from django.test import TestCase, override_settings
+from freezegun import freeze_time
+
+
+def get_case(case_id, lat, lng):
+    return {
+        "id": case_id,
+        "address": {"bag_id": f"FOO_BAG_ID_{case_id}", "lat": lat, "lng": lng},
+    }
+
+
+class TravelCostMatrixTest(TestCase):
+    def setUp(self):
+        self.cases = [
+            get_case(1, 52.370, 4.890),
+            get_case(2, 52.371, 4.891),
+            get_case(3, 52.372, 4.892),
+        ]
+
+    def test_missing_distances_are_stored(self):
+        """
+        Missing distances are computed at once and stored in a batch
+        """
+        travel_costs = TravelCostMatrix(self.cases, self.cases[:1], "walking")
+
+        with patch(
+            "apps.planner.travel_costs.calculate_geo_distances",
+            return_value=[0, 100, 200],
+        ) as mock_calculate_geo_distances:
+            distances = travel_costs.get_distances(self.cases[0], self.cases)
+
+        self.assertEqual(distances, [0, 100, 200])
+        mock_calculate_geo_distances.assert_called_once()
+        self.assertEqual(TravelCost.objects.count(), 0)
+
+        with self.assertNumQueries(1):
+            travel_costs.save()
+        self.assertEqual(
+            TravelCost.objects.get(
+                mode="walking",
+                origin_bag_id="FOO_BAG_ID_1",
+                destination_bag_id="FOO_BAG_ID_3",
+            ).meters,
+            200,
+        )
+
+    def test_stored_distances_are_loaded(self):
+        """
+        With all distances stored, none are computed
+        """
+        travel_costs = TravelCostMatrix(self.cases, self.cases[:1], "walking")
+        expected = travel_costs.get_distances(self.cases[0], self.cases)
+        travel_costs.save()
+
+        with self.assertNumQueries(1):
+            travel_costs = TravelCostMatrix(self.cases, self.cases[:1], "walking")
+        with patch(
+            "apps.planner.travel_costs.calculate_geo_distances"
+        ) as mock_calculate_geo_distances:
+            distances = travel_costs.get_distances(self.cases[0], self.cases)
+
+        self.assertEqual(distances, expected)
+        mock_calculate_geo_distances.assert_not_called()
+        self.assertEqual(travel_costs.pending, {})
+
+    def test_cases_without_bag_id(self):
+        """
+        Distances to cases without a bag id are computed but not stored
+        """
+        cases = self.cases + [{"id": 4, "address": {"lat": 52.373, "lng": 4.893}}]
+        travel_costs = TravelCostMatrix(cases, self.cases[:1], "walking")
+
+        distances = travel_costs.get_distances(self.cases[0], cases)
+        travel_costs.save()
+
+        self.assertEqual(len(distances), 4)
+        self.assertEqual(TravelCost.objects.count(), 3)
+
+    def test_only_rows_of_the_centers_are_loaded(self):
+        """
+        Only the distances from the centers are loaded
+        """
+        travel_costs = TravelCostMatrix(self.cases, self.cases, "walking")
+        for case in self.cases:
+            travel_costs.get_distances(case, self.cases)
+        travel_costs.save()
+        self.assertEqual(TravelCost.objects.count(), 9)
+
+        travel_costs = TravelCostMatrix(self.cases, self.cases[1:2], "walking")
+
+        self.assertEqual(list(travel_costs.rows), ["FOO_BAG_ID_2"])
+        self.assertEqual(len(travel_costs.rows["FOO_BAG_ID_2"]), 3)
+
+    def test_last_used_on(self):
+        """
+        Loading the distances marks them as used, at most once a day
+        """
+        with freeze_time("2020-01-01"):
+            travel_costs = TravelCostMatrix(self.cases, self.cases[:1], "walking")
+            travel_costs.get_distances(self.cases[0], self.cases)
+            travel_costs.save()
+
+        with freeze_time("2020-01-02"):
+            with self.assertNumQueries(2):
+                TravelCostMatrix(self.cases, self.cases[:1], "walking")
+            with self.assertNumQueries(1):
+                TravelCostMatrix(self.cases, self.cases[:1], "walking")
+
+        self.assertEqual(
+            set(TravelCost.objects.values_list("last_used_on", flat=True)),
+            {datetime.date(2020, 1, 2)},
+        )
+
+    @override_settings(TRAVEL_TIME_OSM_PATH="/data/foo.osm", TRAVEL_TIME_MODE="walking")
+    def test_travel_mode(self):
+        """
+        Distances over the street network are stored separately
+        """
+        self.assertEqual(get_travel_mode(), "walking")
+        self.assertIsNotNone(get_travel_cost_matrix(self.cases, self.cases))
+
+    def test_straight_line_distances_are_not_stored(self):
+        """
+        Straight-line distances are computed without the database
+        """
+        self.assertEqual(get_travel_mode(), "straight")
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_travel_cost_matrix(self.cases, self.cases))
+
+
+class RankListsTravelCostsTest(TestCase):
+    @patch("apps.planner.travel_costs.get_travel_mode", return_value="walking")
+    def test_rows_are_sent_to_the_workers(self, mock_get_travel_mode):
+        """
+        Each search gets only the distances from its center, and the distances
+        computed by the searches are stored
+        """
+        cases = [
+            get_case(case_id, 52.37 + case_id / 1000, 4.89) for case_id in range(6)
+        ]
+        generator = get_generator(target_length=2)
+
+        with patch.object(
+            ItineraryKnapsackList,
+            "parallelized_function",
+            autospec=True,
+            side_effect=ItineraryKnapsackList.parallelized_function,
+        ) as mock_parallelized_function:
+            generator.rank_lists(cases, cases[:2])
+
+        rows = [call.args[4] for call in mock_parallelized_function.call_args_list]
+        self.assertEqual([row.origin for row in rows], ["FOO_BAG_ID_0", "FOO_BAG_ID_1"])
+        self.assertEqual(
+            TravelCost.objects.filter(mode="walking").count(), 2 * len(cases)
+        )
+
+
+class CleanUpTravelCostsTaskTest(TestCase):
+    def test_unused_travel_costs_are_deleted(self):
+        """
+        Distances that weren't used for 30 days are deleted
+        """
+        for bag_id, last_used_on in (
+            ("FOO_BAG_ID_1", "2020-01-01"),
+            ("FOO_BAG_ID_2", "2020-01-02"),
+        ):
+            TravelCost.objects.create(
+                mode="walking",
+                origin_bag_id=bag_id,
+                destination_bag_id=bag_id,
+                meters=0,
+                last_used_on=last_used_on,
+            )
+
+        with freeze_time("2020-02-01"):
+            clean_up_travel_costs_task.run()
+
+        self.assertEqual(
+            list(TravelCost.objects.values_list("origin_bag_id", flat=True)),
+            ["FOO_BAG_ID_2"],
+        )
@@ -0,0 +1,197 @@
+"""
+Tests for the travel distances over a street network
+"""
+
+import os
+import tempfile
+from unittest.mock import patch
+
+from apps.planner.management.commands.benchmark_travel_times import get_grid_network
+from apps.planner.travel_times import DETOUR_FACTOR, StreetNetwork, get_meters
+from apps.planner.utils import calculate_geo_distances
+from django.test import TestCase
+
+# Two quays on both sides of a canal, connected by a bridge at the east end:
+#
+#   1 ------------ 2
+#                  | (bridge)
+#   3 ------------ 4
+OSM_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+  <node id="1" lat="52.3700" lon="4.8900"/>
+  <node id="2" lat="52.3700" lon="4.8950"/>
+  <node id="3" lat="52.3695" lon="4.8900"/>
+  <node id="4" lat="52.3695" lon="4.8950"/>
+  <way id="10">
+    <nd ref="1"/><nd ref="2"/>
+    <tag k="highway" v="residential"/>
+  </way>
+  <way id="11">
+    <nd ref="2"/><nd ref="4"/>
+    <tag k="highway" v="residential"/>
+    <tag k="bridge" v="yes"/>
+  </way>
+  <way id="12">
+    <nd ref="4"/><nd ref="3"/>
+    <tag k="highway" v="residential"/>
+    <tag k="oneway" v="yes"/>
+  </way>
+  <way id="13">
+    <nd ref="1"/><nd ref="3"/>
+    <tag k="highway" v="motorway"/>
+  </way>
+</osm>
+"""
+
+NODE_1 = (52.3700, 4.8900)
+NODE_3 = (52.3695, 4.8900)
+
+
+class StreetNetworkTest(TestCase):
+    def setUp(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".osm", delete=False) as f:
+            f.write(OSM_XML)
+        self.addCleanup(os.remove, f.name)
+        self.path = f.name
+
+    def test_distances_follow_the_streets(self):
+        """
+        The distance across the canal is the route over the bridge
+        """
+        network = StreetNetwork.from_file(self.path, "walking")
+
+        [meters] = network.get_distances(NODE_1, [NODE_3])
+
+        route = get_meters(NODE_1, (52.37, 4.895)) * 2 + get_meters(NODE_1, NODE_3)
+        self.assertAlmostEqual(meters, route, delta=0.1)
+        self.assertGreater(meters, 10 * get_meters(NODE_1, NODE_3))
+
+    def test_oneway_streets_when_cycling(self):
+        """
+        Oneway streets are only followed in their direction when cycling
+        """
+        walking = StreetNetwork.from_file(self.path, "walking")
+        cycling = StreetNetwork.from_file(self.path, "cycling")
+
+        self.assertEqual(
+            walking.get_distances(NODE_3, [NODE_1]),
+            walking.get_distances(NODE_1, [NODE_3]),
+        )
+        # Node 3 can't be left when cycling, so the straight-line distance is used
+        [meters] = cycling.get_distances(NODE_3, [NODE_1])
+        self.assertAlmostEqual(meters, get_meters(NODE_1, NODE_3), delta=1)
+
+    def test_nearest_node(self):
+        """
+        Locations are snapped to the nearest node of the network
+        """
+        network = StreetNetwork.from_file(self.path, "walking")
+
+        self.assertEqual(network.get_nearest_node((52.3701, 4.8951)), 2)
+        self.assertEqual(network.get_nearest_node((52.3710, 4.8900)), 1)
+
+    def test_outside_the_extract(self):
+        """
+        Locations outside the extract aren't snapped to a node, their straight-line
+        distances are used
+        """
+        network = StreetNetwork.from_file(self.path, "walking")
+        outside = (52.40, 4.80)
+
+        self.assertIsNone(network.get_nearest_node(outside))
+        self.assertEqual(
+            network.get_distances(NODE_1, [outside]), [get_meters(NODE_1, outside)]
+        )
+        self.assertEqual(
+            network.get_distances(outside, [NODE_1]), [get_meters(outside, NODE_1)]
+        )
+
+    def test_max_meters(self):
+        """
+        The search stops at max_meters, farther targets get an estimate of at least
+        max_meters
+        """
+        network = StreetNetwork.from_file(self.path, "walking")
+        [meters] = network.get_distances(NODE_1, [NODE_3])
+
+        self.assertEqual(network.get_distances(NODE_1, [NODE_3], meters + 1), [meters])
+        self.assertEqual(network.get_distances(NODE_1, [NODE_3], 100), [100])
+
+        [estimate] = network.get_distances(NODE_1, [(52.3700, 4.8950)], 100)
+        self.assertAlmostEqual(
+            estimate, get_meters(NODE_1, (52.3700, 4.8950)) * DETOUR_FACTOR
+        )
+
+    def test_search_within_max_meters(self):
+        """
+        The search only settles the nodes within max_meters, in a city of 2500
+        street nodes over about 3 by 3 km
+        """
+        network = get_grid_network(50)
+        source_node = 25 * 50 + 25
+        target_nodes = list(network.locations)
+
+        settled, cut_off = network.search(source_node, target_nodes, 1000)
+        full_settled, full_cut_off = network.search(
+            source_node, target_nodes, float("inf")
+        )
+
+        self.assertTrue(cut_off)
+        self.assertFalse(full_cut_off)
+        self.assertEqual(len(full_settled), 2500)
+        self.assertLess(len(settled), len(full_settled) / 4)
+        self.assertLessEqual(max(settled.values()), 1000)
+        for node_id, meters in settled.items():
+            self.assertAlmostEqual(meters, full_settled[node_id])
+
+    def test_travel_times(self):
+        """
+        The travel times are the distances at the speed of the travel mode
+        """
+        network = StreetNetwork.from_file(self.path, "walking")
+
+        matrix = network.get_travel_times([NODE_1, NODE_3], [NODE_1, NODE_3])
+
+        self.assertEqual(matrix[0][0], 0)
+        self.assertAlmostEqual(
+            matrix[0][1], network.get_distances(NODE_1, [NODE_3])[0] / 1.4
+        )
+
+    def test_travel_times_snap_targets_once(self):
+        """
+        The targets are snapped to the network once for the whole matrix
+        """
+        network = get_grid_network(20)
+        locations = list(network.locations.values())
+        sources, targets = locations[:5], locations[5:]
+
+        with patch.object(
+            network, "get_nearest_node", wraps=network.get_nearest_node
+        ) as mock_get_nearest_node:
+            matrix = network.get_travel_times(sources, targets, 1000)
+
+        self.assertEqual(mock_get_nearest_node.call_count, len(sources) + len(targets))
+        self.assertEqual(
+            matrix,
+            [
+                [
+                    meters / network.speed
+                    for meters in network.get_distances(source, targets, 1000)
+                ]
+                for source in sources
+            ],
+        )
+
+    def test_calculate_geo_distances(self):
+        """
+        With a street network the planner uses its distances
+        """
+        network = StreetNetwork.from_file(self.path, "walking")
+        cases = [{"address": {"lat": NODE_3[0], "lng": NODE_3[1]}}]
+
+        straight_line = calculate_geo_distances(NODE_1, cases)
+        with patch("apps.planner.utils.get_street_network", return_value=network):
+            over_the_streets = calculate_geo_distances(NODE_1, cases)
+
+        self.assertEqual(over_the_streets, network.get_distances(NODE_1, [NODE_3]))
+        self.assertLess(straight_line[0], over_the_streets[0])
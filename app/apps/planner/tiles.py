@@ -0,0 +1,130 @@
+"""
+Map tiles of the open cases of a day setting, clustered on the server so the map
+of the whole pool only needs a few kilobytes per tile.
+
+Tiles use the z/x/y scheme of web maps. Every tile is divided in a grid of
+CASE_TILE_CLUSTER_GRID_SIZE cells per side, and the cases within a cell form a cluster.
+"""
+
+import bisect
+import math
+import threading
+from collections import Counter
+
+from cachetools import LRUCache
+from django.conf import settings
+from utils.cache import ReadThroughCache
+
+UNKNOWN_PRIORITY = "Onbekend"
+
+# The deepest zoom level of web maps
+MAX_ZOOM = 22
+
+# Tiles by pool version, so they're dropped together with the pool
+tiles_cache = ReadThroughCache("case-tiles", ttl=settings.ZAKEN_CASE_POOL_CACHE_TTL)
+
+# Spatial indexes of recently used pools, by pool version
+case_pool_indexes = LRUCache(maxsize=32)
+case_pool_indexes_lock = threading.Lock()
+
+
+def is_valid_tile(z, x, y):
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2**z and 0 <= y < 2**z
+
+
+def get_world_position(lat, lng):
+    """
+    Returns the web mercator position of a location, as fractions of the world map
+    """
+    lat = max(min(lat, 85.0511), -85.0511)
+    sin_lat = math.sin(math.radians(lat))
+    x = (lng + 180) / 360
+    y = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return x, y
+
+
+def get_priority(case):
+    schedule = next(iter(case.get("schedules") or []), {})
+    return (schedule.get("priority") or {}).get("name") or UNKNOWN_PRIORITY
+
+
+class CasePoolIndex:
+    """
+    The cases of a pool sorted on their x position, so the cases of a tile
+    are found with a binary search
+    """
+
+    def __init__(self, cases):
+        points = []
+        for case in cases:
+            address = case.get("address") or {}
+            lat, lng = address.get("lat"), address.get("lng")
+            if lat is None or lng is None:
+                continue
+            x, y = get_world_position(lat, lng)
+            points.append((x, y, lat, lng, str(case.get("id")), get_priority(case)))
+
+        self.points = sorted(points)
+        self.xs = [point[0] for point in self.points]
+
+    def get_points(self, z, x, y):
+        tile_count = 2**z
+        start = bisect.bisect_left(self.xs, x / tile_count)
+        end = bisect.bisect_left(self.xs, (x + 1) / tile_count)
+
+        return [
+            point
+            for point in self.points[start:end]
+            if y <= point[1] * tile_count < y + 1
+        ]
+
+
+def get_case_pool_index(pool):
+    with case_pool_indexes_lock:
+        index = case_pool_indexes.get(pool["version"])
+    if index is None:
+        index = CasePoolIndex(pool["cases"])
+        with case_pool_indexes_lock:
+            case_pool_indexes[pool["version"]] = index
+    return index
+
+
+def get_tile(pool, z, x, y, exclude_case_ids=()):
+    """
+    Returns the clusters of the cases in the tile, with their count, centroid
+    and priorities. From CASE_TILE_CASE_IDS_MIN_ZOOM on, the case ids are included.
+    """
+    exclude_case_ids = set(exclude_case_ids)
+    grid_size = settings.CASE_TILE_CLUSTER_GRID_SIZE
+    tile_count = 2**z
+
+    cells = {}
+    for point in get_case_pool_index(pool).get_points(z, x, y):
+        if point[4] in exclude_case_ids:
+            continue
+        cell = (
+            int((point[0] * tile_count - x) * grid_size),
+            int((point[1] * tile_count - y) * grid_size),
+        )
+        cells.setdefault(cell, []).append(point)
+
+    clusters = []
+    for cell in sorted(cells):
+        points = cells[cell]
+        cluster = {
+            "count": len(points),
+            "lat": sum(point[2] for point in points) / len(points),
+            "lng": sum(point[3] for point in points) / len(points),
+            "priorities": dict(Counter(point[5] for point in points)),
+        }
+        if z >= settings.CASE_TILE_CASE_IDS_MIN_ZOOM:
+            cluster["case_ids"] = [point[4] for point in points]
+        clusters.append(cluster)
+
+    return {
+        "z": z,
+        "x": x,
+        "y": y,
+        "count": sum(cluster["count"] for cluster in clusters),
+        "clusters": clusters,
+    }
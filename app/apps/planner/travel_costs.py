@@ -0,0 +1,146 @@
+"""
+Distances over the street network between the addresses of a case pool, stored in
+the database.
+
+The same addresses are eligible day after day, so the distances from the centers of
+a search are loaded at once, and only the missing ones are computed and written back
+in a batch. Straight-line distances are cheaper to compute than to load, so they're
+not stored. Distances that aren't used for a while are cleaned up
+(see apps/planner/tasks.py).
+"""
+
+import datetime
+import logging
+
+from apps.planner.models import TravelCost
+from apps.planner.utils import calculate_geo_distances
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def get_travel_mode():
+    """
+    The stored distances depend on the way they're computed
+    """
+    if settings.TRAVEL_TIME_OSM_PATH:
+        return settings.TRAVEL_TIME_MODE
+    return "straight"
+
+
+def get_bag_id(case):
+    return (case.get("address") or {}).get("bag_id")
+
+
+def get_travel_cost_matrix(cases, centers):
+    """
+    Returns the stored distances from the centers to the cases, or None for
+    straight-line distances
+    """
+    mode = get_travel_mode()
+    if mode == "straight":
+        return None
+    return TravelCostMatrix(cases, centers, mode)
+
+
+class TravelCostRow:
+    """
+    The stored distances from a single origin address by destination, small enough to
+    send to a worker process
+    """
+
+    def __init__(self, origin, costs):
+        self.origin = origin
+        self.costs = costs
+        # The computed distances that are not stored yet, by (origin, destination)
+        self.pending = {}
+
+    def get_distances(self, center_case, cases):
+        """
+        Returns the distances in meters from the center case to the cases,
+        computing the ones that are not stored at once
+        """
+        distances = [self.costs.get(get_bag_id(case)) for case in cases]
+        missing = [index for index, meters in enumerate(distances) if meters is None]
+
+        if missing:
+            address = center_case.get("address", {})
+            center = address.get("lat"), address.get("lng")
+            computed = calculate_geo_distances(center, [cases[i] for i in missing])
+            for index, meters in zip(missing, computed):
+                distances[index] = meters
+                destination = get_bag_id(cases[index])
+                if self.origin and destination:
+                    self.costs[destination] = meters
+                    self.pending[(self.origin, destination)] = meters
+
+        return distances
+
+
+class TravelCostMatrix:
+    """
+    The stored distances from the addresses of the centers to those of the cases,
+    as a row per origin address
+    """
+
+    def __init__(self, cases, centers, mode=None):
+        self.mode = mode or get_travel_mode()
+        origins = {get_bag_id(center) for center in centers} - {None}
+        destinations = {get_bag_id(case) for case in cases} - {None}
+        self.rows = {origin: {} for origin in origins}
+        # The computed distances that are not stored yet, by (origin, destination)
+        self.pending = {}
+
+        if not origins or not destinations:
+            return
+
+        travel_costs = TravelCost.objects.filter(
+            mode=self.mode,
+            origin_bag_id__in=origins,
+            destination_bag_id__in=destinations,
+        )
+        today = datetime.date.today()
+        unused_today = False
+        for origin, destination, meters, last_used_on in travel_costs.values_list(
+            "origin_bag_id", "destination_bag_id", "meters", "last_used_on"
+        ).iterator(chunk_size=10000):
+            self.rows[origin][destination] = meters
+            unused_today = unused_today or last_used_on < today
+
+        # Marked as used at most once a day, so the cleanup keeps them
+        if unused_today:
+            travel_costs.filter(last_used_on__lt=today).update(last_used_on=today)
+
+    def get_row(self, center_case):
+        origin = get_bag_id(center_case)
+        return TravelCostRow(origin, self.rows.setdefault(origin, {}) if origin else {})
+
+    def get_distances(self, center_case, cases):
+        row = self.get_row(center_case)
+        distances = row.get_distances(center_case, cases)
+        self.pending.update(row.pending)
+        return distances
+
+    def save(self):
+        """
+        Stores the computed distances in a batch
+        """
+        if not self.pending:
+            return
+
+        TravelCost.objects.bulk_create(
+            [
+                TravelCost(
+                    mode=self.mode,
+                    origin_bag_id=origin,
+                    destination_bag_id=destination,
+                    meters=meters,
+                )
+                for (origin, destination), meters in self.pending.items()
+            ],
+            batch_size=1000,
+            # Another generation may have stored the same distances in the meantime
+            ignore_conflicts=True,
+        )
+        logger.info(f"Stored {len(self.pending)} travel costs")
+        self.pending = {}
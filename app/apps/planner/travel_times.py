@@ -0,0 +1,273 @@
+"""
+Travel distances over the street network of a local OpenStreetMap extract.
+
+Straight-line distances underestimate the walks and rides around canals and over
+bridges, so with TRAVEL_TIME_OSM_PATH the planner uses the shortest routes over the
+streets instead. Every process loads the extract on its first lookup, after that
+everything runs offline.
+
+- .osm (XML) extracts are read with the standard library.
+- .osm.pbf extracts need pyosmium (the osmium package).
+"""
+
+import heapq
+import logging
+import math
+import threading
+import xml.etree.ElementTree as ElementTree
+
+from apps.planner.const import TRAVEL_MODES
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger(__name__)
+
+# Nodes are looked up in a grid of cells of this many degrees
+GRID_CELL_SIZE = 0.001
+# Locations farther than this many cells from the streets aren't snapped to a node
+MAX_NEAREST_NODE_RADIUS = 5
+# Estimates the distance over the streets from a straight-line distance
+DETOUR_FACTOR = 1.3
+
+street_network = None
+street_network_lock = threading.Lock()
+
+
+def get_meters(a, b):
+    """
+    Returns the distance between two nearby locations in meters (equirectangular)
+    """
+    x = math.radians(b[1] - a[1]) * math.cos(math.radians((a[0] + b[0]) / 2))
+    y = math.radians(b[0] - a[0])
+    return math.hypot(x, y) * 6371000
+
+
+def get_cell(location):
+    return (
+        math.floor(location[0] / GRID_CELL_SIZE),
+        math.floor(location[1] / GRID_CELL_SIZE),
+    )
+
+
+def is_oneway(tags, mode):
+    if mode == "walking":
+        return False
+    if tags.get("oneway:bicycle") == "no":
+        return False
+    return tags.get("oneway") in ("yes", "1", "true")
+
+
+def read_osm_xml(path):
+    """
+    Returns the locations of the nodes and the tags and node ids of the ways
+    """
+    locations = {}
+    ways = []
+    for _, element in ElementTree.iterparse(path):
+        if element.tag == "node":
+            locations[int(element.get("id"))] = (
+                float(element.get("lat")),
+                float(element.get("lon")),
+            )
+        elif element.tag == "way":
+            tags = {tag.get("k"): tag.get("v") for tag in element.iter("tag")}
+            if "highway" in tags:
+                ways.append((tags, [int(nd.get("ref")) for nd in element.iter("nd")]))
+        if element.tag in ("node", "way", "relation"):
+            element.clear()
+    return locations, ways
+
+
+def read_osm_pbf(path):
+    try:
+        import osmium
+    except ImportError:
+        raise ImproperlyConfigured(
+            "Reading .pbf extracts requires pyosmium, install it or use an .osm extract"
+        )
+
+    locations = {}
+    ways = []
+    for obj in osmium.FileProcessor(path):
+        if obj.is_node():
+            locations[obj.id] = (obj.location.lat, obj.location.lon)
+        elif obj.is_way() and "highway" in obj.tags:
+            ways.append(
+                (
+                    {tag.k: tag.v for tag in obj.tags},
+                    [node.ref for node in obj.nodes],
+                )
+            )
+    return locations, ways
+
+
+class StreetNetwork:
+    """
+    The streets of an extract as a graph of nodes, with the lengths of the streets
+    between them. Only the streets that are accessible for the travel mode are used.
+    """
+
+    def __init__(self, locations, ways, mode="walking"):
+        self.mode = mode
+        self.speed = TRAVEL_MODES[mode]["speed"]
+        highways = TRAVEL_MODES[mode]["highways"]
+
+        self.locations = {}
+        self.edges = {}
+        for tags, node_ids in ways:
+            if tags.get("highway") not in highways or tags.get("access") == "no":
+                continue
+            oneway = is_oneway(tags, mode)
+            node_ids = [node_id for node_id in node_ids if node_id in locations]
+            for a, b in zip(node_ids, node_ids[1:]):
+                meters = get_meters(locations[a], locations[b])
+                self.edges.setdefault(a, []).append((b, meters))
+                self.edges.setdefault(b, [])
+                if not oneway:
+                    self.edges[b].append((a, meters))
+                self.locations[a] = locations[a]
+                self.locations[b] = locations[b]
+
+        self.cells = {}
+        for node_id, location in self.locations.items():
+            self.cells.setdefault(get_cell(location), []).append(node_id)
+
+    @classmethod
+    def from_file(cls, path, mode="walking"):
+        if path.endswith(".pbf"):
+            locations, ways = read_osm_pbf(path)
+        else:
+            locations, ways = read_osm_xml(path)
+        return cls(locations, ways, mode)
+
+    def get_nearest_node(self, location):
+        """
+        Returns the node nearest to the location, searching the surrounding cells
+        in growing rings until a node is found. Locations outside the extract
+        have no nearest node.
+        """
+        lat_cell, lng_cell = get_cell(location)
+        for radius in range(MAX_NEAREST_NODE_RADIUS + 1):
+            candidates = [
+                node_id
+                for lat in range(lat_cell - radius, lat_cell + radius + 1)
+                for lng in range(lng_cell - radius, lng_cell + radius + 1)
+                if max(abs(lat - lat_cell), abs(lng - lng_cell)) == radius
+                for node_id in self.cells.get((lat, lng), [])
+            ]
+            if candidates:
+                return min(
+                    candidates,
+                    key=lambda node_id: get_meters(location, self.locations[node_id]),
+                )
+        return None
+
+    def get_nearest_nodes(self, locations):
+        return [self.get_nearest_node(location) for location in locations]
+
+    def search(self, source_node, target_nodes, max_meters):
+        """
+        Returns the shortest distances over the streets from the source node to the
+        nodes it settled, with Dijkstra until all target nodes are settled or no
+        node is left within max_meters, and whether streets beyond max_meters were
+        left out
+        """
+        remaining = set(target_nodes) - {None}
+        settled = {}
+        cut_off = False
+        if source_node is None:
+            return settled, cut_off
+
+        # Nodes are only queued within max_meters and when their route got shorter
+        queued = {source_node: 0.0}
+        queue = [(0.0, source_node)]
+        while queue and remaining:
+            meters, node_id = heapq.heappop(queue)
+            if node_id in settled:
+                continue
+            settled[node_id] = meters
+            remaining.discard(node_id)
+            for neighbor, length in self.edges.get(node_id, ()):
+                neighbor_meters = meters + length
+                if neighbor_meters > max_meters:
+                    cut_off = True
+                elif neighbor_meters < queued.get(neighbor, math.inf):
+                    queued[neighbor] = neighbor_meters
+                    heapq.heappush(queue, (neighbor_meters, neighbor))
+        return settled, cut_off
+
+    def get_distances(self, source, targets, max_meters=None, target_nodes=None):
+        """
+        Returns the shortest distances in meters over the streets from the source
+        to the target locations, with a single search that stops at max_meters.
+
+        - Targets beyond max_meters get their straight-line distance times
+          DETOUR_FACTOR, but at least max_meters.
+        - Targets that can't be reached or are outside the extract get their
+          straight-line distance, so a gap in the extract doesn't exclude a case.
+        """
+        if max_meters is None:
+            max_meters = settings.TRAVEL_TIME_MAX_DISTANCE
+        if target_nodes is None:
+            target_nodes = self.get_nearest_nodes(targets)
+        source_node = self.get_nearest_node(source)
+        settled, cut_off = self.search(source_node, target_nodes, max_meters)
+
+        distances = []
+        for target, target_node in zip(targets, target_nodes):
+            if target_node in settled:
+                # Include the walk to and from the nearest nodes
+                distances.append(
+                    get_meters(source, self.locations[source_node])
+                    + settled[target_node]
+                    + get_meters(self.locations[target_node], target)
+                )
+            elif cut_off and target_node is not None:
+                distances.append(
+                    max(max_meters, get_meters(source, target) * DETOUR_FACTOR)
+                )
+            else:
+                distances.append(get_meters(source, target))
+        return distances
+
+    def get_travel_times(self, sources, targets, max_meters=None):
+        """
+        Returns a matrix of travel times in seconds, one row per source. The targets
+        are snapped to the network once, and every row is a single search that stops
+        at max_meters.
+        """
+        target_nodes = self.get_nearest_nodes(targets)
+        return [
+            [
+                meters / self.speed
+                for meters in self.get_distances(
+                    source, targets, max_meters, target_nodes
+                )
+            ]
+            for source in sources
+        ]
+
+
+def load_street_network():
+    """
+    Loads the extract of TRAVEL_TIME_OSM_PATH, once per process. uWSGI loads the app
+    in every worker (lazy-apps), so the workers don't share the street network.
+    """
+    global street_network
+
+    with street_network_lock:
+        if street_network is None:
+            street_network = StreetNetwork.from_file(
+                settings.TRAVEL_TIME_OSM_PATH, settings.TRAVEL_TIME_MODE
+            )
+            logger.info(
+                f"Loaded a street network of {len(street_network.locations)} nodes "
+                f"from {settings.TRAVEL_TIME_OSM_PATH}"
+            )
+    return street_network
+
+
+def get_street_network():
+    if not settings.TRAVEL_TIME_OSM_PATH:
+        return None
+    return street_network or load_street_network()
@@ -1,6 +1,9 @@
+import hashlib
+import json
 import logging
 from datetime import datetime
 
+from apps.planner.travel_times import get_street_network
 from dateutil import parser
 from django.utils import timezone
 from geopy.distance import distance
@@ -23,6 +26,14 @@ def remove_cases_from_list(cases, cases_to_remove):
     return new_list
 
 
+def get_pool_version(cases):
+    """
+    Returns a hash of the cases, the same for pools with the same cases and data
+    """
+    data = json.dumps(cases, sort_keys=True, default=str)
+    return hashlib.sha1(data.encode()).hexdigest()
+
+
 # AZA
 def get_case_coordinates(cases):
     """
@@ -44,9 +55,15 @@ def get_case_coordinates(cases):
 # AZA
 def calculate_geo_distances(center, cases):
     """
-    Returns a set of distances in KM from the given center
+    Returns a set of distances in meters from the given center. With a street network
+    these are the distances over the streets, otherwise straight-line distances.
     """
     case_coordinates = get_case_coordinates(cases)
+
+    network = get_street_network()
+    if network:
+        return network.get_distances(center, case_coordinates)
+
     distances = [
         distance(center, coordinates).km * 1000 for coordinates in case_coordinates
     ]
@@ -1,7 +1,7 @@
 import datetime
 import sys
 
-from apps.itinerary.models import Itinerary
+from apps.itinerary.models import SUGGESTIONS_CACHE_VERSION, ItineraryItem
 from apps.planner.models import DaySettings, TeamSettings
 from apps.planner.serializers import (
     CaseProjectSerializer,
@@ -16,11 +16,14 @@ from apps.planner.serializers import (
     TeamSettingsSerializer,
     TeamSettingsThemeSerializer,
 )
+from apps.planner.tiles import get_tile, is_valid_tile, tiles_cache
 from apps.users.utils import get_auth_header_from_request
 from django.conf import settings
 from django.contrib.auth.decorators import user_passes_test
 from django.core.management import call_command
+from django.db.models import Prefetch
 from django.http import Http404, HttpResponse
+from django.utils import timezone
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import OpenApiParameter, extend_schema
 from rest_framework import serializers, status
@@ -29,9 +32,50 @@ from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 from settings.const import DAY_SETTING_IN_USE
+from utils.cache import get_version
+from utils.queries_zaken_api import fetch_cases_counts
 
 
-class TeamSettingsViewSet(ModelViewSet):
+class CaseCountMixin:
+    """
+    With ?case-count=true, fetches the case counts of all serialized DaySettings
+    at once and passes them to the serializer through the context
+    """
+
+    def get_day_settings_list(self, instances):
+        return instances
+
+    def get_case_counts(self, instances):
+        day_settings_list = list(self.get_day_settings_list(instances))
+        counts = fetch_cases_counts(
+            [
+                day_settings.get_cases_query_params()
+                for day_settings in day_settings_list
+            ],
+            get_auth_header_from_request(self.request),
+        )
+        return {
+            day_settings.id: count
+            for day_settings, count in zip(day_settings_list, counts)
+        }
+
+    def get_serializer(self, *args, **kwargs):
+        instance = args[0] if args else kwargs.get("instance")
+
+        # Only when reading, after an update the counts must be based on the new data
+        if (
+            instance is not None
+            and self.request.method == "GET"
+            and bool(self.request.GET.get("case-count"))
+        ):
+            instances = instance if kwargs.get("many") else [instance]
+            context = kwargs.setdefault("context", self.get_serializer_context())
+            context["case_counts"] = self.get_case_counts(instances)
+
+        return super().get_serializer(*args, **kwargs)
+
+
+class TeamSettingsViewSet(CaseCountMixin, ModelViewSet):
     """
     A view for listing/adding/updating/removing a TeamSettings
     """
@@ -39,6 +83,24 @@ class TeamSettingsViewSet(ModelViewSet):
     serializer_class = TeamSettingsSerializer
     queryset = TeamSettings.objects.filter(enabled=True)
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ("list", "retrieve"):
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    "day_settings_list",
+                    queryset=DaySettings.objects.with_used_today_count(),
+                )
+            )
+        return queryset
+
+    def get_day_settings_list(self, instances):
+        return [
+            day_settings
+            for team_settings in instances
+            for day_settings in team_settings.day_settings_list.all()
+        ]
+
     @extend_schema(
         description="Gets the reasons associated with the requested team",
         responses={status.HTTP_200_OK: CaseReasonSerializer(many=True)},
@@ -197,7 +259,7 @@ class TeamSettingsViewSet(ModelViewSet):
         OpenApiParameter("case-count", OpenApiTypes.DATE, OpenApiParameter.QUERY),
     ]
 )
-class DaySettingsViewSet(ModelViewSet):
+class DaySettingsViewSet(CaseCountMixin, ModelViewSet):
     """
     A view for listing/adding/updating/removing a DaySettings
     """
@@ -205,13 +267,13 @@ class DaySettingsViewSet(ModelViewSet):
     serializer_class = DaySettingsSerializer
     queryset = DaySettings.objects.all()
 
+    def get_queryset(self):
+        return super().get_queryset().with_used_today_count()
+
     def destroy(self, request, *args, **kwargs):
         try:
             instance = self.get_object()
-            if not Itinerary.objects.filter(
-                settings__day_settings=instance,
-                created_at=datetime.datetime.now().strftime("%Y-%m-%d"),
-            ):
+            if not instance.used_today_count:
                 self.perform_destroy(instance)
             else:
                 raise ValidationError(DAY_SETTING_IN_USE, 404)
@@ -238,6 +300,37 @@ class DaySettingsViewSet(ModelViewSet):
         data = obj.fetch_cases_count(get_auth_header_from_request(request))
         return Response(data)
 
+    @extend_schema(
+        description=(
+            "Gets the open cases of these day settings in a map tile, "
+            "clustered with their count, centroid and priorities"
+        ),
+        responses={status.HTTP_200_OK: serializers.DictField()},
+    )
+    @action(
+        detail=True,
+        url_path=r"tiles/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)",
+        methods=["get"],
+    )
+    def tiles(self, request, pk, z, x, y):
+        z, x, y = int(z), int(x), int(y)
+        if not is_valid_tile(z, x, y):
+            raise ValidationError({"detail": f"Tile {z}/{x}/{y} doesn't exist"})
+
+        obj = self.get_object()
+        pool = obj.get_case_pool(get_auth_header_from_request(request))
+
+        def get_claimed_tile(key):
+            # Cases in today's itineraries are no longer open for planning
+            claimed_case_ids = ItineraryItem.objects.filter(
+                itinerary__created_at=timezone.now().date()
+            ).values_list("case__case_id", flat=True)
+            return get_tile(pool, z, x, y, claimed_case_ids)
+
+        # Cases added to or removed from itineraries bump the suggestions version
+        key = f"{pool['version']}:{get_version(SUGGESTIONS_CACHE_VERSION)}:{z}/{x}/{y}"
+        return Response(tiles_cache.get(key, get_claimed_tile))
+
 
 @user_passes_test(lambda u: u.is_superuser)
 def dumpdata(request):
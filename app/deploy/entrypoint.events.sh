@@ -0,0 +1,10 @@
+#!/usr/bin/env bash
+set -u   # crash on missing env variables
+set -e   # stop on any error
+set -x
+
+# Serves the itinerary event streams with uvicorn (settings/asgi.py). The API
+# process runs the migrations and collects the static files.
+export ROOT_URLCONF=settings.urls_events
+
+exec uvicorn settings.asgi:application --host 0.0.0.0 --port 8001 "$@"
@@ -0,0 +1,16 @@
+"""
+Serves the itinerary event streams, next to the API on uWSGI. The long-lived
+connections are handled asynchronously, so they don't hold a uWSGI worker.
+
+    ROOT_URLCONF=settings.urls_events uvicorn settings.asgi:application
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+from .logging import start_logging
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings.settings")
+start_logging()
+application = get_asgi_application()
@@ -25,8 +25,26 @@ ITINERARY_NOT_ENOUGH_CASES = {
     "title": "Helaas, geen looplijst mogelijk",
 }
 
+ITINERARY_ITEMS_ORDER_OUTDATED = {
+    "severity": API_EXCEPTION_SEVERITY_WARNING,
+    "message": "De looplijst is gewijzigd door een andere gebruiker. Ververs de looplijst en probeer het opnieuw.",
+    "title": "Volgorde niet opgeslagen",
+}
+
 DAY_SETTING_IN_USE = {
     "severity": API_EXCEPTION_SEVERITY_INFO,
     "message": "De dag instelling is in gebruik. Als morgen deze instelling niet wordt gebruikt kun je hem alsnog verwijderen.",
     "title": "Verwijderen niet mogelijk",
 }
+
+DAY_SETTING_MAX_USE_LIMIT_REACHED = {
+    "severity": API_EXCEPTION_SEVERITY_WARNING,
+    "message": "De dag instelling is vandaag al het maximale aantal keer gebruikt. Kies een andere dag instelling of neem contact op met je dagcoördinator.",
+    "title": "Helaas, geen looplijst mogelijk",
+}
+
+PLANNER_QUEUED = {
+    "severity": API_EXCEPTION_SEVERITY_INFO,
+    "message": "Er worden op dit moment veel looplijsten gemaakt. Probeer het over een paar seconden opnieuw.",
+    "title": "Looplijst in de wachtrij",
+}
@@ -1,5 +1,6 @@
 import os
 import socket
+import sys
 from datetime import timedelta
 from os.path import join
 from urllib.parse import urlparse
@@ -63,7 +64,8 @@ MIDDLEWARE = (
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 )
 
-ROOT_URLCONF = "settings.urls"
+# The event stream process serves its own urls, see settings/asgi.py
+ROOT_URLCONF = os.getenv("ROOT_URLCONF", "settings.urls")
 
 SECRET_KEY = os.environ.get("DJANGO_SECRET_KEY")
 WSGI_APPLICATION = "app.wsgi.application"
@@ -183,10 +185,7 @@ REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "PAGE_SIZE": 100,
     "DATETIME_FORMAT": "%Y-%m-%dT%H:%M:%S%z",
-    "DEFAULT_RENDERER_CLASSES": (
-        "rest_framework.renderers.JSONRenderer",
-        "rest_framework.renderers.BrowsableAPIRenderer",
-    ),
+    "DEFAULT_RENDERER_CLASSES": ("utils.renderers.ORJSONRenderer",),
     "DEFAULT_PERMISSION_CLASSES": [
         "apps.users.permissions.IsInAuthorizedRealm",
     ],
@@ -280,6 +279,8 @@ BAG_ID_AMSTEL_1 = "0363010012143319"
 BRK_ACCESS_CLIENT_ID = os.getenv("BRK_ACCESS_CLIENT_ID")
 BRK_ACCESS_CLIENT_SECRET = os.getenv("BRK_ACCESS_CLIENT_SECRET")
 BRK_ACCESS_URL = os.getenv("BRK_ACCESS_URL")
+# Seconds before expiry at which the BRK access token is refreshed
+BRK_ACCESS_TOKEN_REFRESH_MARGIN = int(os.getenv("BRK_ACCESS_TOKEN_REFRESH_MARGIN", 60))
 BRK_API_OBJECT_EXPAND_URL = os.getenv(
     "BRK_API_OBJECT_EXPAND_URL", "https://acc.api.data.amsterdam.nl/brk/object-expand/"
 )
@@ -287,10 +288,34 @@ BRK_API_OBJECT_EXPAND_URL = os.getenv(
 # BAG Access request settings
 BAG_BENKAGG_API_URL = "https://api.data.amsterdam.nl/v1/benkagg/adresseerbareobjecten/"
 
+# Seconds BAG and BRK responses are cached, stale entries are refreshed in the background
+BAG_DATA_CACHE_TTL = int(os.getenv("BAG_DATA_CACHE_TTL", 60 * 60 * 24))
+BAG_DATA_CACHE_STALE_TTL = int(os.getenv("BAG_DATA_CACHE_STALE_TTL", 60 * 60 * 24 * 7))
+BRK_DATA_CACHE_TTL = int(os.getenv("BRK_DATA_CACHE_TTL", 60 * 60))
+BRK_DATA_CACHE_STALE_TTL = int(os.getenv("BRK_DATA_CACHE_STALE_TTL", 60 * 60 * 24))
+ADDRESS_DATA_CACHE_NEGATIVE_TTL = int(
+    os.getenv("ADDRESS_DATA_CACHE_NEGATIVE_TTL", 60 * 10)
+)
+
 # Zaken Access request settings
 ZAKEN_API_URL = os.getenv("ZAKEN_API_URL", None)
 ZAKEN_API_HEALTH_URL = os.getenv("ZAKEN_API_HEALTH_URL", None)
 USE_ZAKEN_MOCK_DATA = os.environ.get("USE_ZAKEN_MOCK_DATA", False)
+# Seconds lookup data from Zaken (reasons, schedule types, etc.) is cached
+ZAKEN_REFERENCE_DATA_CACHE_TTL = int(
+    os.getenv("ZAKEN_REFERENCE_DATA_CACHE_TTL", 60 * 60 * 24)
+)
+ZAKEN_REFERENCE_DATA_CACHE_STALE_TTL = int(
+    os.getenv("ZAKEN_REFERENCE_DATA_CACHE_STALE_TTL", 60 * 60 * 24 * 7)
+)
+# Seconds case counts are cached, 0 disables caching
+ZAKEN_CASES_COUNT_CACHE_TTL = int(os.getenv("ZAKEN_CASES_COUNT_CACHE_TTL", 60))
+# Seconds the open cases of a day setting are cached, e.g. for the map tiles
+ZAKEN_CASE_POOL_CACHE_TTL = int(os.getenv("ZAKEN_CASE_POOL_CACHE_TTL", 60 * 5))
+# Maximum number of requests to Zaken that are done at the same time for one request
+ZAKEN_MAX_CONCURRENT_REQUESTS = int(os.getenv("ZAKEN_MAX_CONCURRENT_REQUESTS", 8))
+# Maximum number of case ids in one batch request for case details to Zaken
+ZAKEN_CASES_DATA_CHUNK_SIZE = int(os.getenv("ZAKEN_CASES_DATA_CHUNK_SIZE", 100))
 
 # Allows pushes from Top to Zaken, defaults to True
 PUSH_ZAKEN = os.getenv("PUSH_ZAKEN", "True") == "True"
@@ -302,6 +327,11 @@ is_secure_environment = True if ENVIRONMENT in ["production", "acceptance"] else
 SESSION_COOKIE_SECURE = is_secure_environment
 CSRF_COOKIE_SECURE = is_secure_environment
 DEBUG = not is_secure_environment
+# The browsable API renders responses many times slower, for development only
+if DEBUG:
+    REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"] += (
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    )
 SECURE_HSTS_SECONDS = 60
 SECURE_HSTS_INCLUDE_SUBDOMAINS = is_secure_environment
 SECURE_HSTS_PRELOAD = is_secure_environment
@@ -315,6 +345,15 @@ CITY_CENTRAL_LOCATION_LNG = 4.899431
 CITY_MIN_POSTAL_CODE = 1000
 CITY_MAX_POSTAL_CODE = 1384
 
+# A local OpenStreetMap extract (.osm or .osm.pbf) of the city. When set, the planner
+# uses distances over the street network instead of straight-line distances.
+TRAVEL_TIME_OSM_PATH = os.getenv("TRAVEL_TIME_OSM_PATH")
+# The travel mode of the street network, walking or cycling
+TRAVEL_TIME_MODE = os.getenv("TRAVEL_TIME_MODE", "cycling")
+# The searches over the streets stop at this many meters from the center. Farther
+# cases get an estimate, they end up at the bottom of the lists anyway.
+TRAVEL_TIME_MAX_DISTANCE = int(os.getenv("TRAVEL_TIME_MAX_DISTANCE", 3000))
+
 # Secret key for accessing ZAKEN
 SECRET_KEY_TOP_ZAKEN = os.environ.get("SECRET_KEY_TOP_ZAKEN", None)
 
@@ -332,6 +371,82 @@ def get_redis_url():
 REDIS_URL = get_redis_url()
 HEALTHCHECK_CELERY_PING_TIMEOUT = 5
 
+# Redis is the cache shared by all workers. The tests use a local memory cache.
+TESTING = len(sys.argv) > 1 and sys.argv[1] == "test"
+if os.getenv("REDIS_HOST") and not TESTING:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+            "KEY_PREFIX": "top",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Maximum number of itinerary generations that run at the same time, over all workers
+PLANNER_MAX_CONCURRENT_GENERATIONS = int(
+    os.getenv("PLANNER_MAX_CONCURRENT_GENERATIONS", 2)
+)
+# Number of cores of the node the generations share, divided over their parallel jobs
+PLANNER_CPU_BUDGET = int(os.getenv("PLANNER_CPU_BUDGET", os.cpu_count() or 1))
+# Seconds a generation waits for its turn before it's reported as queued. A waiting
+# generation holds a uWSGI worker, so keep it well below the harakiri of uWSGI
+# (deploy/config.ini) minus the time of a generation. Queued clients retry with
+# their ticket, which keeps their place in the queue.
+PLANNER_QUEUE_TIMEOUT = float(os.getenv("PLANNER_QUEUE_TIMEOUT", 5))
+PLANNER_QUEUE_POLL_INTERVAL = float(os.getenv("PLANNER_QUEUE_POLL_INTERVAL", 0.5))
+# Seconds after which the ticket of a waiting generation that stopped polling, or of
+# a queued generation that wasn't retried, is removed from the queue
+PLANNER_TICKET_STALE_AFTER = int(os.getenv("PLANNER_TICKET_STALE_AFTER", 90))
+# Seconds after which the ticket of a running generation that didn't finish (e.g. a
+# killed worker) is removed. Keep it above the harakiri of uWSGI (deploy/config.ini).
+PLANNER_GENERATION_STALE_AFTER = int(os.getenv("PLANNER_GENERATION_STALE_AFTER", 300))
+# Seconds a generation is expected to take, until the generations are timed
+PLANNER_GENERATION_TIME = float(os.getenv("PLANNER_GENERATION_TIME", 10))
+
+# Without top_cases_count, the knapsack search uses the centers of clusters of the pool
+# and the cases with the highest priority instead of all cases as centers. Their number
+# is PLANNER_CENTERS_FACTOR times the square root of the size of the pool.
+PLANNER_ADAPTIVE_CENTERS = os.getenv("PLANNER_ADAPTIVE_CENTERS", "True") == "True"
+PLANNER_CENTERS_FACTOR = float(os.getenv("PLANNER_CENTERS_FACTOR", 2))
+PLANNER_MIN_CENTERS = int(os.getenv("PLANNER_MIN_CENTERS", 10))
+
+# Seconds the ranked lists of a search are kept for other teams with the same pool
+# and settings, 0 disables caching
+PLAN_RANKINGS_CACHE_TTL = int(os.getenv("PLAN_RANKINGS_CACHE_TTL", 60 * 15))
+# Maximum number of ranked lists that are kept of a search
+PLAN_RANKINGS_MAX_LISTS = int(os.getenv("PLAN_RANKINGS_MAX_LISTS", 50))
+
+# Seconds suggestions for an itinerary are cached, 0 disables caching
+ITINERARY_SUGGESTIONS_CACHE_TTL = int(os.getenv("ITINERARY_SUGGESTIONS_CACHE_TTL", 60))
+# Suggestions for centers within the same geohash tile share a cache entry
+ITINERARY_SUGGESTIONS_GEOHASH_PRECISION = int(
+    os.getenv("ITINERARY_SUGGESTIONS_GEOHASH_PRECISION", 7)
+)
+
+# Map tiles of open cases are divided in a grid of this many cells per side
+CASE_TILE_CLUSTER_GRID_SIZE = int(os.getenv("CASE_TILE_CLUSTER_GRID_SIZE", 8))
+# From this zoom level on, the clusters of map tiles include the case ids
+CASE_TILE_CASE_IDS_MIN_ZOOM = int(os.getenv("CASE_TILE_CASE_IDS_MIN_ZOOM", 16))
+
+# Seconds the synced_at of a sync of itinerary changes lies before the sync. Changes
+# are stamped before their transaction commits, so this is longer than the longest
+# transaction, which is bound by the harakiri of uWSGI (deploy/config.ini)
+ITINERARY_SYNC_OVERLAP = int(os.getenv("ITINERARY_SYNC_OVERLAP", 60))
+
+# Changes to itineraries are published on Redis for the event stream process
+ITINERARY_EVENTS_ENABLED = bool(os.getenv("REDIS_HOST")) and not TESTING
+# Seconds between keep-alive comments on an idle event stream
+ITINERARY_EVENTS_KEEPALIVE = int(os.getenv("ITINERARY_EVENTS_KEEPALIVE", 15))
+# Seconds a token to subscribe to the events of an itinerary is valid. It's sent in the
+# query string, because a native EventSource can't send the Authorization header.
+ITINERARY_EVENTS_TOKEN_MAX_AGE = int(os.getenv("ITINERARY_EVENTS_TOKEN_MAX_AGE", 60))
+
 CELERY_BROKER_URL = get_redis_url()
 BROKER_CONNECTION_MAX_RETRIES = None
 BROKER_CONNECTION_TIMEOUT = 120
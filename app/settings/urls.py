@@ -2,7 +2,7 @@ import os
 
 from apps.addresses import router as addresses_router
 from apps.cases import router as case_router
-from apps.health.views import health_default, is_healthy
+from apps.health.views import cache_stats, health_default, is_healthy
 from apps.itinerary import router as itinerary_router
 from apps.planner import router as planner_router
 from apps.planner.views import dumpdata
@@ -62,6 +62,7 @@ urlpatterns = [
     path("admin/", admin.site.urls),
     # Health check urls
     path("looplijsten/health", health_default, name="health-default"),
+    path("looplijsten/health/cache", cache_stats, name="health-cache"),
     path("health/", include("health_check.urls")),
     path("startup", is_healthy),
     # The API for requesting data
@@ -0,0 +1,10 @@
+from apps.itinerary.events import itinerary_events
+from django.urls import path
+
+urlpatterns = [
+    path(
+        "api/v1/itineraries/<int:pk>/events/",
+        itinerary_events,
+        name="itinerary-events",
+    ),
+]
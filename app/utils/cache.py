@@ -0,0 +1,177 @@
+import logging
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import connections
+from tenacity import RetryError
+
+logger = logging.getLogger(__name__)
+
+# Seconds a background revalidation may take before another one can be started
+REVALIDATE_LOCK_TIMEOUT = 30
+
+CACHE_STATS = ("hits", "stale_hits", "negative_hits", "misses")
+
+read_through_caches = {}
+
+
+class CachedNotFoundError(Exception):
+    """
+    Raised for a key of which the source recently responded with a 404
+    """
+
+
+def is_not_found_error(exception):
+    if isinstance(exception, RetryError):
+        # Requests retried with tenacity raise the last error wrapped in a RetryError
+        exception = exception.last_attempt.exception()
+    response = getattr(exception, "response", None)
+    return getattr(response, "status_code", None) == 404
+
+
+def cache_call(method, *args, default=None, **kwargs):
+    """
+    Calls the given cache method. The shared cache is an optimization,
+    so when it's unavailable we log and continue without it.
+    """
+    try:
+        return method(*args, **kwargs)
+    except Exception as e:
+        logger.warning(f"Cache unavailable: {e}")
+        return default
+
+
+def get_version(name):
+    """
+    Returns the current version of a group of cache entries. Including it in their
+    keys invalidates all of them at once when the version is bumped.
+    """
+    return cache_call(cache.get, f"cache-version:{name}", default=0) or 0
+
+
+def bump_version(name):
+    key = f"cache-version:{name}"
+    try:
+        cache.incr(key)
+    except ValueError:
+        # The version doesn't exist yet
+        cache_call(cache.set, key, 1, timeout=None)
+    except Exception as e:
+        logger.warning(f"Cache unavailable: {e}")
+
+
+class ReadThroughCache:
+    """
+    A read-through cache for responses of external APIs, stored in the shared cache.
+
+    - Fresh entries are returned for `ttl` seconds.
+    - For another `stale_ttl` seconds the stale entry is returned, while a single
+      background thread fetches a new one (stale-while-revalidate).
+    - A 404 from the source is cached for `negative_ttl` seconds.
+    """
+
+    def __init__(self, name, ttl, stale_ttl=0, negative_ttl=0):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+
+        read_through_caches[name] = self
+
+    def get_key(self, key):
+        return f"{self.name}:{key}"
+
+    def get_stats_key(self, stat):
+        return f"cache-stats:{self.name}:{stat}"
+
+    def count(self, stat):
+        stats_key = self.get_stats_key(stat)
+        try:
+            cache.incr(stats_key)
+        except ValueError:
+            # The counter doesn't exist yet
+            cache_call(cache.set, stats_key, 1, timeout=None)
+        except Exception as e:
+            logger.warning(f"Cache unavailable: {e}")
+
+    def get_stats(self):
+        stats = cache_call(
+            cache.get_many,
+            [self.get_stats_key(stat) for stat in CACHE_STATS],
+            default={},
+        )
+        stats = {stat: stats.get(self.get_stats_key(stat), 0) for stat in CACHE_STATS}
+        lookups = sum(stats.values())
+        hits = lookups - stats["misses"]
+        stats["hit_ratio"] = round(hits / lookups, 4) if lookups else None
+        return stats
+
+    def reset_stats(self):
+        cache_call(
+            cache.delete_many, [self.get_stats_key(stat) for stat in CACHE_STATS]
+        )
+
+    def store(self, key, fetch):
+        """
+        Fetches the value from the source and stores it in the cache
+        """
+        try:
+            value = fetch(key)
+        except Exception as e:
+            if self.negative_ttl and is_not_found_error(e):
+                entry = {
+                    "not_found": str(e),
+                    "expires_at": time.time() + self.negative_ttl,
+                }
+                cache_call(cache.set, self.get_key(key), entry, self.negative_ttl)
+            raise
+
+        entry = {"value": value, "expires_at": time.time() + self.ttl}
+        cache_call(cache.set, self.get_key(key), entry, self.ttl + self.stale_ttl)
+        return value
+
+    def revalidate(self, key, fetch):
+        """
+        Fetches a new value in a background thread, if no other worker is doing so
+        """
+        lock_key = f"{self.get_key(key)}:revalidate"
+        if not cache_call(cache.add, lock_key, True, timeout=REVALIDATE_LOCK_TIMEOUT):
+            return
+
+        def revalidate_in_background():
+            try:
+                self.store(key, fetch)
+            except Exception as e:
+                logger.warning(f"Revalidating {self.get_key(key)} failed: {e}")
+            finally:
+                cache_call(cache.delete, lock_key)
+                connections.close_all()
+
+        threading.Thread(target=revalidate_in_background, daemon=True).start()
+
+    def get(self, key, fetch):
+        """
+        Returns the value for the given key, using `fetch(key)` to retrieve it
+        from the source if it's not cached
+        """
+        entry = cache_call(cache.get, self.get_key(key))
+
+        if entry is None:
+            self.count("misses")
+            return self.store(key, fetch)
+
+        if "not_found" in entry:
+            self.count("negative_hits")
+            raise CachedNotFoundError(entry["not_found"])
+
+        if entry["expires_at"] < time.time():
+            self.count("stale_hits")
+            self.revalidate(key, fetch)
+        else:
+            self.count("hits")
+
+        return entry["value"]
+
+    def delete(self, key):
+        cache_call(cache.delete, self.get_key(key))
@@ -0,0 +1,55 @@
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def get_geohash(lat, lng, precision):
+    """
+    Returns the geohash of the tile containing the given location.
+    A precision of 7 gives tiles of about 150 by 150 meters.
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    geohash = []
+    bits = 0
+    bit_count = 0
+    is_lng = True
+
+    while len(geohash) < precision:
+        value, value_range = (lng, lng_range) if is_lng else (lat, lat_range)
+        middle = (value_range[0] + value_range[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            value_range[0] = middle
+        else:
+            value_range[1] = middle
+        is_lng = not is_lng
+
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(geohash)
+
+
+def get_geohash_center(geohash):
+    """
+    Returns the center of the tile of the given geohash as a lat, lng tuple
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    is_lng = True
+
+    for character in geohash:
+        bits = BASE32.index(character)
+        for shift in range(4, -1, -1):
+            value_range = lng_range if is_lng else lat_range
+            middle = (value_range[0] + value_range[1]) / 2
+            if bits >> shift & 1:
+                value_range[0] = middle
+            else:
+                value_range[1] = middle
+            is_lng = not is_lng
+
+    return (lat_range[0] + lat_range[1]) / 2, (lng_range[0] + lng_range[1]) / 2
@@ -0,0 +1,110 @@
+"""
+Decodes the items of an array in a large JSON response one at a time, so the raw
+body and the decoded response don't have to be in memory at once.
+"""
+
+import codecs
+import json
+import re
+
+WHITESPACE = re.compile(r"\s*")
+
+
+class JSONStreamReader:
+    """
+    Decodes JSON values from chunks of text or bytes, reading more chunks as needed
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        # Like json.loads, the decoded values share the strings of repeated keys
+        # instead of every item holding its own copies
+        self.keys = {}
+        self.decoder = json.JSONDecoder(object_pairs_hook=self.share_keys)
+        # Characters of multibyte UTF-8 sequences can be split over chunks
+        self.utf8_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.position = 0
+
+    def share_keys(self, pairs):
+        keys = self.keys
+        return {keys.setdefault(key, key): value for key, value in pairs}
+
+    def read_more(self):
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            return False
+        if isinstance(chunk, bytes):
+            chunk = self.utf8_decoder.decode(chunk)
+        start = self.position
+        self.buffer = self.buffer[start:] + chunk
+        self.position = 0
+        return True
+
+    def peek(self):
+        """
+        Returns the next character that's not whitespace, or "" at the end
+        """
+        while True:
+            self.position = WHITESPACE.match(self.buffer, self.position).end()
+            if self.position < len(self.buffer) or not self.read_more():
+                start = self.position
+                end = start + 1
+                return self.buffer[start:end]
+
+    def expect(self, characters):
+        character = self.peek()
+        if not character or character not in characters:
+            raise ValueError(
+                f"Expected one of {characters!r} at position {self.position}, "
+                f"found {character!r}"
+            )
+        self.position += 1
+        return character
+
+    def decode(self):
+        """
+        Decodes the next value
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if not self.read_more():
+                    raise
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and self.read_more():
+                continue
+            self.position = end
+            return value
+
+
+def iter_json_items(chunks, key):
+    """
+    Yields the items of the array of `key` in the JSON object in the chunks.
+    The other values of the object are skipped.
+    """
+    reader = JSONStreamReader(chunks)
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+
+    while True:
+        name = reader.decode()
+        reader.expect(":")
+        if name == key and reader.peek() == "[":
+            reader.expect("[")
+            if reader.peek() == "]":
+                reader.expect("]")
+            else:
+                while True:
+                    yield reader.decode()
+                    if reader.expect(",]") == "]":
+                        break
+        else:
+            reader.decode()
+
+        if reader.expect(",}") == "}":
+            return
@@ -2,9 +2,17 @@ import logging
 
 import requests
 from django.conf import settings
+from utils.cache import ReadThroughCache
 
 logger = logging.getLogger(__name__)
 
+bag_data_cache = ReadThroughCache(
+    "bag-data",
+    ttl=settings.BAG_DATA_CACHE_TTL,
+    stale_ttl=settings.BAG_DATA_CACHE_STALE_TTL,
+    negative_ttl=settings.ADDRESS_DATA_CACHE_NEGATIVE_TTL,
+)
+
 
 def fetch_bag_data_by_nummeraanduiding_id(nummeraanduiding_id):
     """
@@ -22,11 +30,14 @@ def fetch_bag_data_by_nummeraanduiding_id(nummeraanduiding_id):
 
 def get_bag_data_by_nummeraanduiding_id(nummeraanduiding_id):
     """
-    Retrieve BAG BENKAGG data for a given nummeraanduiding_id.
+    Retrieve BAG BENKAGG data for a given nummeraanduiding_id, using the cache if possible.
     Logs and returns error details in case of failure.
     """
     try:
-        bag_data = fetch_bag_data_by_nummeraanduiding_id(nummeraanduiding_id)
+        bag_data = bag_data_cache.get(
+            nummeraanduiding_id,
+            lambda key: fetch_bag_data_by_nummeraanduiding_id(key),
+        )
         return bag_data
     except Exception as error:
         logger.error(f"Failed to fetch BAG data: {error}")
@@ -1,14 +1,27 @@
 # TODO: Write tests for these functions
 import logging
+import threading
 from datetime import datetime, timedelta
 
 import requests
 from constance.models import Constance
 from django.conf import settings
+from django.db import connection, transaction
 from tenacity import after_log, retry, stop_after_attempt
+from utils.cache import ReadThroughCache
 
 logger = logging.getLogger(__name__)
 
+brk_data_cache = ReadThroughCache(
+    "brk-data",
+    ttl=settings.BRK_DATA_CACHE_TTL,
+    stale_ttl=settings.BRK_DATA_CACHE_STALE_TTL,
+    negative_ttl=settings.ADDRESS_DATA_CACHE_NEGATIVE_TTL,
+)
+
+# Key for the Postgres advisory lock that makes sure only one worker requests a new token
+BRK_TOKEN_ADVISORY_LOCK_ID = 7_305_001
+
 
 def get_token():
     key = settings.CONSTANCE_BRK_AUTHENTICATION_TOKEN_KEY
@@ -63,20 +76,105 @@ def request_new_token():
     expiry = datetime.now() + timedelta(seconds=expires_in)
     set_expiry(expiry)
 
+    return access_token, expiry
 
-def get_brk_request_headers():
+
+class BRKTokenManager:
     """
-    Returns BRK request header for authenticated requests, with a valid bearer token
+    Keeps the BRK bearer token and its expiry in memory for this process.
+
+    The token is refreshed ahead of its expiry. A Postgres advisory lock makes sure
+    only one worker requests a new token, the others pick it up from the database.
+    While a refresh is in progress the current token is used as long as it is valid.
     """
-    expiry = get_expiry()
 
-    if expiry and type(expiry) is str:
-        expiry = datetime.fromisoformat(expiry)
+    def __init__(self, refresh_margin):
+        self.refresh_margin = refresh_margin
+        self._token = None
+        self._expiry = None
+        self._rejected_token = None
+        self._lock = threading.Lock()
+
+    def _is_valid(self, now):
+        return bool(self._token) and self._expiry is not None and now < self._expiry
+
+    def _is_fresh(self, now):
+        return self._is_valid(now + self.refresh_margin)
+
+    def _load_from_database(self):
+        expiry = get_expiry()
+
+        if expiry and type(expiry) is str:
+            expiry = datetime.fromisoformat(expiry)
+
+        self._token = get_token()
+        self._expiry = expiry
+
+        if self._token == self._rejected_token:
+            self._expiry = None
+
+    def _refresh(self, blocking):
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                if blocking:
+                    cursor.execute(
+                        "SELECT pg_advisory_xact_lock(%s)", [BRK_TOKEN_ADVISORY_LOCK_ID]
+                    )
+                else:
+                    cursor.execute(
+                        "SELECT pg_try_advisory_xact_lock(%s)",
+                        [BRK_TOKEN_ADVISORY_LOCK_ID],
+                    )
+                    if not cursor.fetchone()[0]:
+                        # Another worker is refreshing, keep using the current token
+                        return
+
+            # Another worker might have refreshed the token while we were waiting
+            self._load_from_database()
+            if self._is_fresh(datetime.now()):
+                return
+
+            self._token, self._expiry = request_new_token()
+
+    def get_token(self):
+        if self._is_fresh(datetime.now()):
+            return self._token
+
+        blocking = not self._is_valid(datetime.now())
+        if not self._lock.acquire(blocking=blocking):
+            # Another thread is refreshing, keep using the current token
+            return self._token
+
+        try:
+            if not self._is_fresh(datetime.now()):
+                self._load_from_database()
+            if not self._is_fresh(datetime.now()):
+                self._refresh(blocking=not self._is_valid(datetime.now()))
+        finally:
+            self._lock.release()
+
+        return self._token
+
+    def invalidate(self):
+        """
+        Marks the current token as rejected, so the next request refreshes it
+        """
+        with self._lock:
+            self._rejected_token = self._token
+            self._token = None
+            self._expiry = None
+
+
+brk_token_manager = BRKTokenManager(
+    refresh_margin=timedelta(seconds=settings.BRK_ACCESS_TOKEN_REFRESH_MARGIN)
+)
 
-    if not expiry or expiry < datetime.now():
-        request_new_token()
 
-    token = get_token()
+def get_brk_request_headers():
+    """
+    Returns BRK request header for authenticated requests, with a valid bearer token
+    """
+    token = brk_token_manager.get_token()
 
     if token is None or token == "":
         raise Exception("No authorization bearer token for BRK request")
@@ -102,6 +200,9 @@ def request_brk_data(bag_id):
         )
     except Exception as e:
         logger.error("ERR: ", e)
+    if brk_data_request.status_code == 401:
+        # The token was revoked or expired early, make sure the retry uses a new one
+        brk_token_manager.invalidate()
     brk_data_request.raise_for_status()
     brk_data = brk_data_request.json()
     return brk_data
@@ -109,14 +210,15 @@ def request_brk_data(bag_id):
 
 def get_brk_data(bag_id):
     """
-    Does an authenticated request to BRK, and returns the owners of a given bag_id location
+    Does an authenticated request to BRK, and returns the owners of a given bag_id location.
+    Responses are cached per bag_id.
     """
     try:
         # Input validation
         if not bag_id:
             raise ValueError("No BAG ID given for BRK request")
 
-        brk_data = request_brk_data(bag_id)
+        brk_data = brk_data_cache.get(bag_id, lambda key: request_brk_data(key))
         return brk_data
     except Exception as e:
         logger.error("Requesting BRK data failed: {}".format(str(e)))
@@ -1,12 +1,65 @@
 # TODO: Tests for this
+import hashlib
+import json
 import logging
-from typing import Dict, Iterable, List
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List
 
 import requests
+from cachetools import TTLCache
 from django.conf import settings
+from requests.adapters import HTTPAdapter
+from utils.cache import ReadThroughCache
+from utils.json_stream import iter_json_items
 
 logger = logging.getLogger(__name__)
 
+# Lookup data of a Zaken theme, like /themes/<id>/reasons/
+THEME_REFERENCE_DATA_RESOURCES = (
+    "reasons",
+    "schedule-types",
+    "case-projects",
+    "subjects",
+    "tags",
+)
+ADDRESS_REFERENCE_DATA_PATHS = (
+    "addresses/districts/",
+    "addresses/housing-corporations/",
+)
+# Case lists are decoded while they're downloaded, in chunks of this size
+CASE_LIST_CHUNK_SIZE = 64 * 1024
+
+reference_data_cache = ReadThroughCache(
+    "zaken-reference-data",
+    ttl=settings.ZAKEN_REFERENCE_DATA_CACHE_TTL,
+    stale_ttl=settings.ZAKEN_REFERENCE_DATA_CACHE_STALE_TTL,
+)
+
+cases_count_cache = ReadThroughCache(
+    "zaken-cases-count",
+    ttl=settings.ZAKEN_CASES_COUNT_CACHE_TTL,
+)
+
+case_pool_cache = ReadThroughCache(
+    "zaken-case-pool",
+    ttl=settings.ZAKEN_CASE_POOL_CACHE_TTL,
+)
+
+# The case pools are large, so each worker also keeps the recently used ones
+local_case_pools = TTLCache(maxsize=32, ttl=settings.ZAKEN_CASE_POOL_CACHE_TTL)
+local_case_pools_lock = threading.Lock()
+
+# Shared by the threads of a worker, so the connections to Zaken are reused
+zaken_session = requests.Session()
+zaken_session.mount(
+    "https://", HTTPAdapter(pool_maxsize=settings.ZAKEN_MAX_CONCURRENT_REQUESTS)
+)
+zaken_session.mount(
+    "http://", HTTPAdapter(pool_maxsize=settings.ZAKEN_MAX_CONCURRENT_REQUESTS)
+)
+
 
 def get_headers(auth_header=None):
     token = settings.SECRET_KEY_TOP_ZAKEN
@@ -29,32 +82,191 @@ def assert_allow_push():
     assert settings.PUSH_ZAKEN, "Pushes disabled"
 
 
-def fetch_cases_data(
-    ids: Iterable[str],
-    auth_header=None,
-    timeout: int = 60,
-) -> Dict[str, dict]:
+def get_theme_reference_data_path(theme_id, resource):
+    return f"themes/{theme_id}/{resource}/"
+
+
+def get_reference_data_paths(theme_ids):
     """
-    Batch fetch case details from Zaken and return a dict keyed by stringified id.
+    Returns the paths of all cached reference data for the given themes
+    """
+    return list(ADDRESS_REFERENCE_DATA_PATHS) + [
+        get_theme_reference_data_path(theme_id, resource)
+        for theme_id in theme_ids
+        for resource in THEME_REFERENCE_DATA_RESOURCES
+    ]
 
-    - Uses /cases/data/?ids=... in a single request.
-    - Accepts ids as strings or ints; keys in the result are strings.
-    - Injects a 404 case for each id that is not found.
+
+def fetch_reference_data(path, auth_header=None):
+    url = f"{settings.ZAKEN_API_URL}/{path}"
+
+    response = requests.get(
+        url,
+        timeout=5,
+        headers=get_headers(auth_header),
+    )
+    response.raise_for_status()
+
+    return response.json()
+
+
+def get_reference_data(path, auth_header=None):
+    """
+    Returns lookup data from Zaken, which rarely changes, using the cache if possible
     """
-    unique_ids: List[str] = list({str(i) for i in ids if i is not None})
-    if not unique_ids:
-        return {}
+    return reference_data_cache.get(
+        path, lambda key: fetch_reference_data(key, auth_header)
+    )
 
-    base_url = f"{settings.ZAKEN_API_URL}/cases/data/"
-    headers = get_headers(auth_header)
 
-    params = {
-        "ids": ",".join(unique_ids),
-        "page_size": len(unique_ids),
+def refresh_reference_data(path, auth_header=None):
+    """
+    Fetches lookup data from Zaken and stores it in the cache
+    """
+    return reference_data_cache.store(
+        path, lambda key: fetch_reference_data(key, auth_header)
+    )
+
+
+def invalidate_reference_data(paths):
+    for path in paths:
+        reference_data_cache.delete(path)
+
+
+def get_query_params_key(query_params):
+    return json.dumps(query_params, sort_keys=True, default=str)
+
+
+def fetch_cases_count(query_params, auth_header=None):
+    url = f"{settings.ZAKEN_API_URL}/cases/count/"
+    response = requests.get(
+        url,
+        timeout=10,
+        params=query_params,
+        headers=get_headers(auth_header),
+    )
+    response.raise_for_status()
+
+    return response.json()
+
+
+def read_case_list(response, fields=None):
+    """
+    Returns the results of a streamed case list response, decoded one case at a time
+    and keeping only the given fields of each case, so the raw body, the complete
+    decoded response and the unused fields are never in memory at the same time
+    """
+    try:
+        return [
+            {field: case[field] for field in fields if field in case}
+            if fields
+            else case
+            for case in iter_json_items(
+                response.iter_content(chunk_size=CASE_LIST_CHUNK_SIZE), "results"
+            )
+        ]
+    finally:
+        response.close()
+
+
+def fetch_cases(query_params, auth_header=None, fields=None):
+    url = f"{settings.ZAKEN_API_URL}/cases/"
+    response = requests.get(
+        url,
+        timeout=60,
+        params=query_params,
+        headers=get_headers(auth_header),
+        stream=True,
+    )
+    response.raise_for_status()
+
+    return read_case_list(response, fields)
+
+
+def get_case_pool(query_params, auth_header=None, fetch=fetch_cases):
+    """
+    Returns the open cases for the query params as {"version": ..., "cases": [...]}.
+
+    - The pool is cached for ZAKEN_CASE_POOL_CACHE_TTL seconds, in the shared cache
+      and in the memory of the worker.
+    - The version changes every time the pool is fetched, so data derived from
+      a pool can be cached per version.
+    """
+    key = hashlib.sha1(get_query_params_key(query_params).encode()).hexdigest()
+
+    with local_case_pools_lock:
+        pool = local_case_pools.get(key)
+    if pool is not None:
+        return pool
+
+    pool = case_pool_cache.get(
+        key,
+        lambda _: {
+            "version": uuid.uuid4().hex,
+            "cases": fetch(query_params, auth_header),
+        },
+    )
+    with local_case_pools_lock:
+        local_case_pools[key] = pool
+    return pool
+
+
+def fetch_cases_counts(
+    query_params_list: List[dict],
+    auth_header=None,
+) -> List[dict]:
+    """
+    Fetch the case counts for a list of query params concurrently.
+
+    - Identical query params are only fetched once.
+    - Counts are cached for ZAKEN_CASES_COUNT_CACHE_TTL seconds, if set.
+    - Returns the counts in the order of the given query params.
+    """
+    unique_query_params = {
+        get_query_params_key(query_params): query_params
+        for query_params in query_params_list
     }
-    resp = requests.get(base_url, params=params, headers=headers, timeout=timeout)
-    resp.raise_for_status()
-    payload = resp.json()
+    if not unique_query_params:
+        return []
+
+    def fetch(key):
+        query_params = unique_query_params[key]
+        if not settings.ZAKEN_CASES_COUNT_CACHE_TTL:
+            return fetch_cases_count(query_params, auth_header)
+
+        cache_key = hashlib.sha1(key.encode()).hexdigest()
+        return cases_count_cache.get(
+            cache_key, lambda _: fetch_cases_count(query_params, auth_header)
+        )
+
+    max_workers = min(len(unique_query_params), settings.ZAKEN_MAX_CONCURRENT_REQUESTS)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        counts = dict(
+            zip(unique_query_params, executor.map(fetch, unique_query_params))
+        )
+
+    return [
+        counts[get_query_params_key(query_params)] for query_params in query_params_list
+    ]
+
+
+def fetch_cases_data_chunk(
+    case_ids: List[str],
+    auth_header=None,
+    timeout: int = 60,
+) -> Dict[str, dict]:
+    """
+    Fetch the case details of the given ids from Zaken in a single request.
+    Injects a 404 case for each id that is not found.
+    """
+    response = zaken_session.get(
+        f"{settings.ZAKEN_API_URL}/cases/data/",
+        params={"ids": ",".join(case_ids), "page_size": len(case_ids)},
+        headers=get_headers(auth_header),
+        timeout=timeout,
+    )
+    response.raise_for_status()
+    payload = response.json()
     items = payload.get("results", payload)
 
     result: Dict[str, dict] = {}
@@ -65,10 +277,70 @@ def fetch_cases_data(
     # Inject a 404 case for each id that is not found.
     from apps.cases.models import CASE_404
 
-    for case_id in unique_ids:
+    for case_id in case_ids:
         if case_id not in result:
             deleted_case = CASE_404.copy()
             deleted_case["id"] = int(case_id)
             result[case_id] = deleted_case
 
     return result
+
+
+def iter_cases_data(
+    ids: Iterable[str],
+    auth_header=None,
+    timeout: int = 60,
+    chunk_size: int = None,
+) -> Iterator[Dict[str, dict]]:
+    """
+    Batch fetch case details from Zaken and yield them per chunk, keyed by stringified id.
+
+    - The ids are split in chunks of ZAKEN_CASES_DATA_CHUNK_SIZE, which are fetched
+      concurrently over the pooled Zaken session.
+    - Each chunk is yielded as soon as it's fetched, so callers can use partial results.
+    - Accepts ids as strings or ints; keys in the result are strings.
+    """
+    unique_ids: List[str] = list(dict.fromkeys(str(i) for i in ids if i is not None))
+    chunk_size = chunk_size or settings.ZAKEN_CASES_DATA_CHUNK_SIZE
+    chunks = []
+    for start in range(0, len(unique_ids), chunk_size):
+        end = start + chunk_size
+        chunks.append(unique_ids[start:end])
+
+    if not chunks:
+        return
+    if len(chunks) == 1:
+        yield fetch_cases_data_chunk(chunks[0], auth_header, timeout)
+        return
+
+    max_workers = min(len(chunks), settings.ZAKEN_MAX_CONCURRENT_REQUESTS)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(fetch_cases_data_chunk, chunk, auth_header, timeout)
+            for chunk in chunks
+        ]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # Don't fetch the remaining chunks if the caller stopped early or one failed
+            for future in futures:
+                future.cancel()
+
+
+def fetch_cases_data(
+    ids: Iterable[str],
+    auth_header=None,
+    timeout: int = 60,
+) -> Dict[str, dict]:
+    """
+    Batch fetch case details from Zaken and return a dict keyed by stringified id.
+
+    - Uses /cases/data/?ids=... in concurrent requests, see iter_cases_data.
+    - Injects a 404 case for each id that is not found.
+    """
+    result: Dict[str, dict] = {}
+    for chunk_result in iter_cases_data(ids, auth_header, timeout):
+        result.update(chunk_result)
+
+    return result
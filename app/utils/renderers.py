@@ -0,0 +1,89 @@
+"""
+Renders JSON responses with orjson, which encodes large responses like the case search
+many times faster than the json module.
+
+orjson serializes the JSON types, UUIDs, dataclasses and enums itself. The other types
+the views return are converted by get_default, formatted like before by the encoder of
+the response: the JSONEncoder of DRF or the DjangoJSONEncoder of Django.
+"""
+
+import datetime
+import decimal
+
+import orjson
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import QuerySet
+from django.http import HttpResponse
+from django.utils.functional import Promise
+from rest_framework.renderers import JSONRenderer
+
+# Datetimes are passed to the default, so they're formatted by the encoder
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+# Formatted by the encoder: dates and times in ISO 8601, and Decimals as numbers (DRF)
+# or strings (Django)
+ENCODER_TYPES = (datetime.date, datetime.time, datetime.timedelta, decimal.Decimal)
+
+
+def get_default(encoder):
+    """
+    Returns the default function of orjson, which returns a serializable value for
+    the types that orjson doesn't serialize itself
+    """
+
+    def default(obj):
+        if isinstance(obj, ENCODER_TYPES):
+            return encoder.default(obj)
+        if isinstance(obj, Promise):
+            # Lazy translations
+            return str(obj)
+        if isinstance(obj, (QuerySet, set, frozenset)):
+            return list(obj)
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+    return default
+
+
+def dumps(data, default):
+    """
+    Returns the data as compact UTF-8 JSON
+    """
+    content = orjson.dumps(data, default=default, option=ORJSON_OPTIONS)
+
+    # Like the JSONRenderer of DRF, escapes the line separators that end strings
+    # in JavaScript
+    if b"\xe2\x80\xa8" in content or b"\xe2\x80\xa9" in content:
+        content = content.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+            b"\xe2\x80\xa9", b"\\u2029"
+        )
+    return content
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    A JSONRenderer that encodes with orjson, unless indentation is requested
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return dumps(data, get_default(self.encoder_class()))
+
+
+class JsonResponse(HttpResponse):
+    """
+    The JsonResponse of Django, encoding with orjson
+    """
+
+    def __init__(self, data, encoder=DjangoJSONEncoder, safe=True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError(
+                "In order to allow non-dict objects to be serialized set the "
+                "safe parameter to False."
+            )
+        kwargs.setdefault("content_type", "application/json")
+        super().__init__(content=dumps(data, get_default(encoder())), **kwargs)
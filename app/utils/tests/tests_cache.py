@@ -0,0 +1,107 @@
+"""
+Tests for the read-through cache
+"""
+
+from unittest.mock import Mock, patch
+
+import requests
+from django.core.cache import cache
+from django.test import TestCase
+from freezegun import freeze_time
+from utils.cache import CachedNotFoundError, ReadThroughCache, bump_version, get_version
+
+
+def get_not_found_error():
+    response = Mock()
+    response.status_code = 404
+    return requests.HTTPError("404 Not Found", response=response)
+
+
+class ReadThroughCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.read_through_cache = ReadThroughCache(
+            "foo", ttl=60, stale_ttl=600, negative_ttl=30
+        )
+
+    def test_miss_and_hit(self):
+        """
+        The source is only requested once for the same key
+        """
+        fetch = Mock(return_value={"data": "some_data"})
+
+        self.assertEqual(
+            self.read_through_cache.get("FOO_ID", fetch), fetch.return_value
+        )
+        self.assertEqual(
+            self.read_through_cache.get("FOO_ID", fetch), fetch.return_value
+        )
+
+        fetch.assert_called_once_with("FOO_ID")
+
+    def test_negative_caching(self):
+        """
+        A 404 from the source is cached, other errors are not
+        """
+        fetch = Mock(side_effect=get_not_found_error())
+
+        with self.assertRaises(requests.HTTPError):
+            self.read_through_cache.get("FOO_ID", fetch)
+        with self.assertRaises(CachedNotFoundError):
+            self.read_through_cache.get("FOO_ID", fetch)
+        fetch.assert_called_once()
+
+        fetch = Mock(side_effect=Exception("API error"))
+        with self.assertRaises(Exception):
+            self.read_through_cache.get("FOO_OTHER_ID", fetch)
+        with self.assertRaises(Exception):
+            self.read_through_cache.get("FOO_OTHER_ID", fetch)
+        self.assertEqual(fetch.call_count, 2)
+
+    @patch("utils.cache.threading.Thread")
+    def test_stale_while_revalidate(self, mock_thread):
+        """
+        A stale entry is returned while a new value is fetched in the background
+        """
+        mock_thread.side_effect = lambda target, daemon: Mock(start=target)
+
+        with freeze_time("2020-01-01 12:00:00"):
+            self.read_through_cache.get("FOO_ID", Mock(return_value="FOO_OLD"))
+
+        fetch = Mock(return_value="FOO_NEW")
+        with freeze_time("2020-01-01 12:05:00"):
+            self.assertEqual(self.read_through_cache.get("FOO_ID", fetch), "FOO_OLD")
+            fetch.assert_called_once_with("FOO_ID")
+            self.assertEqual(self.read_through_cache.get("FOO_ID", fetch), "FOO_NEW")
+
+    def test_stats(self):
+        """
+        The hit ratio is based on the number of lookups
+        """
+        self.assertIsNone(self.read_through_cache.get_stats()["hit_ratio"])
+
+        fetch = Mock(return_value="FOO")
+        for i in range(4):
+            self.read_through_cache.get("FOO_ID", fetch)
+
+        stats = self.read_through_cache.get_stats()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hits"], 3)
+        self.assertEqual(stats["hit_ratio"], 0.75)
+
+
+class CacheVersionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_version(self):
+        """
+        Versions start at 0 and are bumped independently
+        """
+        self.assertEqual(get_version("foo"), 0)
+
+        bump_version("foo")
+        bump_version("foo")
+
+        self.assertEqual(get_version("foo"), 2)
+        self.assertEqual(get_version("bar"), 0)
@@ -0,0 +1,27 @@
+"""
+Tests for geohash helpers
+"""
+
+from django.test import TestCase
+from utils.geohash import get_geohash, get_geohash_center
+
+
+class GeohashTest(TestCase):
+    def test_get_geohash(self):
+        """
+        Returns the geohash of a known location
+        """
+        self.assertEqual(get_geohash(57.64911, 10.40744, 11), "u4pruydqqvj")
+        self.assertEqual(get_geohash(57.64911, 10.40744, 5), "u4pru")
+
+    def test_get_geohash_center(self):
+        """
+        Nearby locations share a tile, of which the center is within the tile
+        """
+        geohash = get_geohash(52.37310, 4.89260, 7)
+        self.assertEqual(get_geohash(52.37312, 4.89262, 7), geohash)
+
+        lat, lng = get_geohash_center(geohash)
+        self.assertAlmostEqual(lat, 52.3731, places=2)
+        self.assertAlmostEqual(lng, 4.8926, places=2)
+        self.assertEqual(get_geohash(lat, lng, 7), geohash)
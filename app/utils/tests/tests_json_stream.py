@@ -0,0 +1,126 @@
+"""
+Tests for the streaming JSON decoder
+"""
+
+import json
+import tracemalloc
+from unittest.mock import Mock
+
+from apps.cases.mock import get_zaken_case_list
+from apps.planner.const import PLANNER_CASE_FIELDS
+from django.test import SimpleTestCase
+from utils.json_stream import iter_json_items
+from utils.queries_zaken_api import read_case_list
+
+
+def split(data, size):
+    chunks = []
+    for start in range(0, len(data), size):
+        end = start + size
+        chunks.append(data[start:end])
+    return chunks
+
+
+def iter_case_list_chunks(count, chunk_size=64 * 1024):
+    """
+    Yields a case list of Zaken in chunks as they arrive, without the complete
+    body in memory
+    """
+    cases = get_zaken_case_list()
+    buffer = b'{"count": %d, "next": null, "results": [' % count
+    for index in range(count):
+        case = {**cases[index % len(cases)], "id": index}
+        buffer += (b", " if index else b"") + json.dumps(case).encode()
+        if len(buffer) >= chunk_size:
+            yield buffer
+            buffer = b""
+    yield buffer + b"]}"
+
+
+def get_peak_memory(function):
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+class IterJSONItemsTest(SimpleTestCase):
+    def test_items_split_over_chunks(self):
+        """
+        Items are decoded when strings, numbers and characters are split over chunks
+        """
+        data = {
+            "count": 3,
+            "results": [
+                {"id": 12345, "name": "Burgemeester Röellstraat 12"},
+                {"id": 6.5e-3, "tags": [], "nested": {"a": [1, {"b": None}]}},
+                '€ ☃ \\ "',
+            ],
+            "next": None,
+        }
+        body = json.dumps(data, ensure_ascii=False, indent=2).encode()
+
+        for size in (1, 2, 3, 7, len(body)):
+            with self.subTest(size=size):
+                items = list(iter_json_items(split(body, size), "results"))
+                self.assertEqual(items, data["results"])
+
+    def test_other_keys_are_skipped(self):
+        """
+        Only the items of the key are yielded, wherever it is in the object
+        """
+        body = '{"results": [1, 2], "other": [3]}'
+        self.assertEqual(list(iter_json_items([body], "results")), [1, 2])
+        self.assertEqual(list(iter_json_items([body], "other")), [3])
+        self.assertEqual(list(iter_json_items([body], "missing")), [])
+        self.assertEqual(list(iter_json_items(['{"results": []}'], "results")), [])
+        self.assertEqual(list(iter_json_items(["{ }"], "results")), [])
+
+    def test_invalid_json(self):
+        """
+        Invalid and truncated JSON raises a ValueError
+        """
+        for body in ('["results"]', '{"results": [1, 2', '{"results": [1 2]}'):
+            with self.subTest(body=body):
+                with self.assertRaises(ValueError):
+                    list(iter_json_items(split(body, 4), "results"))
+
+
+class ReadCaseListTest(SimpleTestCase):
+    def test_fields_are_projected(self):
+        """
+        Only the given fields of the cases are kept, and the response is closed
+        """
+        response = Mock()
+        response.iter_content.return_value = iter_case_list_chunks(3, chunk_size=100)
+
+        cases = read_case_list(response, ("id", "address", "missing"))
+
+        self.assertEqual([case["id"] for case in cases], [0, 1, 2])
+        self.assertEqual(set(cases[0]), {"id", "address"})
+        response.close.assert_called_once()
+
+    def test_peak_memory(self):
+        """
+        Decoding a list of 1000 cases while it arrives and keeping only the planner
+        fields takes less than half of the peak memory of decoding the whole body
+        """
+
+        def read_whole_body():
+            body = b"".join(iter_case_list_chunks(1000))
+            return [
+                {field: case[field] for field in PLANNER_CASE_FIELDS if field in case}
+                for case in json.loads(body).get("results")
+            ]
+
+        def read_streamed():
+            response = Mock()
+            response.iter_content.return_value = iter_case_list_chunks(1000)
+            return read_case_list(response, PLANNER_CASE_FIELDS)
+
+        self.assertEqual(read_streamed(), read_whole_body())
+        whole_body_peak = get_peak_memory(read_whole_body)
+        streamed_peak = get_peak_memory(read_streamed)
+        self.assertLess(streamed_peak, whole_body_peak / 2)
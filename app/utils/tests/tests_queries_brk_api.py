@@ -0,0 +1,94 @@
+"""
+Tests for BRK queries
+"""
+
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from django.test import TestCase
+from utils.queries_brk_api import BRKTokenManager, get_token, set_expiry, set_token
+
+
+class BRKTokenManagerTest(TestCase):
+    def get_token_manager(self):
+        return BRKTokenManager(refresh_margin=timedelta(seconds=60))
+
+    @patch("utils.queries_brk_api.request_new_token")
+    def test_get_token_from_database(self, mock_request_new_token):
+        """
+        Uses a valid token from the database without requesting a new one
+        """
+        set_token("FOO_TOKEN")
+        set_expiry(datetime.now() + timedelta(hours=1))
+
+        token_manager = self.get_token_manager()
+
+        self.assertEqual(token_manager.get_token(), "FOO_TOKEN")
+        mock_request_new_token.assert_not_called()
+
+    @patch("utils.queries_brk_api.request_new_token")
+    def test_get_token_from_memory(self, mock_request_new_token):
+        """
+        Once loaded, the token is served from memory without database queries
+        """
+        set_token("FOO_TOKEN")
+        set_expiry(datetime.now() + timedelta(hours=1))
+
+        token_manager = self.get_token_manager()
+        token_manager.get_token()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(token_manager.get_token(), "FOO_TOKEN")
+
+    @patch("utils.queries_brk_api.request_new_token")
+    def test_refresh_ahead_of_expiry(self, mock_request_new_token):
+        """
+        A token that expires within the refresh margin is refreshed
+        """
+        set_token("FOO_TOKEN")
+        set_expiry(datetime.now() + timedelta(seconds=30))
+        mock_request_new_token.return_value = (
+            "FOO_NEW_TOKEN",
+            datetime.now() + timedelta(hours=1),
+        )
+
+        token_manager = self.get_token_manager()
+
+        self.assertEqual(token_manager.get_token(), "FOO_NEW_TOKEN")
+        mock_request_new_token.assert_called_once()
+
+        token_manager.get_token()
+        mock_request_new_token.assert_called_once()
+
+    @patch("utils.queries_brk_api.requests.post")
+    def test_refresh_stores_token_in_database(self, mock_requests_post):
+        """
+        A refreshed token is stored in the database for the other workers
+        """
+        mock_requests_post.return_value.json.return_value = {
+            "access_token": "FOO_NEW_TOKEN",
+            "expires_in": 3600,
+        }
+
+        token_manager = self.get_token_manager()
+
+        self.assertEqual(token_manager.get_token(), "FOO_NEW_TOKEN")
+        self.assertEqual(get_token(), "FOO_NEW_TOKEN")
+
+    @patch("utils.queries_brk_api.request_new_token")
+    def test_invalidate(self, mock_request_new_token):
+        """
+        A rejected token is not reused, even if the database still holds it
+        """
+        set_token("FOO_TOKEN")
+        set_expiry(datetime.now() + timedelta(hours=1))
+        mock_request_new_token.return_value = (
+            "FOO_NEW_TOKEN",
+            datetime.now() + timedelta(hours=1),
+        )
+
+        token_manager = self.get_token_manager()
+        token_manager.get_token()
+        token_manager.invalidate()
+
+        self.assertEqual(token_manager.get_token(), "FOO_NEW_TOKEN")
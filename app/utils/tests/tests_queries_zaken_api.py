@@ -0,0 +1,69 @@
+"""
+Tests for Zaken queries
+"""
+
+from unittest.mock import Mock, patch
+
+from django.test import TestCase, override_settings
+from utils.queries_zaken_api import fetch_cases_data, iter_cases_data
+
+
+def get_cases_data_response(url, params, **kwargs):
+    # Zaken doesn't return the case with id 3
+    response = Mock()
+    response.json.return_value = {
+        "results": [
+            {"id": int(case_id), "address": {"bag_id": f"FOO_BAG_ID_{case_id}"}}
+            for case_id in params["ids"].split(",")
+            if case_id != "3"
+        ]
+    }
+    return response
+
+
+@override_settings(ZAKEN_CASES_DATA_CHUNK_SIZE=2)
+@patch("utils.queries_zaken_api.zaken_session.get")
+class FetchCasesDataTest(TestCase):
+    def test_fetch_cases_data_in_chunks(self, mock_session_get):
+        """
+        The ids are fetched in chunks and merged, with a 404 case for missing ids
+        """
+        mock_session_get.side_effect = get_cases_data_response
+
+        result = fetch_cases_data([1, "2", 3, 4, 5, 1, None])
+
+        self.assertEqual(mock_session_get.call_count, 3)
+        requested_ids = sorted(
+            call.kwargs["params"]["ids"] for call in mock_session_get.call_args_list
+        )
+        self.assertEqual(requested_ids, ["1,2", "3,4", "5"])
+        self.assertEqual(sorted(result), ["1", "2", "3", "4", "5"])
+        self.assertEqual(result["1"]["address"]["bag_id"], "FOO_BAG_ID_1")
+        self.assertEqual(result["3"]["id"], 3)
+        self.assertTrue(result["3"]["deleted"])
+
+    def test_iter_cases_data_yields_chunks(self, mock_session_get):
+        """
+        Each chunk is yielded separately, so partial results can be used
+        """
+        mock_session_get.side_effect = get_cases_data_response
+
+        chunks = list(iter_cases_data(["1", "2", "4"]))
+
+        self.assertEqual(sorted(len(chunk) for chunk in chunks), [1, 2])
+
+    def test_fetch_cases_data_without_ids(self, mock_session_get):
+        """
+        No request is done without ids
+        """
+        self.assertEqual(fetch_cases_data([]), {})
+        mock_session_get.assert_not_called()
+
+    def test_fetch_cases_data_failure(self, mock_session_get):
+        """
+        A failing chunk fails the whole batch
+        """
+        mock_session_get.side_effect = Exception("API error")
+
+        with self.assertRaises(Exception):
+            fetch_cases_data(["1", "2", "4"])
@@ -0,0 +1,359 @@
+"""
+Query budgets of the v1 endpoints
+
+Every GET endpoint is requested with fixtures at several scales, with the external
+APIs stubbed. The SQL queries and outbound HTTP requests are counted, and the test
+fails if a count grows with the number of rows or exceeds the endpoint's budget.
+"""
+
+from datetime import date, datetime
+from unittest.mock import patch
+
+import requests
+from apps.cases.models import Case
+from apps.itinerary.models import (
+    Itinerary,
+    ItineraryItem,
+    ItinerarySettings,
+    ItineraryTeamMember,
+    Note,
+)
+from apps.planner.models import DaySettings, TeamSettings
+from apps.users.models import User
+from apps.visits.models import Observation, SuggestNextVisit, Visit
+from django.core.cache import cache
+from django.db import connection, reset_queries
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from settings.urls import v1_urls
+from utils.queries_zaken_api import local_case_pools
+
+from app.utils.unittest_helpers import get_authenticated_client, get_test_user
+
+# Numbers of itineraries the endpoints are requested with
+SCALES = (1, 10, 100)
+
+# Maximum number of SQL queries and outbound HTTP requests per GET endpoint
+QUERY_BUDGETS = {
+    "itinerary-list": (19, 1),
+    "itinerary-summary": (3, 0),
+    "itinerary-detail": (17, 1),
+    "itinerary-suggestions": (15, 2),
+    "itinerary-team": (7, 0),
+    "notes-detail": (4, 0),
+    "case-detail": (15, 3),
+    "case-events": (2, 1),
+    "case-visits": (9, 0),
+    "search-list": (4, 1),
+    "search-v2-list": (4, 1),
+    "addresses-get-districts": (1, 1),
+    "addresses-housing-corporations": (1, 1),
+    "addresses-decos": (1, 1),
+    "addresses-meldingen-by-bag-id": (1, 1),
+    "addresses-power-browser-permits-by-bag-id": (1, 1),
+    "addresses-registrations-by-bag-id": (1, 1),
+    "addresses-residents-by-bag-id": (1, 1),
+    "team-settings-list": (11, 0),
+    "team-settings-detail": (10, 0),
+    "team-settings-projects": (2, 1),
+    "team-settings-reasons": (2, 1),
+    "team-settings-schedule-types": (2, 1),
+    "team-settings-state-types": (1, 0),
+    "team-settings-subjects": (2, 1),
+    "team-settings-tags": (2, 1),
+    "team-settings-weekday": (3, 0),
+    "day-settings-list": (8, 0),
+    "day-settings-detail": (7, 0),
+    "day-settings-case-count": (4, 1),
+    "day-settings-tiles": (5, 1),
+    "themes-list": (3, 0),
+    "themes-detail": (2, 0),
+    "users-list": (5, 0),
+    "visits-list": (9, 0),
+    "visits-detail": (8, 0),
+    "observations-list": (3, 0),
+    "observations-detail": (2, 0),
+    "suggest-next-visit-list": (3, 0),
+    "suggest-next-visit-detail": (2, 0),
+    "is-authorized": (1, 0),
+}
+
+# Endpoints of which the counts are known to grow with the number of rows, their
+# budgets hold for a single itinerary. Remove an endpoint from this list once it's
+# fixed, the test fails if its counts are constant.
+KNOWN_N_PLUS_ONE = {
+    "itinerary-suggestions",
+    "visits-list",
+}
+
+# Endpoints without a GET method
+UNBUDGETED_ENDPOINTS = {
+    "api-root",
+    "itinerary-events-token",
+    "itinerary-reorder",
+    "itinerary-item-list",
+    "itinerary-item-detail",
+    "notes-list",
+    "oidc-authenticate",
+}
+
+
+def get_case_data(case_id):
+    return {
+        "id": int(case_id),
+        "address": {
+            "bag_id": f"FOO_BAG_ID_{case_id}",
+            "nummeraanduiding_id": f"FOO_NUMMERAANDUIDING_ID_{case_id}",
+            "street_name": "Foo street",
+            "number": int(case_id),
+            "postal_code": "1011AA",
+            "lat": 52.37,
+            "lng": 4.89,
+        },
+        "reason": {"id": 1, "name": "FOO_REASON"},
+        "project": None,
+        "subjects": [],
+        "tags": [],
+        "workflows": [],
+        "schedules": [],
+    }
+
+
+class ExternalAPIStub:
+    """
+    Stubs all outbound HTTP requests, serving the cases of the fixtures
+    """
+
+    def __init__(self):
+        self.case_ids = []
+        self.count = 0
+
+    def get_data(self, url, params):
+        if url.endswith("/cases/") or url.endswith("/cases/data/"):
+            ids = (params or {}).get("ids")
+            case_ids = ids.split(",") if ids else self.case_ids
+            results = [get_case_data(case_id) for case_id in case_ids]
+            return {"count": len(results), "results": results}
+        if "/cases/" in url and url.endswith("/events/"):
+            return []
+        case_id = url.rstrip("/").split("/")[-1]
+        if "/cases/" in url and case_id.isdigit():
+            return get_case_data(case_id)
+        return {"count": 0, "results": []}
+
+    def request(self, session, method, url, params=None, **kwargs):
+        self.count += 1
+
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response._content = requests.compat.json.dumps(
+            self.get_data(url, params)
+        ).encode()
+        # Lets streamed responses be read from the content
+        response._content_consumed = True
+        return response
+
+
+# Case details are fetched in chunks by design, so the fixtures fit in a single chunk
+@override_settings(ZAKEN_CASES_DATA_CHUNK_SIZE=1000)
+class QueryBudgetTest(TestCase):
+    def setUp(self):
+        self.user = get_test_user()
+        self.client = get_authenticated_client()
+        self.other_user = User.objects.create(email="b.bar@foo.com")
+
+        self.team_settings = TeamSettings.objects.create(name="FOO_TEAM")
+        self.day_settings = DaySettings.objects.create(
+            name="FOO_DAY", team_settings=self.team_settings, week_days=[0]
+        )
+        self.observation = Observation.objects.create(
+            value="FOO", verbose="Foo", position=0
+        )
+        self.suggest_next_visit = SuggestNextVisit.objects.create(
+            value="FOO", verbose="Foo", position=0
+        )
+        self.team_settings.observation_choices.add(self.observation)
+        self.team_settings.suggest_next_visit_choices.add(self.suggest_next_visit)
+
+        self.external_api = ExternalAPIStub()
+        patcher = patch.object(
+            requests.Session,
+            "request",
+            autospec=True,
+            side_effect=self.external_api.request,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch(
+            "utils.queries_brk_api.brk_token_manager.get_token",
+            return_value="FOO_TOKEN",
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.itineraries = []
+
+    def add_item(self, itinerary):
+        case_id = str(Case.objects.count() + 1000)
+        case = Case.objects.create(case_id=case_id)
+        self.external_api.case_ids.append(case_id)
+
+        item = ItineraryItem.objects.create(itinerary=itinerary, case=case)
+        Note.objects.create(itinerary_item=item, author=self.user, text="FOO")
+        Visit.objects.create(
+            case_id=case,
+            itinerary_item=item,
+            author=self.user,
+            start_time=datetime.now(),
+        )
+
+    def add_itinerary(self):
+        itinerary = Itinerary.objects.create()
+        ItinerarySettings.objects.create(
+            itinerary=itinerary,
+            day_settings=self.day_settings,
+            opening_date=date.today(),
+            target_length=8,
+        )
+        ItineraryTeamMember.objects.create(itinerary=itinerary, user=self.user)
+        ItineraryTeamMember.objects.create(itinerary=itinerary, user=self.other_user)
+        self.add_item(itinerary)
+        self.itineraries.append(itinerary)
+
+    def grow_fixtures(self, scale):
+        """
+        Grows the fixtures to the given number of itineraries.
+        The first itinerary gets as many items as there are itineraries.
+        """
+        while len(self.itineraries) < scale:
+            self.add_itinerary()
+        while self.itineraries[0].items.count() < scale:
+            self.add_item(self.itineraries[0])
+
+    def get_endpoint_urls(self):
+        itinerary = self.itineraries[0]
+        case = itinerary.items.first().case
+        bag_id = f"FOO_BAG_ID_{case.case_id}"
+
+        urls = {
+            "itinerary-list": (
+                reverse("v1:itinerary-list") + f"?created_at={date.today()}"
+            ),
+            "itinerary-summary": reverse("v1:itinerary-summary"),
+            "itinerary-detail": reverse("v1:itinerary-detail", args=[itinerary.pk]),
+            "itinerary-suggestions": reverse(
+                "v1:itinerary-suggestions", args=[itinerary.pk]
+            ),
+            "itinerary-team": reverse("v1:itinerary-team", args=[itinerary.pk]),
+            "notes-detail": reverse("v1:notes-detail", args=[Note.objects.first().pk]),
+            "case-detail": reverse("v1:case-detail", args=[case.case_id]),
+            "case-events": reverse("v1:case-events", args=[case.case_id]),
+            "case-visits": reverse("v1:case-visits", args=[case.case_id]),
+            "search-list": reverse("v1:search-list"),
+            "search-v2-list": reverse("v1:search-v2-list"),
+            "addresses-get-districts": reverse("v1:addresses-get-districts"),
+            "addresses-housing-corporations": reverse(
+                "v1:addresses-housing-corporations"
+            ),
+            "team-settings-list": reverse("v1:team-settings-list"),
+            "team-settings-weekday": reverse(
+                "v1:team-settings-weekday", args=[self.team_settings.pk, 0]
+            ),
+            "day-settings-list": reverse("v1:day-settings-list"),
+            "day-settings-case-count": reverse(
+                "v1:day-settings-case-count", args=[self.day_settings.pk]
+            ),
+            "day-settings-tiles": reverse(
+                "v1:day-settings-tiles", args=[self.day_settings.pk, 12, 2103, 1346]
+            ),
+            "themes-list": reverse("v1:themes-list"),
+            "users-list": reverse("v1:users-list"),
+            "visits-list": reverse("v1:visits-list"),
+            "visits-detail": reverse(
+                "v1:visits-detail", args=[Visit.objects.first().pk]
+            ),
+            "observations-list": reverse("v1:observations-list"),
+            "observations-detail": reverse(
+                "v1:observations-detail", args=[self.observation.pk]
+            ),
+            "suggest-next-visit-list": reverse("v1:suggest-next-visit-list"),
+            "suggest-next-visit-detail": reverse(
+                "v1:suggest-next-visit-detail", args=[self.suggest_next_visit.pk]
+            ),
+            "is-authorized": reverse("v1:is-authorized"),
+        }
+        for name in (
+            "addresses-decos",
+            "addresses-meldingen-by-bag-id",
+            "addresses-power-browser-permits-by-bag-id",
+            "addresses-registrations-by-bag-id",
+            "addresses-residents-by-bag-id",
+        ):
+            urls[name] = reverse(f"v1:{name}", args=[bag_id])
+        for name in (
+            "team-settings-detail",
+            "team-settings-projects",
+            "team-settings-reasons",
+            "team-settings-schedule-types",
+            "team-settings-state-types",
+            "team-settings-subjects",
+            "team-settings-tags",
+            "themes-detail",
+        ):
+            urls[name] = reverse(f"v1:{name}", args=[self.team_settings.pk])
+        urls["day-settings-detail"] = reverse(
+            "v1:day-settings-detail", args=[self.day_settings.pk]
+        )
+        return urls
+
+    def count_requests(self, url):
+        """
+        Returns the number of SQL queries and outbound HTTP requests of a GET request
+        """
+        cache.clear()
+        local_case_pools.clear()
+        # The query log is capped, so it's cleared to keep the captured count right
+        reset_queries()
+        self.external_api.count = 0
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+
+        self.assertLess(response.status_code, 400, f"{url}: {response.content}")
+        return len(context.captured_queries), self.external_api.count
+
+    def test_all_endpoints_are_budgeted(self):
+        """
+        Every v1 endpoint has a budget, or is explicitly left out
+        """
+        url_names = {pattern.name for pattern in v1_urls}
+
+        self.assertEqual(
+            url_names - UNBUDGETED_ENDPOINTS - set(QUERY_BUDGETS),
+            set(),
+            "Add a budget for new endpoints to QUERY_BUDGETS",
+        )
+        self.assertEqual(set(QUERY_BUDGETS) - url_names, set())
+
+    def test_query_budgets(self):
+        """
+        The counts stay within budget and don't grow with the number of rows
+        """
+        counts = {name: [] for name in QUERY_BUDGETS}
+        for scale in SCALES:
+            self.grow_fixtures(scale)
+            for name, url in self.get_endpoint_urls().items():
+                counts[name].append(self.count_requests(url))
+
+        for name, (max_queries, max_http_requests) in QUERY_BUDGETS.items():
+            queries, http_requests = zip(*counts[name])
+            with self.subTest(endpoint=name, queries=queries, requests=http_requests):
+                grows = len(set(queries)) > 1 or len(set(http_requests)) > 1
+                if name in KNOWN_N_PLUS_ONE:
+                    self.assertTrue(grows, "Remove it from KNOWN_N_PLUS_ONE")
+                else:
+                    self.assertFalse(grows, "Counts grow with the number of rows")
+                self.assertLessEqual(queries[0], max_queries)
+                self.assertLessEqual(http_requests[0], max_http_requests)
@@ -0,0 +1,109 @@
+"""
+Tests for the JSON renderers
+"""
+
+import datetime
+import json
+import uuid
+from decimal import Decimal
+
+from apps.cases.mock import get_zaken_case_list
+from apps.users.models import User
+from django.http import JsonResponse as DjangoJsonResponse
+from django.test import SimpleTestCase, TestCase
+from django.utils.translation import gettext_lazy
+from model_bakery import baker
+from rest_framework.renderers import JSONRenderer
+from utils.renderers import JsonResponse, ORJSONRenderer
+
+DATA = {
+    "datetime": datetime.datetime(
+        2020, 1, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc
+    ),
+    "date": datetime.date(2020, 1, 1),
+    "time": datetime.time(12, 30),
+    "duration": datetime.timedelta(hours=1, seconds=30),
+    "user": uuid.UUID("6527e728-e850-4edb-a05e-2b836e43a8ef"),
+    "amount": Decimal("1.50"),
+    "lazy": gettext_lazy("Melding"),
+    "separators": "\u2028\u2029",
+    "cases": {1: "Mosplein 14", 2: "Straat 1"},
+}
+
+
+def get_case_list(count=1000):
+    cases = get_zaken_case_list()
+    return [{**cases[index % len(cases)], "id": index} for index in range(count)]
+
+
+class ORJSONRendererTest(SimpleTestCase):
+    def test_same_as_json_renderer(self):
+        """
+        The content is the same as that of the JSONRenderer of DRF
+        """
+        self.assertEqual(ORJSONRenderer().render(DATA), JSONRenderer().render(DATA))
+        self.assertEqual(ORJSONRenderer().render(None), b"")
+
+        data = {"cases": get_case_list(10)}
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_unserializable(self):
+        """
+        Types that aren't converted explicitly raise a TypeError, like with DRF
+        """
+        with self.assertRaises(TypeError):
+            ORJSONRenderer().render({"object": object()})
+
+    def test_indent(self):
+        """
+        Indented content is rendered by the JSONRenderer of DRF
+        """
+        media_type = "application/json; indent=4"
+        self.assertEqual(
+            ORJSONRenderer().render(DATA, media_type),
+            JSONRenderer().render(DATA, media_type),
+        )
+
+
+class JsonResponseTest(SimpleTestCase):
+    def test_same_as_json_response(self):
+        """
+        The content decodes to the same data as that of the JsonResponse of Django
+        """
+        response = JsonResponse(DATA)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(
+            json.loads(response.content), json.loads(DjangoJsonResponse(DATA).content)
+        )
+
+        cases = get_case_list(10)
+        self.assertEqual(json.loads(JsonResponse(cases, safe=False).content), cases)
+
+    def test_safe(self):
+        """
+        Only dicts are serialized, unless safe is False
+        """
+        with self.assertRaises(TypeError):
+            JsonResponse([])
+
+    def test_encoder(self):
+        """
+        Like the JsonResponse of Django, Decimals are strings by default
+        """
+        self.assertEqual(
+            json.loads(JsonResponse({"amount": Decimal("1.50")}).content),
+            {"amount": "1.50"},
+        )
+
+
+class IterablesTest(TestCase):
+    def test_iterables(self):
+        """
+        QuerySets and sets are rendered as lists, like with DRF
+        """
+        baker.make(User, email="foo@example.com")
+        data = {
+            "users": User.objects.values_list("email", flat=True),
+            "themes": {"Vakantieverhuur"},
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))